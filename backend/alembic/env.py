@@ -11,6 +11,7 @@ from sqlmodel import SQLModel  # noqa: E402
 
 # 导入所有模型，触发 SQLModel.metadata 注册
 import app.models  # noqa: F401,E402
+app.models.import_all_models()
 from app.models import (  # noqa: F401,E402
     Account, Proxy, TargetUser, SystemConfig,
     SendTask, SendRecord, WarmupTask, WarmupTemplate,
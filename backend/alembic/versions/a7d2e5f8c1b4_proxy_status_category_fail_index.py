@@ -0,0 +1,32 @@
+"""proxy: composite index on (status, category, fail_count)
+
+Revision ID: a7d2e5f8c1b4
+Revises: f4c8e2a6b9d3
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a7d2e5f8c1b4'
+down_revision: Union[str, Sequence[str], None] = 'f4c8e2a6b9d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 注册取代理：按 status/category 过滤后按 fail_count 排序，索引直接给出顺序
+    op.create_index(
+        'ix_proxy_status_cat_fail', 'proxy',
+        ['status', 'category', 'fail_count'],
+    )
+    # 前导列已覆盖 status 单列查询
+    op.drop_index('ix_proxy_status', table_name='proxy', if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_proxy_status', 'proxy', ['status'])
+    op.drop_index('ix_proxy_status_cat_fail', table_name='proxy')
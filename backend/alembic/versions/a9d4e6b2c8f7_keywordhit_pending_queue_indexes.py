@@ -0,0 +1,35 @@
+"""keywordhit: covering index and pending partial index for the hit queue
+
+Revision ID: a9d4e6b2c8f7
+Revises: f2c6d8a1b3e5
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a9d4e6b2c8f7'
+down_revision: Union[str, Sequence[str], None] = 'f2c6d8a1b3e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_keywordhit_status_detected', 'keywordhit',
+        ['status', 'detected_at', 'keyword_monitor_id'],
+    )
+    # 只索引待处理的命中，队列分页不受历史数据量影响
+    op.create_index(
+        'ix_keywordhit_pending', 'keywordhit', ['detected_at', 'keyword_monitor_id'],
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_keywordhit_pending', table_name='keywordhit')
+    op.drop_index('ix_keywordhit_status_detected', table_name='keywordhit')
@@ -0,0 +1,32 @@
+"""lead.telegram_user_id / chathistory.target_user_id: INTEGER -> BIGINT
+
+Revision ID: b1e7f3a9d5c2
+Revises: a9d4e6b2c8f7
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b1e7f3a9d5c2'
+down_revision: Union[str, Sequence[str], None] = 'a9d4e6b2c8f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Telegram 用户 ID 早已超过 2^31，INTEGER 在 PG 上会溢出；SQLite 的 INTEGER 本就是 64 位
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.alter_column('lead', 'telegram_user_id', type_=sa.BigInteger(), existing_nullable=False)
+    op.alter_column('chathistory', 'target_user_id', type_=sa.BigInteger(), existing_nullable=True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.alter_column('chathistory', 'target_user_id', type_=sa.Integer(), existing_nullable=True)
+    op.alter_column('lead', 'telegram_user_id', type_=sa.Integer(), existing_nullable=False)
@@ -0,0 +1,32 @@
+"""targetuser: composite index on (created_at, ai_score)
+
+Revision ID: b3f9c6d1e8a2
+Revises: a7d2e5f8c1b4
+Create Date: 2026-10-17 23:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b3f9c6d1e8a2'
+down_revision: Union[str, Sequence[str], None] = 'a7d2e5f8c1b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 截流统计：按 created_at 范围统计总数和 ai_score >= 70 的数量，只扫索引
+    op.create_index(
+        'ix_targetuser_created_score', 'targetuser',
+        ['created_at', 'ai_score'],
+    )
+    # 前导列已覆盖 created_at 单列查询
+    op.drop_index('ix_targetuser_created_at', table_name='targetuser', if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_targetuser_created_at', 'targetuser', ['created_at'])
+    op.drop_index('ix_targetuser_created_score', table_name='targetuser')
@@ -0,0 +1,44 @@
+"""accountsendstats: composite unique index on (account_id, stat_date)
+
+Revision ID: c3f9a1d7e2b4
+Revises: b4d8e1f2c5a7
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'c3f9a1d7e2b4'
+down_revision: Union[str, Sequence[str], None] = 'b4d8e1f2c5a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 唯一索引前先去重：同一账号同一天保留 id 最小的那条
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "DELETE FROM accountsendstats a USING accountsendstats b "
+            "WHERE a.account_id = b.account_id AND a.stat_date = b.stat_date AND a.id > b.id;"
+        )
+    else:
+        # 通用写法；多包一层派生表，MySQL 不允许在 DELETE 的子查询里直接读同一张表
+        op.execute(
+            "DELETE FROM accountsendstats WHERE id NOT IN ("
+            "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM accountsendstats "
+            "GROUP BY account_id, stat_date) AS keep);"
+        )
+    op.create_index(
+        'ix_stats_acct_date', 'accountsendstats', ['account_id', 'stat_date'], unique=True,
+    )
+    # 复合索引的前导列已覆盖 account_id 单列查询
+    op.drop_index('ix_accountsendstats_account_id', table_name='accountsendstats', if_exists=True)
+    op.drop_index('ix_accountsendstats_stat_date', table_name='accountsendstats', if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_accountsendstats_stat_date', 'accountsendstats', ['stat_date'])
+    op.create_index('ix_accountsendstats_account_id', 'accountsendstats', ['account_id'])
+    op.drop_index('ix_stats_acct_date', table_name='accountsendstats')
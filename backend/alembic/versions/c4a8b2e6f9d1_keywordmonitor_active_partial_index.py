@@ -0,0 +1,30 @@
+"""keywordmonitor: partial index on active rules
+
+Revision ID: c4a8b2e6f9d1
+Revises: b1e7f3a9d5c2
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c4a8b2e6f9d1'
+down_revision: Union[str, Sequence[str], None] = 'b1e7f3a9d5c2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 监听进程重载规则只查启用行；停用规则不进索引
+    op.create_index(
+        'ix_kw_active_type', 'keywordmonitor', ['match_type'],
+        postgresql_where=sa.text('is_active'),
+        sqlite_where=sa.text('is_active'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_kw_active_type', table_name='keywordmonitor')
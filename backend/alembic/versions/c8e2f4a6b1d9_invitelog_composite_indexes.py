@@ -0,0 +1,49 @@
+"""invitelog: composite indexes for task / account invite stats
+
+Revision ID: c8e2f4a6b1d9
+Revises: b3f9c6d1e8a2
+Create Date: 2026-10-18 01:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c8e2f4a6b1d9'
+down_revision: Union[str, Sequence[str], None] = 'b3f9c6d1e8a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 任务统计：task_id 过滤后按 (status, error_code) 分组，只扫索引
+    op.create_index(
+        'ix_invitelog_task_status_error', 'invitelog',
+        ['task_id', 'status', 'error_code'],
+    )
+    # 账号今日 / 总计数与每日限额筛选
+    op.create_index(
+        'ix_invitelog_account_created_status', 'invitelog',
+        ['account_id', 'created_at', 'status'],
+    )
+    # 每个账号最近一次风控：部分索引只含 peer_flood 行
+    op.create_index(
+        'ix_invitelog_account_flood', 'invitelog',
+        ['account_id', 'created_at'],
+        postgresql_where=sa.text("error_code = 'peer_flood'"),
+        postgresql_include=['flood_wait_seconds'],
+        sqlite_where=sa.text("error_code = 'peer_flood'"),
+    )
+    # 前导列已覆盖 task_id / account_id 单列查询
+    op.drop_index('ix_invitelog_task_id', table_name='invitelog', if_exists=True)
+    op.drop_index('ix_invitelog_account_id', table_name='invitelog', if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_invitelog_account_id', 'invitelog', ['account_id'])
+    op.create_index('ix_invitelog_task_id', 'invitelog', ['task_id'])
+    op.drop_index('ix_invitelog_account_flood', table_name='invitelog')
+    op.drop_index('ix_invitelog_account_created_status', table_name='invitelog')
+    op.drop_index('ix_invitelog_task_status_error', table_name='invitelog')
@@ -0,0 +1,36 @@
+"""targetuser: partial index for invite candidates
+
+Revision ID: d2a7c5e9f3b8
+Revises: c8e2f4a6b1d9
+Create Date: 2026-10-18 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd2a7c5e9f3b8'
+down_revision: Union[str, Sequence[str], None] = 'c8e2f4a6b1d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # SQLite 索引不支持 NULLS LAST
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    # 邀请候选筛选：顺序与 ORDER BY 一致，只含未成功的用户
+    op.create_index(
+        'ix_targetuser_eligible', 'targetuser',
+        [sa.text('ai_score DESC NULLS LAST'), sa.text('engagement_score DESC'),
+         sa.text('created_at DESC'), sa.text('id DESC')],
+        postgresql_where=sa.text("invite_status <> 'success'"),
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_targetuser_eligible', table_name='targetuser')
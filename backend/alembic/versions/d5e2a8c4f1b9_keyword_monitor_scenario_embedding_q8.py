@@ -0,0 +1,29 @@
+"""keywordmonitor: add scenario_embedding_q8 (int8 scenario embedding)
+
+Revision ID: d5e2a8c4f1b9
+Revises: c3f9a1d7e2b4
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd5e2a8c4f1b9'
+down_revision: Union[str, Sequence[str], None] = 'c3f9a1d7e2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 语义规则场景向量的 int8 量化结果，监听进程启动时直接加载，无需重新 embed
+    op.add_column(
+        'keywordmonitor',
+        sa.Column('scenario_embedding_q8', sa.LargeBinary(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('keywordmonitor', 'scenario_embedding_q8')
@@ -0,0 +1,36 @@
+"""scripttask / warmuptask: partial indexes on pending and active tasks
+
+Revision ID: d8f1a3c5e7b2
+Revises: c4a8b2e6f9d1
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd8f1a3c5e7b2'
+down_revision: Union[str, Sequence[str], None] = 'c4a8b2e6f9d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 只索引待执行 / 执行中的任务，已完成的历史任务不进索引
+    op.create_index(
+        'ix_scripttask_pending_created', 'scripttask', ['created_at'],
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'"),
+    )
+    op.create_index(
+        'ix_warmuptask_active', 'warmuptask', ['status', 'created_at'],
+        postgresql_where=sa.text("status IN ('pending', 'running')"),
+        sqlite_where=sa.text("status IN ('pending', 'running')"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_warmuptask_active', table_name='warmuptask')
+    op.drop_index('ix_scripttask_pending_created', table_name='scripttask')
@@ -0,0 +1,33 @@
+"""keywordmonitor: add embedding_model
+
+Revision ID: e3b7c9a2d4f6
+Revises: d8f1a3c5e7b2
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e3b7c9a2d4f6'
+down_revision: Union[str, Sequence[str], None] = 'd8f1a3c5e7b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'keywordmonitor',
+        sa.Column('embedding_model', sa.String(length=64), nullable=True),
+    )
+    # 已有的量化向量都由 gemini-embedding-001 生成
+    op.execute(
+        "UPDATE keywordmonitor SET embedding_model = 'gemini-embedding-001' "
+        "WHERE scenario_embedding_q8 IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('keywordmonitor', 'embedding_model')
@@ -0,0 +1,44 @@
+"""sendrecord / targetuser: composite indexes matching query predicates
+
+Revision ID: e7b3c9d2a6f4
+Revises: d5e2a8c4f1b9
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'e7b3c9d2a6f4'
+down_revision: Union[str, Sequence[str], None] = 'd5e2a8c4f1b9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_sendrecord_task_sent', 'sendrecord', ['task_id', 'sent_at'])
+    op.create_index('ix_sendrecord_account_sent', 'sendrecord', ['account_id', 'sent_at'])
+    op.create_index('ix_targetuser_funnel_score', 'targetuser', ['funnel_stage', 'ai_score'])
+    op.create_index(
+        'ix_targetuser_invite_status_attempted', 'targetuser',
+        ['invite_status', 'invite_attempted_at'],
+    )
+    # 复合索引的前导列已覆盖这些单列查询；status 单列选择性太低
+    op.drop_index('ix_sendrecord_task_id', table_name='sendrecord', if_exists=True)
+    op.drop_index('ix_sendrecord_account_id', table_name='sendrecord', if_exists=True)
+    op.drop_index('ix_sendrecord_status', table_name='sendrecord', if_exists=True)
+    op.drop_index('ix_targetuser_funnel_stage', table_name='targetuser', if_exists=True)
+    op.drop_index('ix_targetuser_invite_status', table_name='targetuser', if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_targetuser_invite_status', 'targetuser', ['invite_status'])
+    op.create_index('ix_targetuser_funnel_stage', 'targetuser', ['funnel_stage'])
+    op.create_index('ix_sendrecord_status', 'sendrecord', ['status'])
+    op.create_index('ix_sendrecord_account_id', 'sendrecord', ['account_id'])
+    op.create_index('ix_sendrecord_task_id', 'sendrecord', ['task_id'])
+    op.drop_index('ix_targetuser_invite_status_attempted', table_name='targetuser')
+    op.drop_index('ix_targetuser_funnel_score', table_name='targetuser')
+    op.drop_index('ix_sendrecord_account_sent', table_name='sendrecord')
+    op.drop_index('ix_sendrecord_task_sent', table_name='sendrecord')
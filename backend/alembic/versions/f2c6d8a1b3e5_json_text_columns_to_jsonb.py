@@ -0,0 +1,80 @@
+"""json-in-text columns to JSONB with GIN indexes (PostgreSQL only)
+
+Revision ID: f2c6d8a1b3e5
+Revises: e7b3c9d2a6f4
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = 'f2c6d8a1b3e5'
+down_revision: Union[str, Sequence[str], None] = 'e7b3c9d2a6f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (表, 列, USING 表达式, server_default)
+# 历史数据里可能有非法 JSON：ai_tags 曾以 Python repr 写入（单引号），
+# auto_keywords 允许逗号分隔；其余非法值回落到空数组 / 空对象
+_COLUMNS = [
+    ('lead', 'tags_json', "_try_jsonb(tags_json, '[]'::jsonb)", "'[]'::jsonb"),
+    ('targetuser', 'tags', "_try_jsonb(tags, NULL)", None),
+    ('targetuser', 'ai_tags', "_try_jsonb(ai_tags, _try_jsonb(replace(ai_tags, '''', '\"'), NULL))", None),
+    ('keywordmonitor', 'auto_keywords',
+     "_try_jsonb(auto_keywords, to_jsonb(regexp_split_to_array(trim(both ',' from auto_keywords), '\\s*,\\s*')))",
+     None),
+    ('scrapingtask', 'result_json', "_try_jsonb(result_json, '{}'::jsonb)", "'{}'::jsonb"),
+    ('scripttask', 'account_mapping_json', "_try_jsonb(account_mapping_json, '{}'::jsonb)", "'{}'::jsonb"),
+]
+
+_GIN_INDEXES = [
+    ('ix_lead_tags_gin', 'lead', 'tags_json'),
+    ('ix_targetuser_tags_gin', 'targetuser', 'tags'),
+    ('ix_targetuser_ai_tags_gin', 'targetuser', 'ai_tags'),
+]
+
+
+def upgrade() -> None:
+    # SQLite 上 JSONText 仍是 TEXT，无需迁移
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION _try_jsonb(v text, fallback jsonb) RETURNS jsonb AS $$
+        BEGIN
+            RETURN v::jsonb;
+        EXCEPTION WHEN others THEN
+            RETURN fallback;
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE;
+        """
+    )
+    for table, column, using, default in _COLUMNS:
+        op.alter_column(table, column, type_=postgresql.JSONB(), postgresql_using=using)
+        if default:
+            op.alter_column(table, column, server_default=sa.text(default))
+    op.execute("DROP FUNCTION _try_jsonb(text, jsonb);")
+
+    for name, table, column in _GIN_INDEXES:
+        op.create_index(
+            name, table, [column],
+            postgresql_using='gin', postgresql_ops={column: 'jsonb_path_ops'},
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name, table, _ in reversed(_GIN_INDEXES):
+        op.drop_index(name, table_name=table)
+    for table, column, _, default in reversed(_COLUMNS):
+        if default:
+            op.alter_column(table, column, server_default=None)
+        op.alter_column(table, column, type_=sa.Text(), postgresql_using=f'{column}::text')
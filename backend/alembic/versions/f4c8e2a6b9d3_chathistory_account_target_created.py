@@ -0,0 +1,34 @@
+"""chathistory: composite index on (account_id, target_user_id, created_at)
+
+Revision ID: f4c8e2a6b9d3
+Revises: e3b7c9a2d4f6
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f4c8e2a6b9d3'
+down_revision: Union[str, Sequence[str], None] = 'e3b7c9a2d4f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 按 (账号, 对方) 取最近 N 条对话：复合索引直接给出 created_at 倒序
+    op.create_index(
+        'ix_chathistory_account_target_created', 'chathistory',
+        ['account_id', 'target_user_id', 'created_at'],
+    )
+    # 前导列已覆盖 account_id 单列查询；target_user_id 从不单独查询
+    op.drop_index('ix_chathistory_account_id', table_name='chathistory', if_exists=True)
+    op.drop_index('ix_chathistory_target_user_id', table_name='chathistory', if_exists=True)
+
+
+def downgrade() -> None:
+    op.create_index('ix_chathistory_target_user_id', 'chathistory', ['target_user_id'])
+    op.create_index('ix_chathistory_account_id', 'chathistory', ['account_id'])
+    op.drop_index('ix_chathistory_account_target_created', table_name='chathistory')
@@ -1,13 +1,13 @@
 from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 from pydantic import ValidationError
 from sqlmodel import Session, select
 
 from app.core.config import settings
 from app.core.db import get_session
-from app.core.security import ALGORITHM, is_token_revoked
+from app.core.security import decode_access_token, is_token_revoked
 from app.models.token import TokenPayload
 from app.models.user import User, USER_ROLE_ADMIN, USER_ROLE_SALES
 
@@ -18,7 +18,7 @@ reusable_oauth2 = OAuth2PasswordBearer(
 
 def _decode_token(token: str) -> TokenPayload:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token(token)
         token_data = TokenPayload(**payload)
     except (JWTError, ValidationError):
         raise HTTPException(
@@ -6,6 +6,7 @@ import logging
 import tempfile
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Body, Request
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, select, func, col
 from datetime import datetime
 from pydantic import BaseModel
@@ -81,7 +82,8 @@ def get_accounts(
 ):
     """获取账号列表"""
     try:
-        query = select(Account)
+        # AccountRead 会序列化 proxy：一次 IN 查询预加载，避免逐行懒加载 (N+1)
+        query = select(Account).options(selectinload(Account.proxy))
         if status:
             query = query.where(Account.status == status)
         if role:
@@ -1026,7 +1028,11 @@ def get_accounts_by_combat_role(
     if combat_role not in COMBAT_ROLE_CONFIG:
         raise HTTPException(status_code=400, detail=f"Invalid combat role")
     
-    query = select(Account).where(Account.combat_role == combat_role)
+    query = (
+        select(Account)
+        .options(selectinload(Account.proxy))
+        .where(Account.combat_role == combat_role)
+    )
     if status:
         query = query.where(Account.status == status)
     query = query.offset(skip).limit(limit).order_by(Account.health_score.desc())
@@ -262,6 +262,9 @@ async def trigger_auto_reply(
 
 # ============ AI Engine 高级功能 ============
 
+import json
+from typing import AsyncIterator
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.services.ai_engine import AIEngine
 
@@ -372,6 +375,49 @@ async def generate_reply(
     return {"reply": reply}
 
 
+def _sse(tokens: AsyncIterator[str]) -> StreamingResponse:
+    """把 token 流包装成 SSE：每段 `data: {"token": ...}`，结束时 `data: [DONE]`"""
+    async def events():
+        async for token in tokens:
+            yield f"data: {json.dumps({'token': token}, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # 关闭 Nginx 代理缓冲，token 到达即下发
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/engine/generate-opener/stream")
+async def generate_opener_stream(
+    request: OpenerGenerateRequest,
+    session: Session = Depends(get_session)
+):
+    """AI 生成开场白（SSE 流式输出）"""
+    engine = AIEngine(session)
+    return _sse(engine.generate_opener_stream(
+        user_summary=request.user_summary,
+        persona_id=request.persona_id,
+        tone=request.tone
+    ))
+
+
+@router.post("/engine/generate-reply/stream")
+async def generate_reply_stream(
+    request: ReplyGenerateRequest,
+    session: Session = Depends(get_session)
+):
+    """AI 生成智能回复（SSE 流式输出）"""
+    engine = AIEngine(session)
+    return _sse(engine.generate_reply_stream(
+        conversation=request.conversation,
+        persona_id=request.persona_id,
+        knowledge=request.knowledge
+    ))
+
+
 @router.post("/engine/generate-script")
 async def generate_script(
     request: ScriptGenerateRequest,
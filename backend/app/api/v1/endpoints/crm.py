@@ -7,6 +7,7 @@ from app.core.db import get_session
 from app.api.deps import get_current_user, get_current_sales_or_admin
 from app.models.lead import Lead, LeadCreate, LeadRead, LeadInteraction, LeadInteractionCreate, LeadInteractionRead
 from app.models.account import Account
+from app.models.schemas_fast import encode_list
 from app.models.user import User
 from app.services.telegram_client import send_message_with_client
 from app.services.websocket_manager import manager
@@ -39,7 +40,7 @@ def get_leads(
     
     # Sort by last interaction desc
     query = query.offset(skip).limit(limit).order_by(Lead.last_interaction_at.desc())
-    return session.exec(query).all()
+    return encode_list(session.exec(query).all(), LeadRead)
 
 @router.get("/leads/{lead_id}", response_model=LeadRead)
 def get_lead(
@@ -264,10 +265,10 @@ async def regenerate_lead_draft(
     if not lead:
         raise HTTPException(status_code=404, detail="Lead not found")
 
-    # 取最近一条客户来消息作为生成依据
+    # 取最近一条客户来消息作为生成依据（只取 content 列）
     from app.models.chat_history import ChatHistory
     last_inbound = session.exec(
-        select(ChatHistory)
+        select(ChatHistory.content)
         .where(ChatHistory.account_id == lead.account_id)
         .where(ChatHistory.target_user_id == lead.telegram_user_id)
         .where(ChatHistory.role == "user")
@@ -275,7 +276,7 @@ async def regenerate_lead_draft(
         .limit(1)
     ).first()
 
-    if not last_inbound:
+    if last_inbound is None:
         raise HTTPException(
             status_code=400,
             detail="客户暂无来信，无法生成草稿",
@@ -289,7 +290,7 @@ async def regenerate_lead_draft(
     svc = AIReplyService(session)
     draft = await svc._generate_reply(
         account,
-        last_inbound.content,
+        last_inbound,
         lead.telegram_user_id,
         lead.first_name or "",
         lead.username,
@@ -12,7 +12,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
 from app.core.db import get_session
 from app.models.invite_task import InviteTask, InviteTaskCreate, InviteTaskRead, InviteTaskUpdate
-from app.models.invite_log import InviteLog, InviteLogRead, InviteStats, AccountInviteStats
+from app.models.invite_log import InviteLog, InviteLogBrief, InviteStats, AccountInviteStats
 from app.models.target_user import TargetUser
 from app.models.account import Account
 from app.core.celery_app import celery_app
@@ -275,7 +275,7 @@ def get_task_stats(
     return invite_service.get_task_stats(task_id)
 
 
-@router.get("/tasks/{task_id}/logs", response_model=List[InviteLogRead])
+@router.get("/tasks/{task_id}/logs", response_model=List[InviteLogBrief])
 def get_task_logs(
     task_id: int,
     status: Optional[str] = Query(None, description="筛选状态 success/failed"),
@@ -283,14 +283,8 @@ def get_task_logs(
     session: Session = Depends(get_session)
 ):
     """获取任务日志"""
-    query = select(InviteLog).where(InviteLog.task_id == task_id)
-    
-    if status:
-        query = query.where(InviteLog.status == status)
-    
-    query = query.order_by(InviteLog.created_at.desc()).limit(limit)
-    
-    return session.exec(query).all()
+    invite_service = InviteService(session)
+    return invite_service.get_recent_logs(task_id, limit=limit, status=status)
 
 
 # ==================== 账号统计 ====================
@@ -312,11 +306,8 @@ def get_accounts_invite_stats(
         ).all()
         ids = [acc.id for acc in accounts]
     
-    stats = []
-    for account_id in ids:
-        stats.append(invite_service.get_account_invite_stats(account_id))
-    
-    return stats
+    stats = invite_service.get_account_invite_stats_bulk(ids)
+    return [stats[account_id] for account_id in ids]
 
 
 # ==================== 目标用户预览 ====================
@@ -331,14 +322,23 @@ def preview_targets(
     exclude_failed_recently: bool = True,
     failed_cooldown_hours: int = 72,
     max_targets: int = 100,
+    after_id: Optional[int] = Query(None, description="上一页返回的 next_after_id，取下一页"),
     session: Session = Depends(get_session)
 ):
     """
     预览筛选结果（不创建任务）
-    用于向导式创建时展示将被拉入的用户列表
+    用于向导式创建时展示将被拉入的用户列表；结果满一页时返回 next_after_id 继续翻页
     """
     invite_service = InviteService(session)
     
+    # 游标只暴露 id，排序键从该行取出
+    after = None
+    if after_id is not None:
+        last = session.get(TargetUser, after_id)
+        if not last:
+            raise HTTPException(status_code=400, detail="after_id 不存在")
+        after = (last.ai_score, last.engagement_score, last.created_at, last.id)
+    
     targets = invite_service.filter_target_users(
         filter_tags=filter_tags,
         filter_min_score=filter_min_score,
@@ -347,11 +347,13 @@ def preview_targets(
         exclude_invited=exclude_invited,
         exclude_failed_recently=exclude_failed_recently,
         failed_cooldown_hours=failed_cooldown_hours,
-        max_targets=max_targets
+        max_targets=max_targets,
+        after=after
     )
     
     return {
         "count": len(targets),
+        "next_after_id": targets[-1].id if len(targets) == max_targets else None,
         "targets": [
             {
                 "id": t.id,
@@ -1,24 +1,23 @@
-from datetime import timedelta, datetime
+import time
+from datetime import timedelta
 from typing import Any
 
 import pyotp
-import redis
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 from pydantic import BaseModel
 from sqlmodel import Session, select
 
 from app.core.config import settings
 from app.core import security
-from app.core.security import ALGORITHM, revoke_token, is_token_revoked
+from app.core.security import revoke_token, is_token_revoked
 from app.core.db import get_session
 from app.api.deps import get_current_user
 from app.models.token import Token, TokenPayload
 from app.models.user import User
 
 router = APIRouter()
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
 
 # Reuse the same OAuth2 scheme for extracting the raw token in logout
 _oauth2_scheme = OAuth2PasswordBearer(
@@ -75,6 +74,7 @@ def login_access_token(
     # Rate Limiting
     ip = request.client.host
     key = f"login_attempts:{ip}"
+    redis_client = security._get_redis()
     attempts = redis_client.get(key)
     if attempts and int(attempts) > 5:
         security.create_log(
@@ -101,8 +101,10 @@ def login_access_token(
     ).first()
 
     if not user or not security.verify_password(raw_password, user.hashed_password):
-        redis_client.incr(key)
-        redis_client.expire(key, 900)  # 15 minutes block
+        with redis_client.pipeline(transaction=False) as pipe:
+            pipe.incr(key)
+            pipe.expire(key, 900)  # 15 minutes block
+            pipe.execute()
         security.create_log(
             session, "login", form_data.username,
             "Incorrect credentials", ip, "failed",
@@ -121,8 +123,10 @@ def login_access_token(
             )
         totp = pyotp.TOTP(user.totp_secret)
         if not totp.verify(totp_code, valid_window=1):
-            redis_client.incr(key)
-            redis_client.expire(key, 900)
+            with redis_client.pipeline(transaction=False) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, 900)
+                pipe.execute()
             security.create_log(
                 session, "login", user.username,
                 "Invalid 2FA code", ip, "failed",
@@ -154,16 +158,16 @@ def login_access_token(
 
 @router.post("/logout", response_model=LogoutResponse)
 def logout(
+    request: Request,
     token: str = Depends(_oauth2_scheme),
+    session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user),
 ) -> Any:
     """
     Revoke the current JWT so it can no longer be used.
     """
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[ALGORITHM],
-        )
+        payload = security.decode_access_token(token)
         token_data = TokenPayload(**payload)
     except JWTError:
         raise HTTPException(
@@ -178,11 +182,18 @@ def logout(
         )
 
     # Calculate remaining TTL so the Redis key expires automatically
-    now_ts = int(datetime.utcnow().timestamp())
+    now_ts = int(time.time())
     exp_ts = int(payload.get("exp", now_ts))
     remaining_ttl = max(exp_ts - now_ts, 1)
 
-    revoke_token(token_data.jti, remaining_ttl)
+    with security.redis_pipeline() as pipe:
+        revoke_token(token_data.jti, remaining_ttl, pipe=pipe)
+        pipe.execute()
+
+    security.create_log(
+        session, "logout", current_user.username, "Logout successful",
+        request.client.host if request.client else "unknown",
+    )
     return {"message": "Successfully logged out"}
 
 
@@ -6,6 +6,7 @@ from sqlmodel import Session, select
 from pydantic import BaseModel
 from app.core.db import get_session
 from app.models.keyword_monitor import KeywordMonitor, KeywordMonitorCreate, KeywordMonitorRead, KeywordMonitorUpdate, KeywordHit, KeywordHitRead
+from app.models.schemas_fast import encode_list
 from app.services.keyword_monitor_service import KeywordMonitorService
 from app.services.llm import LLMService
 
@@ -167,7 +168,7 @@ def get_monitors(
     session: Session = Depends(get_session)
 ):
     service = KeywordMonitorService(session)
-    return service.get_monitors(skip=skip, limit=limit)
+    return encode_list(service.get_monitors(skip=skip, limit=limit), KeywordMonitorRead)
 
 @router.put("/{monitor_id}", response_model=KeywordMonitorRead)
 def update_monitor(
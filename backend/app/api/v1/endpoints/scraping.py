@@ -6,6 +6,7 @@ from app.core.db import get_session
 from app.models.account import Account
 from app.models.target_user import TargetUser, TargetUserCreate, TargetUserRead
 from app.models.scraping_task import ScrapingTask, ScrapingTaskRead
+from app.models.schemas_fast import encode_list
 from app.services.telegram_client import join_group_with_client, scrape_group_members
 from app.core.exceptions import AccountException
 from app.core.celery_app import celery_app
@@ -266,7 +267,7 @@ def get_target_users(
         query = query.where(TargetUser.source_group == source_group)
     
     query = query.offset(skip).limit(limit).order_by(TargetUser.id.desc())
-    return session.exec(query).all()
+    return encode_list(session.exec(query).all(), TargetUserRead)
 
 # =====================
 # Task History
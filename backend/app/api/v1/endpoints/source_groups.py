@@ -9,6 +9,7 @@ from datetime import datetime
 from app.core.db import get_session
 from app.models.source_group import SourceGroup, SourceGroupCreate, SourceGroupUpdate, SourceGroupRead
 from app.models.target_user import TargetUser
+from app.services.intercept_service import invalidate_source_group_cache
 
 router = APIRouter()
 
@@ -47,6 +48,7 @@ def create_source_group(
     db_group = SourceGroup(**source_group.dict())
     session.add(db_group)
     session.commit()
+    invalidate_source_group_cache(db_group.id)
     session.refresh(db_group)
     return db_group
 
@@ -79,6 +81,8 @@ def create_source_groups_batch(
         created += 1
     
     session.commit()
+    if created:
+        invalidate_source_group_cache()
     return {"created": created, "skipped": skipped}
 
 
@@ -111,6 +115,7 @@ def update_source_group(
     
     session.add(group)
     session.commit()
+    invalidate_source_group_cache(group_id)
     session.refresh(group)
     return group
 
@@ -127,6 +132,7 @@ def delete_source_group(
     
     session.delete(group)
     session.commit()
+    invalidate_source_group_cache(group_id)
     return {"success": True}
 
 
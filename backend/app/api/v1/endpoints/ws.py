@@ -1,6 +1,6 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
-from jose import jwt, JWTError
-from app.core.config import settings
+from jose import JWTError
+from app.core.security import decode_access_token
 from app.services.websocket_manager import manager
 import logging
 
@@ -24,7 +24,7 @@ async def websocket_endpoint(
         return
     
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = decode_access_token(token)
         username = payload.get("sub")
         if not username:
             logger.warning(f"WebSocket connection rejected: Invalid token payload")
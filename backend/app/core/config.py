@@ -25,6 +25,7 @@ class Settings(BaseSettings):
     SECRET_KEY: str = Field(default_factory=generate_secret_key)
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
+    BCRYPT_ROUNDS: int = 12  # bcrypt cost factor for new password hashes
     
     # Session 加密密钥 (用于加密 .session 文件)
     SESSION_ENCRYPTION_KEY: str = Field(default="")
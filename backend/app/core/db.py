@@ -1,3 +1,4 @@
+from sqlalchemy import event
 from sqlmodel import SQLModel, create_engine, Session
 from app.core.config import settings
 
@@ -21,8 +22,19 @@ else:
         pool_timeout=30,
     )
 
+    @event.listens_for(engine, "connect")
+    def _jsonb_as_text(dbapi_connection, connection_record):
+        # JSONText 列在应用层就是字符串：让 psycopg2 直接返回 jsonb 原文，
+        # 省掉驱动侧 json.loads 再由列类型 json.dumps 回去的往返
+        try:
+            from psycopg2.extras import register_default_jsonb
+        except ImportError:
+            return
+        register_default_jsonb(dbapi_connection, loads=lambda value: value)
+
 def init_db():
-    from app import models  # noqa: F401
+    from app import models
+    models.import_all_models()
     SQLModel.metadata.create_all(engine)
 
 def get_session():
@@ -5,7 +5,6 @@
 import logging
 from typing import Optional, Any, Dict
 from fastapi import HTTPException, Request
-from fastapi.responses import JSONResponse
 from starlette.status import (
     HTTP_400_BAD_REQUEST,
     HTTP_401_UNAUTHORIZED,
@@ -16,6 +15,8 @@ from starlette.status import (
     HTTP_503_SERVICE_UNAVAILABLE,
 )
 
+from app.core.responses import ORJSONResponse
+
 logger = logging.getLogger(__name__)
 
 
@@ -273,7 +274,7 @@ def register_exception_handlers(app):
             f"TGSCException: {exc.error_code} - {exc.message} | "
             f"Path: {request.url.path} | Details: {exc.details}"
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 "success": False,
@@ -284,7 +285,7 @@ def register_exception_handlers(app):
     @app.exception_handler(HTTPException)
     async def http_exception_handler(request: Request, exc: HTTPException):
         """处理 HTTP 异常"""
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=exc.status_code,
             content={
                 "success": False,
@@ -301,7 +302,7 @@ def register_exception_handlers(app):
             f"Unhandled exception: {type(exc).__name__} - {str(exc)} | "
             f"Path: {request.url.path}"
         )
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=HTTP_500_INTERNAL_SERVER_ERROR,
             content={
                 "success": False,
@@ -4,10 +4,17 @@
 """
 import os
 import sys
+import atexit
+import queue
 import logging
 import json
 from datetime import datetime
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
 from typing import Optional
 from pathlib import Path
 
@@ -16,6 +23,9 @@ from pathlib import Path
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(exist_ok=True)
 
+# 后台写日志的监听线程（setup_logging 启用队列模式时创建）
+_queue_listener: Optional[QueueListener] = None
+
 
 class JSONFormatter(logging.Formatter):
     """JSON 格式日志格式化器，适用于日志聚合系统"""
@@ -67,6 +77,7 @@ def setup_logging(
     json_format: bool = False,
     max_bytes: int = 10 * 1024 * 1024,  # 10MB
     backup_count: int = 5,
+    use_queue: bool = True,
 ) -> None:
     """
     配置全局日志系统
@@ -78,16 +89,23 @@ def setup_logging(
         json_format: 是否使用 JSON 格式 (适用于日志聚合)
         max_bytes: 单个日志文件最大大小
         backup_count: 保留的日志文件数量
+        use_queue: 是否经 QueueHandler 交给后台线程写出，调用方不阻塞在 I/O 上
     """
+    global _queue_listener
+
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, level.upper(), logging.INFO))
     
     # 清除现有处理器
     root_logger.handlers.clear()
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
     
     # 格式定义
     detailed_format = "%(asctime)s - %(name)s - %(levelname)s - %(module)s:%(lineno)d - %(message)s"
     simple_format = "%(asctime)s - %(levelname)s - %(message)s"
+    handlers = []
     
     # 控制台处理器
     if log_to_console:
@@ -107,7 +125,7 @@ def setup_logging(
                     logging.Formatter(simple_format)
                 )
         
-        root_logger.addHandler(console_handler)
+        handlers.append(console_handler)
     
     # 文件处理器
     if log_to_file:
@@ -126,7 +144,7 @@ def setup_logging(
         else:
             file_handler.setFormatter(logging.Formatter(detailed_format))
         
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
         
         # 错误日志文件 (仅记录 ERROR 及以上)
         error_log_path = LOG_DIR / "error.log"
@@ -138,7 +156,7 @@ def setup_logging(
         )
         error_handler.setLevel(logging.ERROR)
         error_handler.setFormatter(logging.Formatter(detailed_format))
-        root_logger.addHandler(error_handler)
+        handlers.append(error_handler)
         
         # 每日审计日志 (按日期轮转)
         audit_log_path = LOG_DIR / "audit.log"
@@ -155,7 +173,18 @@ def setup_logging(
         # 只记录特定的审计日志
         audit_filter = AuditLogFilter()
         audit_handler.addFilter(audit_filter)
-        root_logger.addHandler(audit_handler)
+        handlers.append(audit_handler)
+    
+    if use_queue and handlers:
+        # 业务线程只把 record 放进队列，格式化和写 stdout/文件由监听线程完成
+        log_queue = queue.SimpleQueue()
+        root_logger.addHandler(QueueHandler(log_queue))
+        _queue_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _queue_listener.start()
+        atexit.register(_queue_listener.stop)
+    else:
+        for handler in handlers:
+            root_logger.addHandler(handler)
     
     # 设置第三方库的日志级别
     logging.getLogger("pyrogram").setLevel(logging.WARNING)
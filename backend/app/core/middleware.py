@@ -5,6 +5,7 @@ import time
 import logging
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware
 from starlette.responses import Response
 
 logger = logging.getLogger(__name__)
@@ -57,6 +58,22 @@ class SecurityMiddleware(BaseHTTPMiddleware):
         return response
 
 
+class FastPathCORSMiddleware(CORSMiddleware):
+    """
+    CORSMiddleware，无 Origin 头的请求（同源的前端 / 内部调用）直接放行：
+    跳过 Headers 解析和 send 包装。省掉的只有 ``Vary: Origin``，
+    而 SecurityMiddleware 已给所有响应加了 no-store，不影响缓存语义。
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and not any(
+            name == b"origin" for name, _ in scope["headers"]
+        ):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
     简单的内存级别限速中间件（备用，主要由 Nginx 处理）
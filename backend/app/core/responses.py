@@ -0,0 +1,18 @@
+"""
+JSON 响应类
+用 orjson（C 实现）替代标准库 json 序列化响应体
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """orjson 序列化的 JSONResponse，直接输出 bytes，原生支持 datetime / UUID"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
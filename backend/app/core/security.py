@@ -1,83 +1,393 @@
+import asyncio
+import logging
+import os
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime
-from typing import Any, Union
+from typing import Any, List, Optional, Tuple, Union
 
-from jose import jwt
+from jose import jwk, jwt
 from passlib.context import CryptContext
 
 from app.core.config import settings
 from app.models.operation_log import OperationLog
 from sqlmodel import Session
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Fixing ident/rounds up front saves passlib resolving them on every hash.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__ident="2b",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+)
 
 # Export ALGORITHM for other modules
 ALGORITHM = settings.ALGORITHM
 
+# Pre-built JWT key object. Given a plain string, jose rebuilds the HMAC key on
+# every encode and, on decode, first tries json.loads() on it as a JWK.
+_jwt_key = jwk.construct(settings.SECRET_KEY, ALGORITHM)
+
 # Redis client for token blocklist (lazy init)
 _redis_client = None
 
+# Pool sizing for the shared client: auth checks run in the threadpool, so
+# callers wait for a free connection instead of opening new sockets.
+_REDIS_MAX_CONNECTIONS = 64
+_REDIS_HEALTH_CHECK_INTERVAL = 30  # seconds
+# Hot paths (auth, listener cooldowns, LLM cache) all have a local fallback;
+# fail fast when Redis is unreachable instead of waiting for the OS TCP timeout.
+_REDIS_SOCKET_TIMEOUT = 2  # seconds, connect and read
+_REDIS_POOL_TIMEOUT = 1  # seconds to wait for a free pooled connection
+
 
 def _get_redis():
     global _redis_client
     if _redis_client is None:
+        import socket
         import redis
-        _redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+        keepalive_options = {}
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            keepalive_options[socket.TCP_KEEPIDLE] = 60
+        pool = redis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=_REDIS_MAX_CONNECTIONS,
+            timeout=_REDIS_POOL_TIMEOUT,
+            socket_connect_timeout=_REDIS_SOCKET_TIMEOUT,
+            socket_timeout=_REDIS_SOCKET_TIMEOUT,
+            socket_keepalive=True,
+            socket_keepalive_options=keepalive_options,
+            health_check_interval=_REDIS_HEALTH_CHECK_INTERVAL,
+            decode_responses=True,
+        )
+        _redis_client = redis.Redis(connection_pool=pool)
     return _redis_client
 
+
+def redis_pipeline(transaction: bool = False):
+    """Return a pipeline on the shared Redis client.
+
+    Commands queued on the pipeline are sent in a single round-trip when
+    ``execute()`` is called (or when the ``with`` block exits).
+    """
+    return _get_redis().pipeline(transaction=transaction)
+
 # Prefix for revoked token keys in Redis
 _REVOKED_TOKEN_PREFIX = "revoked_token:"
+# Pub/sub channel used to tell other workers to drop a jti from their cache
+_REVOKED_TOKEN_CHANNEL = "revoked_token_events"
+
+# In-process cache of "not revoked" answers: jti -> expiry (monotonic time).
+# Nearly every token checked is valid, so this skips the Redis EXISTS round-trip
+# on the auth hot path. Revocations evict the entry locally and are broadcast
+# over pub/sub so other workers evict it too; the TTL bounds staleness if a
+# broadcast is missed.
+_NEG_CACHE_TTL = 30  # seconds
+_NEG_CACHE_MAX_SIZE = 100_000
+_NEG_CACHE: "OrderedDict[str, float]" = OrderedDict()
+# jti -> when it was last evicted (monotonic time), kept for one TTL: a lookup
+# that started before the eviction must not cache its stale "not revoked".
+_RECENT_EVICTIONS: "OrderedDict[str, float]" = OrderedDict()
+_neg_cache_lock = threading.Lock()
+# The listener has its own lock so a slow subscribe never blocks cache lookups;
+# after a failed start, callers skip the attempt until the retry time passes.
+_REVOCATION_LISTENER_RETRY = 60  # seconds
+_revocation_listener_lock = threading.Lock()
+_revocation_listener = None
+_revocation_listener_retry_at = 0.0
+
+
+def _neg_cache_hit(jti: str) -> bool:
+    with _neg_cache_lock:
+        expires_at = _NEG_CACHE.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del _NEG_CACHE[jti]
+            return False
+        return True
+
+
+def _neg_cache_store(jti: str, lookup_started: float) -> None:
+    with _neg_cache_lock:
+        evicted_at = _RECENT_EVICTIONS.get(jti)
+        if evicted_at is not None and evicted_at >= lookup_started:
+            return
+        _NEG_CACHE[jti] = time.monotonic() + _NEG_CACHE_TTL
+        _NEG_CACHE.move_to_end(jti)
+        while len(_NEG_CACHE) > _NEG_CACHE_MAX_SIZE:
+            _NEG_CACHE.popitem(last=False)
+
+
+def _neg_cache_evict(jti: str) -> None:
+    now = time.monotonic()
+    with _neg_cache_lock:
+        _NEG_CACHE.pop(jti, None)
+        _RECENT_EVICTIONS[jti] = now
+        _RECENT_EVICTIONS.move_to_end(jti)
+        while _RECENT_EVICTIONS and (
+            len(_RECENT_EVICTIONS) > _NEG_CACHE_MAX_SIZE
+            or next(iter(_RECENT_EVICTIONS.values())) < now - _NEG_CACHE_TTL
+        ):
+            _RECENT_EVICTIONS.popitem(last=False)
+
+
+def _on_revocation_message(message) -> None:
+    if message.get("type") == "message":
+        _neg_cache_evict(message["data"])
+
+
+def _on_revocation_listener_error(exc, pubsub, thread) -> None:
+    """Worker thread error (e.g. Redis went away): stop it; the next cache miss
+    restarts it once the retry backoff has passed."""
+    global _revocation_listener_retry_at
+    _revocation_listener_retry_at = time.monotonic() + _REVOCATION_LISTENER_RETRY
+    logger.warning(f"Token revocation listener stopped: {exc}")
+    thread.stop()
+
+
+def _revocation_listener_running() -> bool:
+    return _revocation_listener is not None and _revocation_listener.is_alive()
+
+
+def _ensure_revocation_listener() -> None:
+    """Subscribe (once per process) to revocation broadcasts from other workers,
+    restarting the subscription if its worker thread has died."""
+    global _revocation_listener, _revocation_listener_retry_at
+    if _revocation_listener_running() or time.monotonic() < _revocation_listener_retry_at:
+        return
+    # Another thread is already connecting: don't wait on the auth path
+    if not _revocation_listener_lock.acquire(blocking=False):
+        return
+    try:
+        if _revocation_listener_running():
+            return
+        if _revocation_listener is not None:
+            # Broadcasts sent while the listener was down were missed
+            with _neg_cache_lock:
+                _NEG_CACHE.clear()
+        pubsub = _get_redis().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{_REVOKED_TOKEN_CHANNEL: _on_revocation_message})
+        _revocation_listener = pubsub.run_in_thread(
+            sleep_time=1, daemon=True, exception_handler=_on_revocation_listener_error
+        )
+    except Exception as e:
+        _revocation_listener_retry_at = time.monotonic() + _REVOCATION_LISTENER_RETRY
+        logger.warning(
+            f"Token revocation listener not started, retrying in "
+            f"{_REVOCATION_LISTENER_RETRY}s: {e}"
+        )
+    finally:
+        _revocation_listener_lock.release()
+
+
+def warm_up_password_hashing() -> None:
+    """Load the bcrypt backend now instead of on the first login.
+
+    passlib picks and self-tests its bcrypt backend lazily; doing it at
+    startup keeps that one-off cost out of a user's request.
+    """
+    pwd_context.handler("bcrypt").get_backend()
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+# Below this many pairs a thread pool costs more than it saves.
+_BATCH_VERIFY_MIN_PARALLEL = 4
+
+
+def verify_password_batch(pairs: List[Tuple[str, str]]) -> List[bool]:
+    """Verify many ``(plain_password, hashed_password)`` pairs at once.
+
+    The bcrypt backend releases the GIL while hashing, so checks run in
+    parallel across cores from a thread pool. Results keep the input order.
+    """
+    if len(pairs) < _BATCH_VERIFY_MIN_PARALLEL:
+        return [verify_password(plain, hashed) for plain, hashed in pairs]
+    workers = min(len(pairs), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda pair: verify_password(*pair), pairs))
+
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
 def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
-    now = datetime.utcnow()
+    # JWT claims are integer epoch seconds; no need to go through datetime.
+    now_ts = int(time.time())
     if expires_delta:
-        expire = now + expires_delta
+        expire_ts = now_ts + int(expires_delta.total_seconds())
     else:
-        expire = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire_ts = now_ts + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
     jti = str(uuid.uuid4())
     to_encode = {
-        "exp": expire,
+        "exp": expire_ts,
         "sub": str(subject),
         "jti": jti,
-        "iat": int(now.timestamp()),
+        "iat": now_ts,
     }
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, _jwt_key, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def revoke_token(jti: str, ttl: int) -> None:
+def decode_access_token(token: str) -> dict:
+    """Verify a token's signature and expiry and return its claims.
+
+    Raises ``jose.JWTError`` if the token is invalid or expired.
+    """
+    return jwt.decode(token, _jwt_key, algorithms=[ALGORITHM])
+
+
+def revoke_token(jti: str, ttl: int, pipe=None) -> None:
     """Add a token's jti to the Redis blocklist with a TTL (in seconds).
 
     The TTL should match the remaining lifetime of the token so the
     blocklist entry is automatically cleaned up after the token would
     have expired anyway.
+
+    If ``pipe`` is given the command is only queued on that pipeline and
+    the caller is responsible for executing it.
     """
-    _get_redis().setex(f"{_REVOKED_TOKEN_PREFIX}{jti}", ttl, "1")
+    _neg_cache_evict(jti)
+    target = pipe if pipe is not None else _get_redis()
+    target.setex(f"{_REVOKED_TOKEN_PREFIX}{jti}", ttl, "1")
+    target.publish(_REVOKED_TOKEN_CHANNEL, jti)
 
 
 def is_token_revoked(jti: str) -> bool:
-    """Check whether a token's jti has been revoked."""
-    return _get_redis().exists(f"{_REVOKED_TOKEN_PREFIX}{jti}") > 0
+    """Check whether a token's jti has been revoked.
+
+    Negative answers are cached in-process for ``_NEG_CACHE_TTL`` seconds.
+    """
+    if _neg_cache_hit(jti):
+        return False
+    _ensure_revocation_listener()
+    lookup_started = time.monotonic()
+    revoked = _get_redis().exists(f"{_REVOKED_TOKEN_PREFIX}{jti}") > 0
+    if not revoked:
+        # Skipped if an eviction for this jti arrived while EXISTS was in flight
+        _neg_cache_store(jti, lookup_started)
+    return revoked
+
+# ---------------------------------------------------------------------------
+# Audit log write-behind queue
+# ---------------------------------------------------------------------------
+# The API process starts a background flusher from the FastAPI lifespan; while
+# it runs, create_log() only enqueues a plain dict and the flusher writes up to
+# _LOG_BATCH_SIZE rows (or whatever arrived within _LOG_FLUSH_INTERVAL) with a
+# single bulk INSERT + commit. Without a running flusher (Celery workers,
+# scripts, tests) create_log() falls back to the synchronous add + commit.
+
+_LOG_BATCH_SIZE = 100
+_LOG_FLUSH_INTERVAL = 0.5  # seconds
+
+_log_queue: Optional[asyncio.Queue] = None
+_log_loop: Optional[asyncio.AbstractEventLoop] = None
+_log_flusher_task: Optional[asyncio.Task] = None
+
+
+def _write_log_batch(batch: List[dict]) -> None:
+    from app.core.db import engine
+
+    # One timestamp per batch; rows are at most _LOG_FLUSH_INTERVAL old.
+    now = datetime.utcnow()
+    for row in batch:
+        row.setdefault("created_at", now)
+    try:
+        with Session(engine) as session:
+            session.bulk_insert_mappings(OperationLog, batch)
+            session.commit()
+    except Exception as e:
+        logger.error(f"Failed to flush {len(batch)} operation logs: {e}")
+
+
+def _drain_log_queue() -> List[dict]:
+    batch = []
+    while _log_queue is not None and not _log_queue.empty():
+        batch.append(_log_queue.get_nowait())
+    return batch
+
+
+async def _collect_log_batch(batch: List[dict]) -> None:
+    loop = asyncio.get_running_loop()
+    batch.append(await _log_queue.get())
+    deadline = loop.time() + _LOG_FLUSH_INTERVAL
+    while len(batch) < _LOG_BATCH_SIZE:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(_log_queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+
+
+async def _flush_logs_forever() -> None:
+    while True:
+        batch: List[dict] = []
+        try:
+            await _collect_log_batch(batch)
+        except asyncio.CancelledError:
+            # Shutdown: rows already taken off the queue must not be lost.
+            if batch:
+                _write_log_batch(batch)
+            raise
+        await asyncio.to_thread(_write_log_batch, batch)
+
+
+def start_log_flusher() -> None:
+    """Start the background audit-log flusher on the running event loop."""
+    global _log_queue, _log_loop, _log_flusher_task
+    if _log_flusher_task is not None:
+        return
+    _log_queue = asyncio.Queue()
+    _log_loop = asyncio.get_running_loop()
+    _log_flusher_task = _log_loop.create_task(_flush_logs_forever())
+
+
+async def stop_log_flusher() -> None:
+    """Stop the flusher and synchronously write anything still queued."""
+    global _log_queue, _log_loop, _log_flusher_task
+    if _log_flusher_task is None:
+        return
+    _log_flusher_task.cancel()
+    try:
+        await _log_flusher_task
+    except asyncio.CancelledError:
+        pass
+    batch = _drain_log_queue()
+    _log_queue = _log_loop = _log_flusher_task = None
+    for start in range(0, len(batch), _LOG_BATCH_SIZE):
+        _write_log_batch(batch[start:start + _LOG_BATCH_SIZE])
+
 
 def create_log(session: Session, action: str, username: str, details: str = None, ip_address: str = None, status: str = "success"):
+    row = {
+        "action": action,
+        "username": username,
+        "details": details,
+        "ip_address": ip_address,
+        "status": status,
+    }
+    loop, queue = _log_loop, _log_queue
+    if loop is not None and queue is not None:
+        try:
+            # Sync endpoints run in the threadpool, so hand over via the loop.
+            loop.call_soon_threadsafe(queue.put_nowait, row)
+            return
+        except RuntimeError:
+            pass  # loop already closed, fall back to a direct write
     try:
-        log = OperationLog(
-            action=action,
-            username=username,
-            details=details,
-            ip_address=ip_address,
-            status=status
-        )
-        session.add(log)
+        session.add(OperationLog(**row))
         session.commit()
     except Exception as e:
-        print(f"Failed to create log: {e}")
+        logger.error(f"Failed to create log: {e}")
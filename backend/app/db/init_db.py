@@ -1,10 +1,29 @@
+from datetime import datetime
+from typing import List
+
 from sqlmodel import Session, select, text
 from app.core.config import settings
 from app.core.security import get_password_hash
-from app.models.user import User
+from app.models.user import User, USER_ROLE_ADMIN
 from app.models.system_config import SystemConfig
 from app.models.warmup_template import WarmupTemplate
 
+def _insert_ignore(session: Session, model, rows: List[dict]) -> None:
+    """INSERT ... ON CONFLICT DO NOTHING：多副本同时首次启动时不会互相撞唯一键。"""
+    if not rows:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for row in rows:
+            session.add(model(**row))
+        return
+    session.exec(insert(model).values(rows).on_conflict_do_nothing())
+
+
 def init_db(session: Session) -> None:
     # 检查是否已存在管理员
     user = session.exec(
@@ -12,21 +31,20 @@ def init_db(session: Session) -> None:
     ).first()
     
     if not user:
-        user = User(
-            username=settings.ADMIN_USERNAME,
-            hashed_password=get_password_hash(settings.ADMIN_PASSWORD),
-            is_superuser=True,
-        )
-        session.add(user)
-        session.commit()
-        session.refresh(user)
+        _insert_ignore(session, User, [{
+            "username": settings.ADMIN_USERNAME,
+            "hashed_password": get_password_hash(settings.ADMIN_PASSWORD),
+            "is_superuser": True,
+            "totp_enabled": False,
+            "is_active": True,
+            "role": USER_ROLE_ADMIN,
+        }])
     else:
         # Sync password from .env on every startup
         from app.core.security import verify_password
         if not verify_password(settings.ADMIN_PASSWORD, user.hashed_password):
             user.hashed_password = get_password_hash(settings.ADMIN_PASSWORD)
             session.add(user)
-            session.commit()
 
     # Initialize default system configurations
     defaults = {
@@ -38,19 +56,22 @@ def init_db(session: Session) -> None:
         "LLM_MODEL": {"value": "gpt-3.5-turbo", "desc": "LLM Model Name"}
     }
 
-    for key, info in defaults.items():
-        config = session.get(SystemConfig, key)
-        if not config:
-            session.add(SystemConfig(
-                key=key,
-                value=info["value"],
-                description=info["desc"]
-            ))
-            session.commit()
+    existing_keys = set(session.exec(
+        select(SystemConfig.key).where(SystemConfig.key.in_(defaults.keys()))
+    ).all())
+    now = datetime.utcnow()
+    _insert_ignore(session, SystemConfig, [
+        {"key": key, "value": info["value"], "description": info["desc"], "updated_at": now}
+        for key, info in defaults.items()
+        if key not in existing_keys
+    ])
 
     # --- 初始化默认养号模板 ---
     _init_warmup_templates(session)
 
+    # 管理员、默认配置、养号模板在同一个事务里提交
+    session.commit()
+
 
 def _init_warmup_templates(session: Session) -> None:
     existing = session.exec(select(WarmupTemplate).limit(1)).first()
@@ -113,4 +134,3 @@ def _init_warmup_templates(session: Session) -> None:
 
     for t in templates:
         session.add(t)
-    session.commit()
@@ -1,22 +1,26 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
-from fastapi.middleware.cors import CORSMiddleware
 from sqlmodel import Session
 from app.core.config import settings
 from app.api.v1 import router as api_router
 from app.core.db import init_db as init_tables, engine
 from app.db.init_db import init_db as seed_db
-from app.core.middleware import SecurityMiddleware
+from app.core.middleware import SecurityMiddleware, FastPathCORSMiddleware
 from app.core.exceptions import register_exception_handlers
+from app.core.responses import ORJSONResponse
 from app.core.logging import init_logging
+from app.core.security import start_log_flusher, stop_log_flusher, warm_up_password_hashing
+from app.services.intercept_service import start_capture_flusher, stop_capture_flusher, warm_up_intercept
+from app.services.llm import close_shared_http_client, enable_shared_http_client
 
 # 初始化日志系统
 init_logging()
 
 logger = logging.getLogger(__name__)
+validation_logger = logging.getLogger("api.validation")
 
 
 @asynccontextmanager
@@ -24,18 +28,33 @@ async def lifespan(app: FastAPI):
     # Startup: Create DB tables
     logger.info("Starting TGSC Backend...")
     init_tables()
+    warm_up_password_hashing()
     # Seed initial admin user
     with Session(engine) as session:
         seed_db(session)
+    start_log_flusher()
+    start_capture_flusher()
+    enable_shared_http_client()
+    # 预热 LLM 连接，不阻塞启动
+    warmup_task = asyncio.create_task(warm_up_intercept())
     logger.info(f"TGSC Backend started. Security enabled: {settings.SECURITY_ENABLED}")
     yield
     # Shutdown events
     logger.info("Shutting down TGSC Backend...")
+    warmup_task.cancel()
+    try:
+        await warmup_task
+    except asyncio.CancelledError:
+        pass
+    await stop_capture_flusher()
+    await close_shared_http_client()
+    await stop_log_flusher()
 
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/api/docs" if not settings.SECURITY_ENABLED else None,  # 生产环境禁用文档
     redoc_url="/api/redoc" if not settings.SECURITY_ENABLED else None,
 )
@@ -45,14 +64,14 @@ register_exception_handlers(app)
 
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
-    # 处理字符串或列表格式的 CORS 配置
+    # 处理字符串或列表格式的 CORS 配置；frozenset 让逐请求的 origin 判断为 O(1)
     if isinstance(settings.BACKEND_CORS_ORIGINS, str):
-        cors_origins = [origin.strip() for origin in settings.BACKEND_CORS_ORIGINS.split(",")]
+        cors_origins = frozenset(origin.strip() for origin in settings.BACKEND_CORS_ORIGINS.split(","))
     else:
-        cors_origins = [str(origin) for origin in settings.BACKEND_CORS_ORIGINS]
+        cors_origins = frozenset(str(origin) for origin in settings.BACKEND_CORS_ORIGINS)
     
     app.add_middleware(
-        CORSMiddleware,
+        FastPathCORSMiddleware,
         allow_origins=cors_origins,
         allow_credentials=True,
         allow_methods=["*"],
@@ -66,14 +85,15 @@ app.add_middleware(SecurityMiddleware)
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """处理请求验证错误"""
-    logger.warning(f"Validation Error on {request.url.path}: {exc.errors()}")
-    return JSONResponse(
+    errors = exc.errors()
+    validation_logger.warning("Validation Error on %s: %s", request.url.path, errors)
+    return ORJSONResponse(
         status_code=422,
         content={
             "success": False,
             "error_code": "VALIDATION_ERROR",
             "message": "请求参数验证失败",
-            "details": {"errors": exc.errors()}
+            "details": {"errors": errors}
         },
     )
 
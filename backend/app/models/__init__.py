@@ -1,25 +1,135 @@
+"""
+SQLModel 模型包。
+
+认证 / 启动路径用到的模型（User、SystemConfig、OperationLog、Account/Proxy）在导入时注册；
+其余模型按 PEP 562 在首次访问属性时才导入，Celery worker 等只用到少量模型的进程
+不必为全部表付出类定义和元数据注册的开销。需要完整元数据的地方
+（create_all、Alembic）调用 ``import_all_models()``。
+"""
+import importlib
+
 from .proxy import Proxy, ProxyCreate, ProxyRead
 from .account import Account, AccountCreate, AccountRead
-from .account_stats import AccountSendStats, AccountSendStatsRead
-from .target_user import TargetUser, TargetUserCreate, TargetUserRead
 from .system_config import SystemConfig
-from .send_task import SendTask, SendTaskCreate, SendTaskRead, SendRecord
-from .warmup_task import WarmupTask, WarmupTaskCreate, WarmupTaskRead
-from .warmup_template import WarmupTemplate, WarmupTemplateCreate, WarmupTemplateRead, WarmupTemplateUpdate
-from .chat_history import ChatHistory, ChatHistoryCreate, ChatHistoryRead
-from .script import Script, ScriptCreate, ScriptRead, ScriptTask, ScriptTaskCreate, ScriptTaskRead
-from .lead import Lead, LeadCreate, LeadRead, LeadInteraction, LeadInteractionCreate, LeadInteractionRead
 from .operation_log import OperationLog, OperationLogCreate, OperationLogRead
-from .keyword_monitor import KeywordMonitor, KeywordMonitorCreate, KeywordMonitorRead, KeywordMonitorUpdate, KeywordHit, KeywordHitRead
-from .invite_task import InviteTask, InviteTaskCreate, InviteTaskRead, InviteTaskUpdate
-from .invite_log import InviteLog, InviteLogCreate, InviteLogRead, InviteStats, AccountInviteStats
-from .scraping_task import ScrapingTask, ScrapingTaskCreate, ScrapingTaskRead
 from .user import User
 from .token import Token, TokenPayload
-from .ai_config import AIConfig, AIConfigCreate, AIConfigUpdate, AIConfigResponse
-from .campaign import Campaign, CampaignCreate, CampaignUpdate, CampaignRead
-from .source_group import SourceGroup, SourceGroupCreate, SourceGroupUpdate, SourceGroupRead
-from .funnel_group import FunnelGroup, FunnelGroupCreate, FunnelGroupUpdate, FunnelGroupRead
-from .ai_persona import AIPersona, AIPersonaCreate, AIPersonaUpdate, AIPersonaRead
-from .knowledge_base import KnowledgeBase, KnowledgeBaseCreate, KnowledgeBaseUpdate, KnowledgeBaseRead, CampaignKnowledgeLink
-from .group_message import GroupMessage, GroupMessageRead
\ No newline at end of file
+
+# 延迟导入：属性名 -> 子模块
+_LAZY_MODULES = {
+    "AccountSendStats": "account_stats",
+    "AccountSendStatsRead": "account_stats",
+    "TargetUser": "target_user",
+    "TargetUserCreate": "target_user",
+    "TargetUserRead": "target_user",
+    "SendTask": "send_task",
+    "SendTaskCreate": "send_task",
+    "SendTaskRead": "send_task",
+    "SendRecord": "send_task",
+    "WarmupTask": "warmup_task",
+    "WarmupTaskCreate": "warmup_task",
+    "WarmupTaskRead": "warmup_task",
+    "WarmupTemplate": "warmup_template",
+    "WarmupTemplateCreate": "warmup_template",
+    "WarmupTemplateRead": "warmup_template",
+    "WarmupTemplateUpdate": "warmup_template",
+    "ChatHistory": "chat_history",
+    "ChatHistoryCreate": "chat_history",
+    "ChatHistoryRead": "chat_history",
+    "Script": "script",
+    "ScriptCreate": "script",
+    "ScriptRead": "script",
+    "ScriptTask": "script",
+    "ScriptTaskCreate": "script",
+    "ScriptTaskRead": "script",
+    "Lead": "lead",
+    "LeadCreate": "lead",
+    "LeadRead": "lead",
+    "LeadInteraction": "lead",
+    "LeadInteractionCreate": "lead",
+    "LeadInteractionRead": "lead",
+    "KeywordMonitor": "keyword_monitor",
+    "KeywordMonitorCreate": "keyword_monitor",
+    "KeywordMonitorRead": "keyword_monitor",
+    "KeywordMonitorUpdate": "keyword_monitor",
+    "KeywordHit": "keyword_monitor",
+    "KeywordHitRead": "keyword_monitor",
+    "InviteTask": "invite_task",
+    "InviteTaskCreate": "invite_task",
+    "InviteTaskRead": "invite_task",
+    "InviteTaskUpdate": "invite_task",
+    "InviteLog": "invite_log",
+    "InviteLogCreate": "invite_log",
+    "InviteLogRead": "invite_log",
+    "InviteStats": "invite_log",
+    "AccountInviteStats": "invite_log",
+    "ScrapingTask": "scraping_task",
+    "ScrapingTaskCreate": "scraping_task",
+    "ScrapingTaskRead": "scraping_task",
+    "AIConfig": "ai_config",
+    "AIConfigCreate": "ai_config",
+    "AIConfigUpdate": "ai_config",
+    "AIConfigResponse": "ai_config",
+    "Campaign": "campaign",
+    "CampaignCreate": "campaign",
+    "CampaignUpdate": "campaign",
+    "CampaignRead": "campaign",
+    "SourceGroup": "source_group",
+    "SourceGroupCreate": "source_group",
+    "SourceGroupUpdate": "source_group",
+    "SourceGroupRead": "source_group",
+    "FunnelGroup": "funnel_group",
+    "FunnelGroupCreate": "funnel_group",
+    "FunnelGroupUpdate": "funnel_group",
+    "FunnelGroupRead": "funnel_group",
+    "AIPersona": "ai_persona",
+    "AIPersonaCreate": "ai_persona",
+    "AIPersonaUpdate": "ai_persona",
+    "AIPersonaRead": "ai_persona",
+    "KnowledgeBase": "knowledge_base",
+    "KnowledgeBaseCreate": "knowledge_base",
+    "KnowledgeBaseUpdate": "knowledge_base",
+    "KnowledgeBaseRead": "knowledge_base",
+    "CampaignKnowledgeLink": "knowledge_base",
+    "GroupMessage": "group_message",
+    "GroupMessageRead": "group_message",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY_MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def import_all_models() -> None:
+    """导入全部模型模块，确保 SQLModel.metadata 包含所有表。"""
+    for module in dict.fromkeys(_LAZY_MODULES.values()):
+        importlib.import_module(f".{module}", __name__)
+
+
+__all__ = [
+    "Proxy", "ProxyCreate", "ProxyRead", "Account", "AccountCreate", "AccountRead",
+    "AccountSendStats", "AccountSendStatsRead", "TargetUser", "TargetUserCreate",
+    "TargetUserRead", "SystemConfig", "SendTask", "SendTaskCreate", "SendTaskRead",
+    "SendRecord", "WarmupTask", "WarmupTaskCreate", "WarmupTaskRead", "WarmupTemplate",
+    "WarmupTemplateCreate", "WarmupTemplateRead", "WarmupTemplateUpdate", "ChatHistory",
+    "ChatHistoryCreate", "ChatHistoryRead", "Script", "ScriptCreate", "ScriptRead",
+    "ScriptTask", "ScriptTaskCreate", "ScriptTaskRead", "Lead", "LeadCreate",
+    "LeadRead", "LeadInteraction", "LeadInteractionCreate", "LeadInteractionRead",
+    "OperationLog", "OperationLogCreate", "OperationLogRead", "KeywordMonitor",
+    "KeywordMonitorCreate", "KeywordMonitorRead", "KeywordMonitorUpdate", "KeywordHit",
+    "KeywordHitRead", "InviteTask", "InviteTaskCreate", "InviteTaskRead",
+    "InviteTaskUpdate", "InviteLog", "InviteLogCreate", "InviteLogRead", "InviteStats",
+    "AccountInviteStats", "ScrapingTask", "ScrapingTaskCreate", "ScrapingTaskRead",
+    "User", "Token", "TokenPayload", "AIConfig", "AIConfigCreate", "AIConfigUpdate",
+    "AIConfigResponse", "Campaign", "CampaignCreate", "CampaignUpdate", "CampaignRead",
+    "SourceGroup", "SourceGroupCreate", "SourceGroupUpdate", "SourceGroupRead",
+    "FunnelGroup", "FunnelGroupCreate", "FunnelGroupUpdate", "FunnelGroupRead",
+    "AIPersona", "AIPersonaCreate", "AIPersonaUpdate", "AIPersonaRead", "KnowledgeBase",
+    "KnowledgeBaseCreate", "KnowledgeBaseUpdate", "KnowledgeBaseRead",
+    "CampaignKnowledgeLink", "GroupMessage", "GroupMessageRead",
+]
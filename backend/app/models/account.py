@@ -1,4 +1,5 @@
 from typing import Optional
+from sqlalchemy import event
 from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 from app.models.proxy import Proxy
@@ -51,3 +52,21 @@ class AccountRead(AccountBase):
     id: int
     created_at: datetime
     proxy: Optional[Proxy] = None
+
+
+# ============================================
+# 设备指纹在入库时固定
+# ============================================
+# 指纹跨重连变化会被 Telegram 风控识别：所有创建账号的路径（注册、上传 session、
+# tdata / 压缩包导入、API 创建）在插入时统一补齐，之后每次登录只读这三列
+
+def _fill_device_fingerprint(mapper, connection, target):
+    if not target.device_model:
+        from app.services.device_generator import DeviceGenerator
+        device_info = DeviceGenerator.generate()
+        target.device_model = device_info["device_model"]
+        target.system_version = device_info["system_version"]
+        target.app_version = device_info["app_version"]
+
+
+event.listen(Account, "before_insert", _fill_device_fingerprint)
@@ -3,15 +3,20 @@
 用于跟踪每个账号的发送行为，防止封号
 """
 from typing import Optional
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Index
 from datetime import datetime, date
 
 
 class AccountSendStats(SQLModel, table=True):
     """账号每日发送统计"""
+    # 联合唯一索引：每个账号每天只有一条记录（查询总是 account_id + stat_date）
+    __table_args__ = (
+        Index("ix_stats_acct_date", "account_id", "stat_date", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    account_id: int = Field(foreign_key="account.id", index=True)
-    stat_date: date = Field(index=True)  # 统计日期
+    account_id: int = Field(foreign_key="account.id")
+    stat_date: date  # 统计日期
     
     # 发送计数
     send_count: int = Field(default=0)  # 今日已发送数量
@@ -29,10 +34,6 @@ class AccountSendStats(SQLModel, table=True):
     # 风险标记
     flood_wait_count: int = Field(default=0)  # 今日触发 FloodWait 次数
     error_count: int = Field(default=0)  # 今日错误次数
-    
-    class Config:
-        # 联合唯一索引：每个账号每天只有一条记录
-        table_name = "accountsendstats"
 
 
 class AccountSendStatsRead(SQLModel):
@@ -1,16 +1,23 @@
 from typing import Optional
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Index
+from sqlalchemy import BigInteger, Column
 from datetime import datetime
 
 class ChatHistoryBase(SQLModel):
-    account_id: int = Field(index=True, foreign_key="account.id")
-    target_user_id: Optional[int] = Field(default=None, index=True) # ID from TargetUser table if applicable, or just raw telegram ID
+    account_id: int = Field(foreign_key="account.id")
+    target_user_id: Optional[int] = Field(default=None, sa_column=Column(BigInteger)) # ID from TargetUser table if applicable, or just raw telegram ID (BigInt)
     target_username: Optional[str] = None
     role: str = Field(default="user") # user (them) or assistant (us)
     content: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class ChatHistory(ChatHistoryBase, table=True):
+    # 回复上下文 / 草稿依据：按 (账号, 对方) 取最近 N 条，ORDER BY created_at DESC 直接走索引；
+    # 前导列已覆盖原来的 account_id 单列查询
+    __table_args__ = (
+        Index("ix_chathistory_account_target_created", "account_id", "target_user_id", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
 class ChatHistoryCreate(ChatHistoryBase):
@@ -7,16 +7,16 @@
 4. ROI分析
 """
 from typing import Optional
-from sqlmodel import SQLModel, Field
-from sqlalchemy import BigInteger, Column, Text
+from sqlmodel import SQLModel, Field, Index
+from sqlalchemy import BigInteger, Column, Text, text
 from datetime import datetime
 
 
 class InviteLogBase(SQLModel):
     """邀请操作日志"""
     # === 关联信息 ===
-    task_id: int = Field(index=True)  # 关联的任务ID
-    account_id: int = Field(index=True)  # 执行拉人的账号ID
+    task_id: int  # 关联的任务ID（索引见 InviteLog.__table_args__）
+    account_id: int  # 执行拉人的账号ID（索引见 InviteLog.__table_args__）
     target_user_id: int = Field(index=True)  # 目标用户ID
     target_telegram_id: int = Field(sa_column=Column(BigInteger, index=True))  # Telegram用户ID
     target_username: Optional[str] = None  # 目标用户名
@@ -51,6 +51,21 @@ class InviteLogBase(SQLModel):
 
 
 class InviteLog(InviteLogBase, table=True):
+    # 复合索引覆盖邀请服务的统计查询，前导列同时替代 task_id / account_id 单列索引
+    __table_args__ = (
+        # 任务统计：task_id 过滤后按 (status, error_code) 分组
+        Index("ix_invitelog_task_status_error", "task_id", "status", "error_code"),
+        # 账号今日 / 总计数：account_id 过滤，按 created_at、status 条件计数
+        Index("ix_invitelog_account_created_status", "account_id", "created_at", "status"),
+        # 每个账号最近一次风控：只索引 peer_flood 行，PG 上附带等待秒数做仅索引扫描
+        Index(
+            "ix_invitelog_account_flood", "account_id", "created_at",
+            postgresql_where=text("error_code = 'peer_flood'"),
+            postgresql_include=["flood_wait_seconds"],
+            sqlite_where=text("error_code = 'peer_flood'"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
 
@@ -76,6 +91,20 @@ class InviteLogRead(InviteLogBase):
     id: int
 
 
+class InviteLogBrief(SQLModel):
+    """任务日志列表项：只含页面展示用到的列"""
+    id: int
+    account_id: int
+    account_username: Optional[str] = None
+    target_username: Optional[str] = None
+    target_telegram_id: int
+    status: str
+    error_code: Optional[str] = None
+    error_message: Optional[str] = None
+    created_at: datetime
+    duration_ms: Optional[int] = None
+
+
 # === 统计相关模型 ===
 
 class InviteStats(SQLModel):
@@ -1,10 +1,17 @@
-from typing import Optional, List
-from sqlmodel import SQLModel, Field, Relationship
+from typing import Optional
+from sqlalchemy import Column, LargeBinary, event, inspect, text
+from sqlalchemy.orm import Session as _OrmSession, object_session
+from app.models.types import JSONText
+from sqlmodel import SQLModel, Field, Relationship, Index
 from datetime import datetime
 
+# 语义相似度默认阈值：场景向量 cosine 约 0.78~0.83 区间才可靠区分意图，
+# 取 0.80；LLM 精判的置信度同样按此阈值判定
+DEFAULT_SIMILARITY_THRESHOLD = 80
+
 class KeywordMonitorBase(SQLModel):
     keyword: str = Field(index=True)
-    match_type: str = Field(default="partial")  # exact, partial, regex, semantic
+    match_type: str = Field(default="partial")  # exact, partial, word, regex, semantic
     target_groups: Optional[str] = None  # Comma separated list of group links/IDs
     action_type: str = Field(default="notify")  # notify, auto_reply, trigger_script
     reply_script_id: Optional[int] = None
@@ -31,8 +38,8 @@ class KeywordMonitorBase(SQLModel):
     # ============================================
     # 语义匹配模式 (match_type="semantic" 时生效)
     scenario_description: Optional[str] = None  # 业务场景描述 (AI 理解的目标)
-    auto_keywords: Optional[str] = None  # AI 自动生成的关键词 (JSON数组格式, 用于Level1粗筛)
-    similarity_threshold: int = Field(default=70)  # 语义相似度阈值 (0-100, Level2精判)
+    auto_keywords: Optional[str] = Field(default=None, sa_column=Column(JSONText))  # AI 自动生成的关键词 (JSON数组格式, 用于Level1粗筛)
+    similarity_threshold: int = Field(default=DEFAULT_SIMILARITY_THRESHOLD)  # 语义相似度阈值 (0-100, Level2精判)
     
     # ============================================
     # === 主动式营销模式 ===
@@ -59,10 +66,25 @@ class KeywordMonitorBase(SQLModel):
     ai_persona_id: Optional[int] = Field(default=None, foreign_key="ai_persona.id")
 
 class KeywordMonitor(KeywordMonitorBase, table=True):
+    # 只含启用规则的部分索引：监听进程重载 `WHERE is_active` 时只读活跃行，
+    # 与历史停用规则数量无关
+    __table_args__ = (
+        Index(
+            "ix_kw_active_type", "match_type",
+            postgresql_where=text("is_active"),
+            sqlite_where=text("is_active"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    
-    hits: List["KeywordHit"] = Relationship(back_populates="keyword_monitor")
+    # scenario_description 的 int8 量化向量（semantic 规则），描述变更时清空
+    scenario_embedding_q8: Optional[bytes] = Field(
+        default=None, sa_column=Column(LargeBinary, nullable=True)
+    )
+    # 生成 scenario_embedding_q8 的 embedding 模型；模型不同则向量与阈值都不可复用
+    embedding_model: Optional[str] = Field(default=None, max_length=64)
+    # 不声明 hits 反向关系：命中记录量大，按 keyword_monitor_id 显式查询
 
 class KeywordMonitorCreate(KeywordMonitorBase):
     pass
@@ -113,10 +135,65 @@ class KeywordHitBase(SQLModel):
     status: str = Field(default="pending")  # pending, handled, ignored
 
 class KeywordHit(KeywordHitBase, table=True):
+    # 待处理队列：status='pending' ORDER BY detected_at DESC 分页。
+    # 带上 keyword_monitor_id 作覆盖列，列表页不必回表取外键；
+    # pending 部分索引只含待处理行，大小与历史命中总量无关
+    __table_args__ = (
+        Index("ix_keywordhit_status_detected", "status", "detected_at", "keyword_monitor_id"),
+        Index(
+            "ix_keywordhit_pending", "detected_at", "keyword_monitor_id",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     
-    keyword_monitor: Optional[KeywordMonitor] = Relationship(back_populates="hits")
+    # 只保留单向多对一，列表读取用 selectinload 批量预加载
+    keyword_monitor: Optional[KeywordMonitor] = Relationship()
 
 class KeywordHitRead(KeywordHitBase):
     id: int
     keyword_monitor: Optional[KeywordMonitorRead] = None
+
+
+# ============================================
+# 规则变更 → 递增匹配器版本号
+# ============================================
+# 监听进程的运行时计数 / 向量回写不影响匹配结构，不触发重建
+_RUNTIME_FIELDS = frozenset({
+    "daily_reply_count", "last_reply_date", "scenario_embedding_q8", "embedding_model",
+})
+_CHANGED_FLAG = "keyword_monitors_changed"
+
+
+def _mark_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info[_CHANGED_FLAG] = True
+
+
+def _mark_changed_on_update(mapper, connection, target):
+    state = inspect(target)
+    for attr in state.mapper.column_attrs:
+        if attr.key not in _RUNTIME_FIELDS and state.attrs[attr.key].history.has_changes():
+            _mark_changed(mapper, connection, target)
+            return
+
+
+def _bump_after_commit(session):
+    # 提交后再递增，监听进程重新加载时一定能读到新数据
+    if session.info.pop(_CHANGED_FLAG, False):
+        from app.services.keyword_matcher import bump_monitors_version
+        bump_monitors_version()
+
+
+def _clear_after_rollback(session, previous_transaction):
+    session.info.pop(_CHANGED_FLAG, None)
+
+
+event.listen(KeywordMonitor, "after_insert", _mark_changed)
+event.listen(KeywordMonitor, "after_update", _mark_changed_on_update)
+event.listen(KeywordMonitor, "after_delete", _mark_changed)
+event.listen(_OrmSession, "after_commit", _bump_after_commit)
+event.listen(_OrmSession, "after_soft_rollback", _clear_after_rollback)
@@ -1,16 +1,18 @@
-from typing import Optional, List
-from sqlmodel import SQLModel, Field, Relationship
+from typing import Optional
+from sqlmodel import SQLModel, Field, Index
+from sqlalchemy import BigInteger, Column
 from datetime import datetime
+from app.models.types import JSONText
 
 class LeadBase(SQLModel):
     account_id: int = Field(index=True, foreign_key="account.id")
-    telegram_user_id: int = Field(index=True)
+    telegram_user_id: int = Field(sa_column=Column(BigInteger, index=True, nullable=False))  # BigInt避免溢出
     username: Optional[str] = None
     first_name: Optional[str] = None
     last_name: Optional[str] = None
     phone: Optional[str] = None
     status: str = Field(default="new") # new, contacted, replied, interested, converted, closed
-    tags_json: str = "[]" # ["high_value", "spam"]
+    tags_json: str = Field(default="[]", sa_column=Column(JSONText, nullable=False, server_default="[]")) # ["high_value", "spam"]
     notes: Optional[str] = None
     last_interaction_at: datetime = Field(default_factory=datetime.utcnow)
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -24,8 +26,14 @@ class LeadBase(SQLModel):
     claimed_at: Optional[datetime] = None
 
 class Lead(LeadBase, table=True):
+    # PG 上 tags_json 为 JSONB，GIN(jsonb_path_ops) 支持 `tags_json @> '["high_value"]'`
+    __table_args__ = (
+        Index("ix_lead_tags_gin", "tags_json", postgresql_using="gin",
+              postgresql_ops={"tags_json": "jsonb_path_ops"}),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
-    interactions: List["LeadInteraction"] = Relationship(back_populates="lead")
+    # 互动记录按 lead_id 显式查询，不挂 Relationship，避免逐行懒加载
 
 class LeadCreate(LeadBase):
     pass
@@ -42,7 +50,6 @@ class LeadInteractionBase(SQLModel):
 
 class LeadInteraction(LeadInteractionBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    lead: Optional[Lead] = Relationship(back_populates="interactions")
 
 class LeadInteractionCreate(LeadInteractionBase):
     pass
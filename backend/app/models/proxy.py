@@ -1,5 +1,5 @@
 from typing import Optional, List
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Index, Relationship
 from datetime import datetime
 
 
@@ -9,7 +9,7 @@ class ProxyBase(SQLModel):
     username: Optional[str] = None
     password: Optional[str] = None
     protocol: str = Field(default="socks5")
-    status: str = Field(default="active", index=True)  # active, dead - 添加索引
+    status: str = Field(default="active")  # active, dead - 由 ix_proxy_status_cat_fail 前导列覆盖
     category: str = Field(default="static", index=True)  # static, rotating - 添加索引
     provider_type: str = Field(default="datacenter", index=True)  # isp, datacenter - 添加索引
     country: Optional[str] = Field(default=None, index=True)  # 添加索引用于按国家筛选
@@ -19,6 +19,11 @@ class ProxyBase(SQLModel):
 
 
 class Proxy(ProxyBase, table=True):
+    __table_args__ = (
+        # 注册取代理：WHERE status, category ORDER BY fail_count
+        Index("ix_proxy_status_cat_fail", "status", "category", "fail_count"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     created_at: Optional[datetime] = Field(default_factory=datetime.utcnow, index=True)  # 添加索引
     
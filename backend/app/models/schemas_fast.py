@@ -0,0 +1,76 @@
+"""
+列表接口的快速序列化
+
+KeywordMonitorRead / LeadRead / TargetUserRead 字段多、列表行数大，
+逐行走 Pydantic 校验 + 序列化是这些接口的主要 CPU 开销。
+这里按 Read 模型的字段自动生成对应的 msgspec.Struct（gc=False），
+直接从 ORM 对象属性构造并由 C 实现编码为 JSON；输出与 response_model 一致。
+
+msgspec 未安装时退化为按 Read 模型字段取属性、orjson 编码，同样跳过 Pydantic。
+路由仍保留 response_model 用于 OpenAPI 文档，返回 Response 时 FastAPI 不再二次校验。
+"""
+import logging
+from functools import lru_cache
+from typing import Any, Iterable, List, Tuple, Type
+
+from fastapi import Response
+from sqlmodel import SQLModel
+
+from app.core.responses import ORJSONResponse
+from app.models.keyword_monitor import KeywordMonitorRead
+from app.models.lead import LeadRead
+from app.models.target_user import TargetUserRead
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+    logger.info("msgspec not installed, list endpoints encode with orjson")
+
+
+@lru_cache(maxsize=None)
+def _field_names(read_model: Type[SQLModel]) -> Tuple[str, ...]:
+    return tuple(read_model.model_fields)
+
+
+@lru_cache(maxsize=None)
+def struct_for(read_model: Type[SQLModel]):
+    """按 Read 模型字段生成同名 msgspec.Struct（kw_only，字段顺序与模型一致）"""
+    fields = []
+    for name, info in read_model.model_fields.items():
+        if info.is_required():
+            fields.append((name, info.annotation))
+        elif info.default_factory is not None:
+            fields.append((name, info.annotation, msgspec.field(default_factory=info.default_factory)))
+        else:
+            fields.append((name, info.annotation, info.default))
+    return msgspec.defstruct(read_model.__name__, fields, kw_only=True, gc=False)
+
+
+if MSGSPEC_AVAILABLE:
+    _encoder = msgspec.json.Encoder()
+    # 导入时生成列表接口用到的 Struct，首个请求不承担 defstruct 开销
+    for _read_model in (KeywordMonitorRead, LeadRead, TargetUserRead):
+        struct_for(_read_model)
+
+
+def _as_dicts(rows: Iterable[Any], read_model: Type[SQLModel]) -> List[dict]:
+    names = _field_names(read_model)
+    return [{name: getattr(row, name) for name in names} for row in rows]
+
+
+def encode_list(rows: Iterable[Any], read_model: Type[SQLModel]) -> Response:
+    """把 ORM 行列表按 read_model 的字段编码为 JSON 响应"""
+    rows = list(rows)
+    if MSGSPEC_AVAILABLE:
+        struct = struct_for(read_model)
+        try:
+            items = [msgspec.convert(row, struct, from_attributes=True) for row in rows]
+            return Response(content=_encoder.encode(items), media_type="application/json")
+        except msgspec.ValidationError as e:
+            # 历史脏数据（如非空字段为 NULL）不让整页失败，退回逐字段取值
+            logger.warning(f"msgspec convert failed for {read_model.__name__}: {e}")
+    return ORJSONResponse(_as_dicts(rows, read_model))
@@ -1,13 +1,15 @@
 from typing import Optional
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Column
 from datetime import datetime
+from app.models.types import JSONText
 
 class ScrapingTaskBase(SQLModel):
     task_type: str  # join_group, join_batch, scrape_members
     status: str = Field(default="pending")  # pending, running, completed, failed
     account_ids_json: str = "[]"  # JSON array of account ids used
     group_links_json: str = "[]"  # JSON array of group links
-    result_json: str = "{}"  # JSON result details
+    result_json: str = Field(default="{}", sa_column=Column(JSONText, nullable=False, server_default="{}"))  # JSON result details
     success_count: int = Field(default=0)
     fail_count: int = Field(default=0)
     error_message: Optional[str] = None
@@ -1,6 +1,8 @@
 from typing import Optional, List, Dict
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Index
+from sqlalchemy import Column, text
 from datetime import datetime
+from app.models.types import JSONText
 import json
 
 class ScriptBase(SQLModel):
@@ -24,7 +26,7 @@ class ScriptRead(ScriptBase):
 class ScriptTaskBase(SQLModel):
     script_id: int = Field(foreign_key="script.id")
     target_group: str
-    account_mapping_json: str = "{}" # Map role_name -> account_id
+    account_mapping_json: str = Field(default="{}", sa_column=Column(JSONText, nullable=False, server_default="{}")) # Map role_name -> account_id
     status: str = Field(default="pending") # pending, running, completed, failed
     current_step: int = Field(default=0)
     min_delay: int = 5
@@ -32,6 +34,15 @@ class ScriptTaskBase(SQLModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class ScriptTask(ScriptTaskBase, table=True):
+    # 待执行队列：只索引 pending 行，已完成的历史任务不进索引
+    __table_args__ = (
+        Index(
+            "ix_scripttask_pending_created", "created_at",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     script: Optional[Script] = Relationship(back_populates="tasks")
 
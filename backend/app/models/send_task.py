@@ -1,5 +1,5 @@
 from typing import Optional, List
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Index
 from datetime import datetime
 
 
@@ -29,13 +29,20 @@ class SendTaskRead(SendTaskBase):
 
 
 class SendRecordBase(SQLModel):
-    task_id: int = Field(foreign_key="sendtask.id", index=True)  # 添加索引用于关联查询
-    account_id: int = Field(foreign_key="account.id", index=True)  # 添加索引
+    task_id: int = Field(foreign_key="sendtask.id")  # 由复合索引 (task_id, sent_at) 覆盖
+    account_id: int = Field(foreign_key="account.id")  # 由复合索引 (account_id, sent_at) 覆盖
     target_user_id: int = Field(foreign_key="targetuser.id", index=True)  # 添加索引
-    status: str = Field(index=True)  # success, failed - 添加索引
+    status: str  # success, failed
     error_message: Optional[str] = None
     sent_at: datetime = Field(default_factory=datetime.utcnow, index=True)  # 添加索引用于时间查询
 
 
 class SendRecord(SendRecordBase, table=True):
+    # 复合索引对齐实际查询：任务详情按 task_id 过滤后按 sent_at 倒序，
+    # 账号维度同理；索引扫描直接产出有序结果，省去过滤后的排序
+    __table_args__ = (
+        Index("ix_sendrecord_task_sent", "task_id", "sent_at"),
+        Index("ix_sendrecord_account_sent", "account_id", "sent_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
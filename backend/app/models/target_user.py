@@ -1,6 +1,7 @@
 from typing import Optional
-from sqlmodel import SQLModel, Field
-from sqlalchemy import BigInteger, Column, Text
+from sqlmodel import SQLModel, Field, Index
+from sqlalchemy import BigInteger, Column, Text, text
+from app.models.types import JSONText
 from datetime import datetime
 
 
@@ -14,7 +15,7 @@ class TargetUserBase(SQLModel):
     source_group_id: Optional[int] = Field(default=None, sa_column=Column(BigInteger, index=True))  # BigInt
     status: str = Field(default="new", index=True)  # new, contacted - 添加索引
     last_active: Optional[datetime] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)  # 添加索引
+    created_at: datetime = Field(default_factory=datetime.utcnow)  # 由 (created_at, ai_score) 复合索引覆盖
     
     # === 用户评分 ===
     engagement_score: int = Field(default=0, index=True)  # 互动评分 - 添加索引用于排序
@@ -23,7 +24,7 @@ class TargetUserBase(SQLModel):
     marketing_stage: str = Field(default="new", index=True)  # 添加索引用于筛选
     
     # === 自动标签 ===
-    tags: Optional[str] = None  # JSON 格式标签，如 ["price_sensitive", "high_intent"]
+    tags: Optional[str] = Field(default=None, sa_column=Column(JSONText))  # JSON 格式标签，如 ["price_sensitive", "high_intent"]
     
     # === 最后命中关键词 ===
     last_hit_keyword: Optional[str] = None
@@ -31,12 +32,12 @@ class TargetUserBase(SQLModel):
     
     # === AI 画像扩展 (STRATEGIC_PLAN 2.7) ===
     ai_score: Optional[int] = Field(default=None, index=True)  # AI评分 0-100
-    ai_tags: Optional[str] = None  # AI生成的标签 JSON数组
+    ai_tags: Optional[str] = Field(default=None, sa_column=Column(JSONText))  # AI生成的标签 JSON数组
     ai_summary: Optional[str] = None  # AI生成的用户摘要
-    funnel_stage: str = Field(default="raw", index=True)  # raw/qualified/contacted/replied/converted
+    funnel_stage: str = Field(default="raw")  # raw/qualified/contacted/replied/converted
     
     # === 拉人状态 (批量邀请功能) ===
-    invite_status: str = Field(default="untried", index=True)  
+    invite_status: str = Field(default="untried")  
     # untried: 未尝试, success: 已成功拉入, privacy_restricted: 隐私限制, 
     # banned: 被封禁, not_mutual: 非双向联系人, other_error: 其他错误
     
@@ -50,6 +51,30 @@ class TargetUserBase(SQLModel):
 
 
 class TargetUser(TargetUserBase, table=True):
+    # funnel_stage 筛选 + ai_score 排序 / 阈值（邀请候选、工作流晋级）；
+    # invite_status + invite_attempted_at 用于邀请冷却判断。
+    # 复合索引的前导列覆盖了原来的单列索引
+    __table_args__ = (
+        Index("ix_targetuser_funnel_score", "funnel_stage", "ai_score"),
+        Index("ix_targetuser_invite_status_attempted", "invite_status", "invite_attempted_at"),
+        # 按创建时间统计截获量 / 高分数，两个计数都可只扫索引
+        Index("ix_targetuser_created_score", "created_at", "ai_score"),
+        # 邀请候选：与 filter_target_users 的排序一致、只含未成功的用户，
+        # 规划器按索引顺序读到 max_targets 行即可停止，不必排序全部候选。
+        # SQLite 索引不支持 NULLS LAST，只在 PG 上创建
+        Index(
+            "ix_targetuser_eligible",
+            text("ai_score DESC NULLS LAST"), text("engagement_score DESC"),
+            text("created_at DESC"), text("id DESC"),
+            postgresql_where=text("invite_status <> 'success'"),
+        ).ddl_if(dialect="postgresql"),
+        # PG 上 tags / ai_tags 为 JSONB，按标签筛选走 GIN
+        Index("ix_targetuser_tags_gin", "tags", postgresql_using="gin",
+              postgresql_ops={"tags": "jsonb_path_ops"}),
+        Index("ix_targetuser_ai_tags_gin", "ai_tags", postgresql_using="gin",
+              postgresql_ops={"ai_tags": "jsonb_path_ops"}),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
 
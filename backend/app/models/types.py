@@ -0,0 +1,165 @@
+"""
+自定义列类型
+
+JSONText: 应用层仍然读写 JSON 字符串（API schema 与调用方不变），
+PostgreSQL 上落库为 JSONB，可以建 GIN 索引做 `@>` 包含查询；
+其他方言（SQLite 测试库）退化为 TEXT。
+
+json_array_contains / json_array_contains_any / json_array_merge:
+在库内完成 JSON 数组的包含查询（单个 / 任一元素）与去重合并。
+
+epoch_seconds: 时间列转为 Unix 秒数，用于跨方言的“时间 + 按行变化的秒数”比较。
+"""
+import json
+
+from sqlalchemy import Boolean, Float, String, Text, bindparam, or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import TypeDecorator, UserDefinedType
+
+
+class _RawJSONB(UserDefinedType):
+    """不带 bind/result 处理器的 JSONB：字符串原样交给驱动，由 PG 隐式转换"""
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return "JSONB"
+
+
+class JSONText(TypeDecorator):
+    """Python 侧为 JSON 字符串；PostgreSQL 存 JSONB，其余存 TEXT"""
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(_RawJSONB())
+        return dialect.type_descriptor(Text())
+
+    def process_result_value(self, value, dialect):
+        # 连接上注册了 jsonb 原样返回（见 app.core.db）；未注册时驱动会解析成对象
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value, ensure_ascii=False)
+
+
+class json_array_contains(FunctionElement):
+    """
+    JSON 数组列包含某个元素。
+    PostgreSQL: `col @> '["value"]'::jsonb`（走 GIN 索引）；其他方言退化为 LIKE。
+    """
+    type = Boolean()
+    inherit_cache = True
+    name = "json_array_contains"
+
+    def __init__(self, column, value: str):
+        super().__init__(
+            column,
+            bindparam(None, json.dumps([value], ensure_ascii=False), type_=Text),
+            bindparam(None, value, type_=String),
+        )
+
+
+@compiles(json_array_contains)
+def _compile_json_array_contains(element, compiler, **kw):
+    column, _, value = element.clauses.clauses
+    return compiler.process(column.contains(value), **kw)
+
+
+@compiles(json_array_contains, "postgresql")
+def _compile_json_array_contains_pg(element, compiler, **kw):
+    column, array, _ = element.clauses.clauses
+    return f"{compiler.process(column, **kw)} @> CAST({compiler.process(array, **kw)} AS JSONB)"
+
+
+class json_array_contains_any(FunctionElement):
+    """
+    JSON 数组列包含给定元素中的任意一个，代替逐个元素 OR 起来的 json_array_contains。
+    PostgreSQL: `col @> ANY(ARRAY['["a"]'::jsonb, ...])`（jsonb_path_ops 的 GIN 索引可用）；
+    其他方言退化为 LIKE 的 OR。
+    """
+    type = Boolean()
+    inherit_cache = True
+    name = "json_array_contains_any"
+
+    def __init__(self, column, values):
+        values = list(values)
+        super().__init__(
+            column,
+            *(bindparam(None, json.dumps([value], ensure_ascii=False), type_=Text) for value in values),
+            *(bindparam(None, value, type_=String) for value in values),
+        )
+
+
+def _split_contains_any(element):
+    column, *params = element.clauses.clauses
+    half = len(params) // 2
+    return column, params[:half], params[half:]
+
+
+@compiles(json_array_contains_any)
+def _compile_json_array_contains_any(element, compiler, **kw):
+    column, _, values = _split_contains_any(element)
+    # 加括号：非原生布尔方言会在函数表达式后追加 `= 1`
+    return f"({compiler.process(or_(*(column.contains(value) for value in values)), **kw)})"
+
+
+@compiles(json_array_contains_any, "postgresql")
+def _compile_json_array_contains_any_pg(element, compiler, **kw):
+    column, arrays, _ = _split_contains_any(element)
+    items = ", ".join(f"CAST({compiler.process(array, **kw)} AS JSONB)" for array in arrays)
+    return f"{compiler.process(column, **kw)} @> ANY(ARRAY[{items}])"
+
+
+class json_array_merge(FunctionElement):
+    """
+    JSON 数组列与一组新元素去重合并，用作 UPDATE 的 SET 值，省掉读-改-写。
+    PostgreSQL: jsonb `||` 拼接后 jsonb_agg(DISTINCT)；其他方言（SQLite）用 json_each + UNION。
+    """
+    type = Text()
+    inherit_cache = True
+    name = "json_array_merge"
+
+    def __init__(self, column, values):
+        super().__init__(
+            column,
+            bindparam(None, json.dumps(list(values), ensure_ascii=False), type_=Text),
+        )
+
+
+@compiles(json_array_merge)
+def _compile_json_array_merge(element, compiler, **kw):
+    column, values = (compiler.process(c, **kw) for c in element.clauses.clauses)
+    return (
+        f"(SELECT json_group_array(value) FROM "
+        f"(SELECT value FROM json_each({column}) UNION SELECT value FROM json_each({values})))"
+    )
+
+
+@compiles(json_array_merge, "postgresql")
+def _compile_json_array_merge_pg(element, compiler, **kw):
+    column, values = (compiler.process(c, **kw) for c in element.clauses.clauses)
+    return (
+        f"(SELECT COALESCE(jsonb_agg(DISTINCT x), '[]'::jsonb) FROM "
+        f"jsonb_array_elements_text({column} || CAST({values} AS JSONB)) AS x)"
+    )
+
+
+class epoch_seconds(FunctionElement):
+    """
+    时间列（naive UTC）转 Unix 秒数。
+    PostgreSQL: EXTRACT(EPOCH FROM col)；其他方言（SQLite）用 strftime('%s')。
+    """
+    type = Float()
+    inherit_cache = True
+    name = "epoch_seconds"
+
+
+@compiles(epoch_seconds)
+def _compile_epoch_seconds(element, compiler, **kw):
+    return f"CAST(strftime('%s', {compiler.process(element.clauses, **kw)}) AS INTEGER)"
+
+
+@compiles(epoch_seconds, "postgresql")
+def _compile_epoch_seconds_pg(element, compiler, **kw):
+    return f"EXTRACT(EPOCH FROM {compiler.process(element.clauses, **kw)})"
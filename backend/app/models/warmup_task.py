@@ -1,5 +1,6 @@
 from typing import Optional, List
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Index
+from sqlalchemy import text
 from datetime import datetime
 
 class WarmupTaskBase(SQLModel):
@@ -17,6 +18,15 @@ class WarmupTaskBase(SQLModel):
     error_message: Optional[str] = None
 
 class WarmupTask(WarmupTaskBase, table=True):
+    # 自动养号去重与监控面板只查 pending / running 任务；部分索引大小与历史任务总量无关
+    __table_args__ = (
+        Index(
+            "ix_warmuptask_active", "status", "created_at",
+            postgresql_where=text("status IN ('pending', 'running')"),
+            sqlite_where=text("status IN ('pending', 'running')"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
 
 class WarmupTaskCreate(WarmupTaskBase):
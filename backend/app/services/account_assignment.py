@@ -184,6 +184,8 @@ def auto_assign(
                 acct.ai_persona_id = entry["ai_persona_id"]
             session.add(acct)
         session.commit()
+        from app.services.intercept_service import invalidate_sniper_cache
+        invalidate_sniper_cache()
         logger.info(f"auto_assign applied to {len(plan)} accounts (strategy={strategy})")
 
     return {
@@ -1,17 +1,26 @@
+import asyncio
 import logging
-from typing import List, Optional
-from datetime import datetime
-from sqlmodel import Session, select
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import orjson
+from sqlmodel import Session, select, update
 from pyrogram import Client, enums
 from app.models.account import Account
 from app.models.chat_history import ChatHistory
 from app.models.lead import Lead
+from app.models.types import json_array_merge
 from app.services.telegram_client import _create_client_and_run
 from app.services.llm import LLMService
 from app.services.websocket_manager import manager as ws_manager
 
 logger = logging.getLogger(__name__)
 
+
+def _utcnow() -> datetime:
+    """naive UTC（库里时间列均为不带时区的 UTC），替代已弃用的 datetime.utcnow()"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class AIReplyService:
     def __init__(self, db_session: Session):
         self.session = db_session
@@ -30,69 +39,87 @@ class AIReplyService:
             return
 
         async def op(client: Client):
-            # Get dialogs with unread messages
+            # 先收集有未读的私聊（非私聊直接跳过），再并发拉取各自的未读历史，
+            # 总耗时取决于最慢的一次 RPC，而不是逐个对话等待之和
             # Note: client.get_dialogs() is an async generator
+            private_unread = []
             async for dialog in client.get_dialogs(limit=20):
-                if dialog.unread_messages_count > 0:
-                    chat = dialog.chat
+                if dialog.unread_messages_count > 0 and dialog.chat.type == enums.ChatType.PRIVATE:
+                    private_unread.append(dialog)
+
+            async def _collect(dialog):
+                history = []
+                async for msg in client.get_chat_history(dialog.chat.id, limit=dialog.unread_messages_count):
+                    history.append(msg)
+                return history
+
+            histories = await asyncio.gather(*(_collect(d) for d in private_unread))
+
+            # 生成回复、写库共用同一个 session，逐个对话顺序处理；
+            # 同步 DB 读写经 asyncio.to_thread 执行，任一时刻只有一处在用 session
+            for dialog, history in zip(private_unread, histories):
+                chat = dialog.chat
 
-                    # Only reply to private chats for now
-                    if chat.type != enums.ChatType.PRIVATE:
+                # Process from oldest to newest unread
+                for msg in reversed(history):
+                    if not msg.text:
                         continue
 
-                    # Get history to find the last message
-                    history = []
-                    async for msg in client.get_chat_history(chat.id, limit=dialog.unread_messages_count):
-                        history.append(msg)
+                    # Double check if it's incoming
+                    if msg.outgoing:
+                        continue
 
-                    # Process from oldest to newest unread
-                    for msg in reversed(history):
-                        if not msg.text:
-                            continue
+                    # 每条来信取一次时间：lead 更新与来信 / 回复 history 共用
+                    now = _utcnow()
 
-                        # Double check if it's incoming
-                        if msg.outgoing:
-                            continue
+                    # Generate Reply（每条都生成；分支决定是发还是只存草稿）
+                    reply_text = await self._generate_reply(
+                        account, msg.text, chat.id, chat.first_name, chat.username, now=now
+                    )
 
-                        # Generate Reply（每条都生成；分支决定是发还是只存草稿）
-                        reply_text = await self._generate_reply(account, msg.text, chat.id, chat.first_name, chat.username)
+                    if not reply_text:
+                        # 意向分析可能已更新 lead 标签
+                        await asyncio.to_thread(self.session.commit)
+                        continue
 
-                        if not reply_text:
-                            continue
+                    # 检查接管状态
+                    lead = await asyncio.to_thread(self._find_lead, account.id, chat.id)
 
-                        # 检查接管状态
-                        lead = self.session.exec(
-                            select(Lead).where(
-                                Lead.account_id == account.id,
-                                Lead.telegram_user_id == chat.id,
-                            )
-                        ).first()
-
-                        # 总是存客户来信 history
-                        self._save_history(account.id, chat.id, chat.username, "user", msg.text)
-
-                        if lead and not lead.ai_enabled:
-                            # —— 副驾驶模式：不发送，写草稿 + 推 WS ——
-                            lead.ai_draft = reply_text
-                            self.session.add(lead)
-                            self.session.commit()
-                            try:
-                                await ws_manager.broadcast({
-                                    "type": "ai_draft",
-                                    "lead_id": lead.id,
-                                    "draft": reply_text,
-                                })
-                            except Exception as e:
-                                logger.warning(f"WS ai_draft broadcast failed: {e}")
-                            # 标记已读，避免下次轮询又触发同一条
-                            try:
-                                await client.read_chat_history(chat.id)
-                            except Exception as e:
-                                logger.warning(f"read_chat_history failed: {e}")
-                        else:
-                            # —— 默认模式：直接发送 ——
+                    # 每条来信一个事务：lead 标签、来信 / 回复 history、草稿一起提交
+                    if lead and not lead.ai_enabled:
+                        # —— 副驾驶模式：不发送，写草稿 + 推 WS ——
+                        lead.ai_draft = reply_text
+                        self.session.add(lead)
+                        await asyncio.to_thread(
+                            self._save_history_many, account.id, chat.id, chat.username, [("user", msg.text)], now
+                        )
+                        try:
+                            await ws_manager.broadcast({
+                                "type": "ai_draft",
+                                "lead_id": lead.id,
+                                "draft": reply_text,
+                            })
+                        except Exception as e:
+                            logger.warning(f"WS ai_draft broadcast failed: {e}")
+                        # 标记已读，避免下次轮询又触发同一条
+                        try:
+                            await client.read_chat_history(chat.id)
+                        except Exception as e:
+                            logger.warning(f"read_chat_history failed: {e}")
+                    else:
+                        # —— 默认模式：直接发送 ——
+                        try:
                             await client.send_message(chat.id, reply_text)
-                            self._save_history(account.id, chat.id, chat.username, "assistant", reply_text)
+                        except Exception:
+                            # 发送失败也要留下客户来信
+                            await asyncio.to_thread(
+                                self._save_history_many, account.id, chat.id, chat.username, [("user", msg.text)], now
+                            )
+                            raise
+                        await asyncio.to_thread(
+                            self._save_history_many, account.id, chat.id, chat.username,
+                            [("user", msg.text), ("assistant", reply_text)], now,
+                        )
 
             return "Processed"
 
@@ -101,49 +128,75 @@ class AIReplyService:
         except Exception as e:
             logger.error(f"Error processing messages for account {account_id}: {e}")
 
-    async def _generate_reply(self, account: Account, user_msg: str, target_user_id: int, target_name: str, target_username: str) -> Optional[str]:
-        # 1. Fetch recent history from DB
-        db_history = self.session.exec(
-            select(ChatHistory)
-            .where(ChatHistory.account_id == account.id)
-            .where(ChatHistory.target_user_id == target_user_id)
-            .order_by(ChatHistory.created_at.desc())
-            .limit(10)
-        ).all()
+    async def _generate_reply(
+        self,
+        account: Account,
+        user_msg: str,
+        target_user_id: int,
+        target_name: str,
+        target_username: str,
+        now: Optional[datetime] = None,
+    ) -> Optional[str]:
+        # 1. Fetch recent history from DB（同步查询放到线程里，不阻塞事件循环）
+        db_history = await asyncio.to_thread(self._recent_history, account.id, target_user_id)
         
         # Convert to OpenAI format (reverse because we fetched desc)
-        history_msgs = []
-        for h in reversed(db_history):
-            history_msgs.append({"role": h.role, "content": h.content})
+        # 同一份列表同时交给 analyze_intent 与 get_response，只构建一次
+        history_msgs = [{"role": role, "content": content} for role, content in reversed(db_history)]
             
         # --- Stage 9.3: Intent Recognition & Auto Tagging ---
-        # Perform intent analysis on the new incoming message + history
-        # We run this BEFORE generating reply, so we can potentially adjust strategy (or just notify)
+        # 意向分析与回复生成是两次独立的 LLM 调用：先发起意向分析，
+        # 与知识注入 / 回复生成并行，回复拿到后再落标签、推高意向告警
+        intent_task = asyncio.create_task(self.llm.analyze_intent(user_msg, history_msgs))
+
         try:
-            analysis = await self.llm.analyze_intent(user_msg, history_msgs)
-            
-            # Update Lead tags
-            self._update_lead_tags(account.id, target_user_id, target_username, target_name, analysis)
-            
-            # Check for high value intent
-            if analysis.get("is_high_value"):
-                # Trigger WebSocket notification
-                await ws_manager.broadcast({
-                    "type": "high_intent_alert",
-                    "data": {
-                        "account_id": account.id,
-                        "account_phone": account.phone_number,
-                        "lead_id": target_user_id,
-                        "lead_name": target_name,
-                        "intent": analysis.get("intent"),
-                        "message": user_msg
-                    }
-                })
-                
-        except Exception as e:
-            logger.error(f"Intent analysis error: {e}")
+            # 2. Prepare System Prompt + Knowledge
+            system_prompt = await asyncio.to_thread(self._build_system_prompt, account)
+
+            # RAG：向量召回业务知识库（含手填/PDF导入/群聊抽取）
+            try:
+                from app.services.kb_retrieval import retrieve_relevant_kb, format_kb_for_prompt
+                qa_items = await retrieve_relevant_kb(self.session, user_msg, top_k=4)
+                qa_block = format_kb_for_prompt(qa_items, max_chars=1200)
+                if qa_block:
+                    system_prompt += f"\n\n[业务知识库召回 — 如客户提到相关内容请基于此回复]\n{qa_block}"
+            except Exception as e:
+                logger.warning(f"RAG retrieval failed: {e}")
+
+            # 3. Call LLM for Reply
+            response = await self.llm.get_response(
+                prompt=user_msg,
+                system_prompt=system_prompt,
+                history=history_msgs
+            )
+        finally:
+            # 意向分析失败不影响回复；构建 prompt 或回复出错时也等它结束，避免遗留悬挂任务
+            await self._finish_intent(
+                intent_task, account, user_msg, target_user_id, target_username, target_name, now
+            )
 
-        # 2. Prepare System Prompt + Knowledge
+        return response
+
+    def _recent_history(self, account_id: int, target_user_id: int) -> List[Tuple[str, str]]:
+        """最近 10 条对话 (role, content)，按时间倒序（只取两列，不构造 ORM 对象）"""
+        return self.session.exec(
+            select(ChatHistory.role, ChatHistory.content)
+            .where(ChatHistory.account_id == account_id)
+            .where(ChatHistory.target_user_id == target_user_id)
+            .order_by(ChatHistory.created_at.desc())
+            .limit(10)
+        ).all()
+
+    def _find_lead(self, account_id: int, target_user_id: int) -> Optional[Lead]:
+        return self.session.exec(
+            select(Lead).where(
+                Lead.account_id == account_id,
+                Lead.telegram_user_id == target_user_id,
+            )
+        ).first()
+
+    def _build_system_prompt(self, account: Account) -> str:
+        """人设 + 战役知识库注入（同步 DB 读取，由调用方放到线程里执行）"""
         system_prompt = account.persona_prompt or "You are a helpful assistant on Telegram."
         knowledge_context = ""
 
@@ -177,44 +230,80 @@ class AIReplyService:
         # Inject knowledge into system prompt if available
         if knowledge_context:
             system_prompt += f"\n\n参考知识（回答时可引用）：\n{knowledge_context}"
+        return system_prompt
 
-        # RAG：向量召回业务知识库（含手填/PDF导入/群聊抽取）
+    async def _finish_intent(
+        self,
+        intent_task: "asyncio.Task",
+        account: Account,
+        user_msg: str,
+        target_user_id: int,
+        target_username: str,
+        target_name: str,
+        now: Optional[datetime] = None,
+    ):
+        """等待意向分析结果：更新 lead 标签，高意向时推送 WebSocket 告警"""
         try:
-            from app.services.kb_retrieval import retrieve_relevant_kb, format_kb_for_prompt
-            qa_items = await retrieve_relevant_kb(self.session, user_msg, top_k=4)
-            qa_block = format_kb_for_prompt(qa_items, max_chars=1200)
-            if qa_block:
-                system_prompt += f"\n\n[业务知识库召回 — 如客户提到相关内容请基于此回复]\n{qa_block}"
+            analysis = await intent_task
+            
+            # Update Lead tags
+            await asyncio.to_thread(
+                self._update_lead_tags, account.id, target_user_id, target_username, target_name, analysis, now
+            )
+            
+            # Check for high value intent
+            if analysis.get("is_high_value"):
+                # Trigger WebSocket notification
+                await ws_manager.broadcast({
+                    "type": "high_intent_alert",
+                    "data": {
+                        "account_id": account.id,
+                        "account_phone": account.phone_number,
+                        "lead_id": target_user_id,
+                        "lead_name": target_name,
+                        "intent": analysis.get("intent"),
+                        "message": user_msg
+                    }
+                })
+                
         except Exception as e:
-            logger.warning(f"RAG retrieval failed: {e}")
-
-        # 3. Call LLM for Reply
-        response = await self.llm.get_response(
-            prompt=user_msg,
-            system_prompt=system_prompt,
-            history=history_msgs
-        )
-
-        return response
+            logger.error(f"Intent analysis error: {e}")
 
-    def _update_lead_tags(self, account_id: int, target_user_id: int, username: str, first_name: str, analysis: dict):
+    def _update_lead_tags(
+        self,
+        account_id: int,
+        target_user_id: int,
+        username: str,
+        first_name: str,
+        analysis: dict,
+        now: Optional[datetime] = None,
+    ):
         """
         Create or update lead record with AI analysis
+        （不在这里提交，随调用方的事务一起提交）
         """
-        import json
-        
-        # Find Lead
-        lead = self.session.exec(
-            select(Lead).where(
+        now = now or _utcnow()
+        # 一个集合完成去重；排序后输出稳定（与库内 DISTINCT 合并的结果顺序一致）
+        tags = set(analysis.get("tags", []))
+        intent = analysis.get("intent")
+        # If intent is high value, maybe add intent as tag too
+        merge_tags = tags | {f"intent:{intent}"} if intent else tags
+
+        # 已有 lead：库内去重合并标签，一条 UPDATE，不再读出 / 解析 / 回写 tags_json
+        updated = self.session.exec(
+            update(Lead)
+            .where(
                 Lead.account_id == account_id, 
                 Lead.telegram_user_id == target_user_id
             )
-        ).first()
-        
-        tags = analysis.get("tags", [])
-        intent = analysis.get("intent")
+            .values(
+                tags_json=json_array_merge(Lead.tags_json, sorted(merge_tags, key=str)),
+                last_interaction_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
         
-        if not lead:
+        if not updated:
             # Create new lead
             lead = Lead(
                 account_id=account_id,
@@ -222,33 +311,31 @@ class AIReplyService:
                 username=username,
                 first_name=first_name,
                 status="new",
-                tags_json=json.dumps(tags),
-                last_interaction_at=datetime.utcnow()
+                tags_json=orjson.dumps(sorted(tags, key=str)).decode(),
+                last_interaction_at=now
             )
             self.session.add(lead)
-        else:
-            # Update existing lead
-            current_tags = json.loads(lead.tags_json) if lead.tags_json else []
-            # Merge tags
-            new_tags = list(set(current_tags + tags))
-            # If intent is high value, maybe add intent as tag too
-            if intent:
-                new_tags.append(f"intent:{intent}")
-                
-            lead.tags_json = json.dumps(list(set(new_tags)))
-            lead.last_interaction_at = datetime.utcnow()
-            self.session.add(lead)
-            
-        self.session.commit()
 
-    def _save_history(self, account_id: int, target_user_id: int, target_username: Optional[str], role: str, content: str):
-        record = ChatHistory(
-            account_id=account_id,
-            target_user_id=target_user_id,
-            target_username=target_username,
-            role=role,
-            content=content,
-            created_at=datetime.utcnow()
-        )
-        self.session.add(record)
+    def _save_history_many(
+        self,
+        account_id: int,
+        target_user_id: int,
+        target_username: Optional[str],
+        items: List[Tuple[str, str]],
+        now: Optional[datetime] = None,
+    ):
+        """一次写入多条 history（role, content），连同 session 中其他待提交改动一起提交"""
+        now = now or _utcnow()
+        # 同批记录时间戳逐条 +1µs，按 created_at 排序时仍保持来信在前、回复在后
+        self.session.add_all([
+            ChatHistory(
+                account_id=account_id,
+                target_user_id=target_user_id,
+                target_username=target_username,
+                role=role,
+                content=content,
+                created_at=now + timedelta(microseconds=i),
+            )
+            for i, (role, content) in enumerate(items)
+        ])
         self.session.commit()
@@ -1,8 +1,12 @@
 import logging
 import asyncio
+import itertools
 import random
 import os
-from typing import Optional, Dict, Tuple
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional, Dict, Tuple
 from datetime import datetime
 
 from sqlmodel import Session
@@ -23,6 +27,99 @@ from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 随机身份用的欧美姓名（模块级常量，不在每次注册时重建列表）
+_FIRST_NAMES = ("James", "John", "Robert", "Michael", "William", "David", "Richard", "Joseph", "Thomas", "Charles")
+_LAST_NAMES = ("Smith", "Johnson", "Williams", "Jones", "Brown", "Davis", "Miller", "Wilson", "Moore", "Taylor")
+
+
+@dataclass
+class PooledClient:
+    """池中的已连接 Client 及其创建时使用的设备指纹"""
+    client: Client
+    device_info: Dict
+    loop: asyncio.AbstractEventLoop
+    idle_since: float = 0.0
+    # 本次注册结束后连接是否仍处于未授权的干净状态，可以还回池中
+    reusable: bool = field(default=False)
+
+
+class ClientPool:
+    """
+    注册用 Pyrogram Client 连接池
+
+    每次注册都新建 Client 并 connect，要付出一次 TLS + MTProto 握手（1~2s）。
+    注册在登录前并不依赖会话内容，同一代理上未授权的连接可以直接拿来
+    给下一个号码 send_code。这里按 (proxy.id, api_id) 保留少量空闲连接：
+    - 只回收未完成 sign_up 的连接（号码被封 / 验证码超时 / 验证码错误），
+      已授权的连接绑定了新账号，用完即断开
+    - 空闲超时、已断开或属于其他事件循环的连接直接丢弃
+    - 复用连接时沿用它创建时的设备指纹，保证账号记录与实际上报一致
+    """
+
+    def __init__(self, max_idle_per_key: int = 2, idle_timeout: float = 300):
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_timeout = idle_timeout
+        self._pool: Dict[Tuple[int, int], asyncio.Queue] = {}
+        self._seq = itertools.count(1)
+
+    async def acquire(self, proxy: Proxy, api_id: int, api_hash: str) -> PooledClient:
+        queue = self._pool.get((proxy.id, api_id))
+        loop = asyncio.get_running_loop()
+        while queue is not None and not queue.empty():
+            entry = queue.get_nowait()
+            if (
+                entry.loop is loop
+                and entry.client.is_connected
+                and time.monotonic() - entry.idle_since < self.idle_timeout
+            ):
+                entry.reusable = False
+                return entry
+            await self._close(entry)
+
+        device_info = DeviceGenerator.generate()
+        client = Client(
+            name=f"reg_{proxy.id}_{next(self._seq)}",
+            in_memory=True,
+            api_id=api_id,
+            api_hash=api_hash,
+            proxy=get_proxy_dict(proxy),
+            device_model=device_info["device_model"],
+            system_version=device_info["system_version"],
+            app_version=device_info["app_version"],
+            lang_code="en"
+        )
+        logger.info(f"Connecting to Telegram with proxy {proxy.ip}...")
+        await client.connect()
+        return PooledClient(client=client, device_info=device_info, loop=loop)
+
+    async def release(self, proxy_id: int, api_id: int, entry: PooledClient) -> None:
+        queue = self._pool.setdefault((proxy_id, api_id), asyncio.Queue(self.max_idle_per_key))
+        if entry.reusable and entry.client.is_connected and not queue.full():
+            entry.idle_since = time.monotonic()
+            queue.put_nowait(entry)
+        else:
+            await self._close(entry)
+
+    @asynccontextmanager
+    async def lease(self, proxy: Proxy, api_id: int, api_hash: str) -> AsyncIterator[PooledClient]:
+        entry = await self.acquire(proxy, api_id, api_hash)
+        try:
+            yield entry
+        finally:
+            await self.release(proxy.id, api_id, entry)
+
+    @staticmethod
+    async def _close(entry: PooledClient) -> None:
+        try:
+            if entry.client.is_connected:
+                await entry.client.disconnect()
+        except Exception as e:
+            logger.debug(f"Failed to disconnect pooled client: {e}")
+
+
+client_pool = ClientPool()
+
+
 class AutoRegisterService:
     def __init__(self, db_session: Session):
         self.session = db_session
@@ -48,7 +145,6 @@ class AutoRegisterService:
         """
         执行单个账号自动注册流程
         """
-        client = None
         activation_id = None
         
         # 1. 获取可用代理
@@ -61,8 +157,6 @@ class AutoRegisterService:
         if not proxy:
             return {"status": "error", "message": "No available proxies"}
             
-        proxy_dict = get_proxy_dict(proxy)
-        
         try:
             # 2. 获取手机号
             logger.info("Requesting number from SMS-Activate...")
@@ -71,104 +165,15 @@ class AutoRegisterService:
             activation_id = activation['id']
             logger.info(f"Got number: {phone_number} (ID: {activation_id})")
 
-            # 3. 生成设备指纹与随机身份
-            device_info = DeviceGenerator.generate()
+            # 3. 生成随机身份
             first_name, last_name = self._generate_random_name()
 
-            # 4. 初始化 Pyrogram 客户端 (内存模式)
-            client = Client(
-                name=f"reg_{phone_number}",
-                in_memory=True,
-                api_id=api_id,
-                api_hash=api_hash,
-                proxy=proxy_dict,
-                device_model=device_info["device_model"],
-                system_version=device_info["system_version"],
-                app_version=device_info["app_version"],
-                lang_code="en"
-            )
-
-            logger.info(f"Connecting to Telegram with proxy {proxy.ip}...")
-            await client.connect()
-
-            # 5. 发送验证码
-            try:
-                sent_code = await client.send_code(phone_number)
-            except PhoneNumberBanned:
-                logger.warning(f"Phone number {phone_number} is banned.")
-                await self.sms_service.set_status(activation_id, 8) # Cancel
-                return {"status": "failed", "message": "Phone number banned"}
-            except FloodWait as e:
-                logger.warning(f"FloodWait: {e.value}")
-                await self.sms_service.set_status(activation_id, 8)
-                return {"status": "failed", "message": f"FloodWait: {e.value}s"}
-
-            # 拟人化延迟
-            await asyncio.sleep(random.uniform(2, 5))
-
-            # 6. 等待验证码
-            logger.info("Waiting for SMS code...")
-            try:
-                code = await self.sms_service.wait_for_code(activation_id)
-                logger.info(f"Received code: {code}")
-            except TimeoutError:
-                await self.sms_service.set_status(activation_id, 8)
-                return {"status": "failed", "message": "Timeout waiting for code"}
-
-            # 拟人化延迟
-            await asyncio.sleep(random.uniform(1, 3))
-
-            # 7. 提交注册
-            try:
-                user = await client.sign_up(
-                    phone_number=phone_number, 
-                    phone_code_hash=sent_code.phone_code_hash, 
-                    phone_code=code,
-                    first_name=first_name, 
-                    last_name=last_name
+            # 4. 从连接池租用 Pyrogram 客户端 (内存模式，设备指纹随连接)
+            async with client_pool.lease(proxy, api_id, api_hash) as lease:
+                return await self._register_with_client(
+                    lease, proxy, activation_id, phone_number,
+                    first_name, last_name, api_id, api_hash,
                 )
-                
-                # 通知接码平台成功
-                await self.sms_service.set_status(activation_id, 6)
-                
-                # 8. 设置 2FA (风控关键)
-                # 随机延迟后再设置
-                await asyncio.sleep(random.uniform(3, 8))
-                
-                password = settings.DEFAULT_2FA_PASSWORD
-                if password:
-                    await client.enable_cloud_password(password=password)
-                    logger.info("2FA enabled successfully")
-
-                # 9. 导出 Session 并保存
-                session_string = await client.export_session_string()
-                
-                new_account = Account(
-                    phone_number=phone_number,
-                    api_id=api_id,
-                    api_hash=api_hash,
-                    session_string=session_string,
-                    device_model=device_info["device_model"],
-                    system_version=device_info["system_version"],
-                    app_version=device_info["app_version"],
-                    proxy_id=proxy.id,
-                    status="active", # 刚注册完暂时标记为 active，或者专门的 warmup 状态
-                    last_active=datetime.utcnow()
-                )
-                
-                self.session.add(new_account)
-                self.session.commit()
-                self.session.refresh(new_account)
-                
-                return {
-                    "status": "success", 
-                    "phone": phone_number, 
-                    "account_id": new_account.id
-                }
-
-            except (PhoneCodeInvalid, PhoneCodeExpired):
-                await self.sms_service.set_status(activation_id, 8)
-                return {"status": "failed", "message": "Invalid code"}
 
         except Exception as e:
             logger.error(f"Registration failed: {str(e)}")
@@ -178,10 +183,102 @@ class AutoRegisterService:
                 except Exception:
                     pass
             return {"status": "error", "message": str(e)}
+
+    async def _register_with_client(
+        self,
+        lease: PooledClient,
+        proxy: Proxy,
+        activation_id: str,
+        phone_number: str,
+        first_name: str,
+        last_name: str,
+        api_id: int,
+        api_hash: str,
+    ) -> Dict:
+        """在租用的连接上完成 send_code → sign_up → 2FA → 入库"""
+        client = lease.client
+        device_info = lease.device_info
+        # 5. 发送验证码
+        try:
+            sent_code = await client.send_code(phone_number)
+        except PhoneNumberBanned:
+            logger.warning(f"Phone number {phone_number} is banned.")
+            await self.sms_service.set_status(activation_id, 8) # Cancel
+            lease.reusable = True
+            return {"status": "failed", "message": "Phone number banned"}
+        except FloodWait as e:
+            logger.warning(f"FloodWait: {e.value}")
+            await self.sms_service.set_status(activation_id, 8)
+            return {"status": "failed", "message": f"FloodWait: {e.value}s"}
+
+        # 拟人化延迟
+        await asyncio.sleep(random.uniform(2, 5))
+
+        # 6. 等待验证码
+        logger.info("Waiting for SMS code...")
+        try:
+            code = await self.sms_service.wait_for_code(activation_id)
+            logger.info(f"Received code: {code}")
+        except TimeoutError:
+            await self.sms_service.set_status(activation_id, 8)
+            lease.reusable = True
+            return {"status": "failed", "message": "Timeout waiting for code"}
+
+        # 拟人化延迟
+        await asyncio.sleep(random.uniform(1, 3))
+
+        # 7. 提交注册
+        try:
+            user = await client.sign_up(
+                phone_number=phone_number, 
+                phone_code_hash=sent_code.phone_code_hash, 
+                phone_code=code,
+                first_name=first_name, 
+                last_name=last_name
+            )
             
-        finally:
-            if client and client.is_connected:
-                await client.disconnect()
+            # 通知接码平台成功
+            await self.sms_service.set_status(activation_id, 6)
+            
+            # 8. 设置 2FA (风控关键)
+            # 随机延迟后再设置
+            await asyncio.sleep(random.uniform(3, 8))
+            
+            password = settings.DEFAULT_2FA_PASSWORD
+            if password:
+                await client.enable_cloud_password(password=password)
+                logger.info("2FA enabled successfully")
+
+            # 9. 导出 Session 并保存
+            session_string = await client.export_session_string()
+            
+            new_account = Account(
+                phone_number=phone_number,
+                api_id=api_id,
+                api_hash=api_hash,
+                session_string=session_string,
+                device_model=device_info["device_model"],
+                system_version=device_info["system_version"],
+                app_version=device_info["app_version"],
+                proxy_id=proxy.id,
+                status="active", # 刚注册完暂时标记为 active，或者专门的 warmup 状态
+                last_active=datetime.utcnow()
+            )
+            
+            self.session.add(new_account)
+            self.session.commit()
+            self.session.refresh(new_account)
+            
+            return {
+                "status": "success", 
+                "phone": phone_number, 
+                "account_id": new_account.id
+            }
+
+        except (PhoneCodeInvalid, PhoneCodeExpired):
+            await self.sms_service.set_status(activation_id, 8)
+            lease.reusable = True
+            return {"status": "failed", "message": "Invalid code"}
 
     def _get_available_proxy(self, category: Optional[str] = None) -> Optional[Proxy]:
         """
@@ -190,20 +287,17 @@ class AutoRegisterService:
         """
         # 实际生产中这里应该有更复杂的逻辑，比如每个IP每天注册限制
         from sqlmodel import select
+        from sqlalchemy import func
+        from sqlalchemy.orm import aliased
         query = select(Proxy).where(Proxy.status == "active")
         if category:
             query = query.where(Proxy.category == category)
         
-        statement = query.order_by(Proxy.fail_count)
-        # 随机取前5个中的一个，避免并发冲突
-        results = self.session.exec(statement).fetchmany(5)
-        if results:
-            return random.choice(results)
-        return None
+        # 失败次数最少的 5 个代理中随机取一个，避免并发冲突；随机在库内完成，只取回一行
+        candidates = aliased(Proxy, query.order_by(Proxy.fail_count).limit(5).subquery())
+        statement = select(candidates).order_by(func.random()).limit(1)
+        return self.session.exec(statement).first()
 
     def _generate_random_name(self) -> Tuple[str, str]:
         """生成随机欧美姓名"""
-        first_names = ["James", "John", "Robert", "Michael", "William", "David", "Richard", "Joseph", "Thomas", "Charles"]
-        last_names = ["Smith", "Johnson", "Williams", "Jones", "Brown", "Davis", "Miller", "Wilson", "Moore", "Taylor"]
-        
-        return random.choice(first_names), random.choice(last_names)
+        return random.choice(_FIRST_NAMES), random.choice(_LAST_NAMES)
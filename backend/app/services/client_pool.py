@@ -2,6 +2,10 @@
 Telegram Client Connection Pool
 Reuses Pyrogram clients to avoid repeated TLS handshakes.
 
+Note: no production code path goes through the pool yet -- telegram_client.py
+imports client_pool but every operation still builds its own client via
+_create_client_and_run. The pool is ready for gradual adoption as shown below.
+
 Usage:
     The pool maintains a dictionary of connected Pyrogram Client instances,
     keyed by account_id. Instead of creating a new client for every operation
@@ -21,113 +25,236 @@ Usage:
             client = await client_pool.get_client(account.id, factory)
             try:
                 result = await client.send_message(...)
-                await client_pool.release_client(account.id)
+                client_pool.release_client(account.id)
                 return result
             except (AuthKeyUnregistered, SessionRevoked):
                 # Session is dead, remove from pool
                 await client_pool.remove_client(account.id)
                 raise
+            except ConnectionError:
+                # Transient: drop the client and reconnect in the background,
+                # the next get_client() picks up the warmed connection
+                await client_pool.remove_client(account.id, prewarm_factory=factory)
+                raise
 
     Cleanup:
         Call `await client_pool.cleanup_expired()` periodically (e.g. every 60s)
-        to disconnect clients that have been idle longer than the TTL.
+        to disconnect clients that have been idle longer than the TTL, and
+        prewarmed clients nobody claimed within the TTL.
 
         Call `await client_pool.close_all()` on application shutdown.
 """
 import asyncio
 import time
 import logging
-from typing import Dict
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from pyrogram import Client
 
 logger = logging.getLogger(__name__)
 
+# lru-dict: C-implemented dict + doubly-linked list; falls back to OrderedDict
+try:
+    from lru import LRU
+    LRU_DICT_AVAILABLE = True
+except ImportError:
+    LRU_DICT_AVAILABLE = False
+    logger.info("lru-dict not installed, client pool uses OrderedDict")
+
 
 class TelegramClientPool:
-    """LRU connection pool for Pyrogram clients, keyed by account_id."""
+    """LRU connection pool for Pyrogram clients, keyed by account_id.
+
+    _pool is kept in recency order: every hit promotes the entry, so eviction
+    and the TTL sweep only look at the least recently used end. With lru-dict
+    the container promotes on get() and evicts past max_size by itself (the
+    evicted client is stopped in a background task); otherwise an OrderedDict
+    is maintained by hand.
+    """
 
     def __init__(self, max_size: int = 50, ttl: int = 300):
         self.max_size = max_size
         self.ttl = ttl  # seconds before idle client is disconnected
-        self._pool: Dict[int, dict] = {}  # account_id -> {"client": Client, "last_used": float}
-        self._lock = asyncio.Lock()
+        # account_id -> {"client": Client, "last_used": time.monotonic()}
+        if LRU_DICT_AVAILABLE:
+            self._pool = LRU(max_size, callback=self._on_evict)
+        else:
+            self._pool = OrderedDict()  # oldest first
+        self._stopping: set = set()  # stop() tasks for clients evicted by LRU
+        self._lock = asyncio.Lock()  # structural mutations only: insert + overflow eviction
+        # Per-account locks: concurrent misses for the same account share one factory call.
+        # Weak values: a lock lives exactly as long as a holder or waiter references it,
+        # so it can never be dropped between a release and a waiter's acquire
+        self._account_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+        # account_id -> (reconnect task started by remove_client(prewarm_factory=...),
+        #                start time); unclaimed ones are dropped by cleanup_expired()
+        self._warming: Dict[int, Tuple[asyncio.Task, float]] = {}
+
+    def _lock_for(self, account_id: int) -> asyncio.Lock:
+        lock = self._account_locks.get(account_id)
+        if lock is None:
+            lock = self._account_locks[account_id] = asyncio.Lock()
+        return lock
+
+    def _touch(self, account_id: int):
+        """Promote an entry to most recently used."""
+        if LRU_DICT_AVAILABLE:
+            self._pool.get(account_id)
+        else:
+            self._pool.move_to_end(account_id)
+
+    def _oldest(self) -> Optional[Tuple[int, dict]]:
+        """(account_id, entry) of the least recently used client, or None."""
+        if LRU_DICT_AVAILABLE:
+            return self._pool.peek_last_item()
+        return next(iter(self._pool.items()), None)
+
+    def _on_evict(self, account_id: int, entry: dict):
+        """lru-dict eviction callback: stop the client without blocking the insert."""
+        task = asyncio.get_running_loop().create_task(self._stop(entry))
+        self._stopping.add(task)
+        task.add_done_callback(self._stopping.discard)
+        logger.debug(f"Evicted client for account {account_id}")
+
+    @staticmethod
+    async def _stop(entry: dict):
+        try:
+            await entry["client"].stop()
+        except Exception:
+            pass
+
+    async def _stop_all(self, entries: List[dict]):
+        """Stop clients concurrently: total time is one disconnect, not N."""
+        if entries:
+            await asyncio.gather(*(self._stop(entry) for entry in entries))
 
     async def get_client(self, account_id: int, client_factory) -> Client:
         """Get or create a client for the given account.
         client_factory is an async callable that returns a connected Client."""
-        async with self._lock:
+        # Fast path without the lock: lookup / promote contain no await, so no
+        # other coroutine can interleave with them on the event loop
+        entry = self._pool.get(account_id)
+        if entry and entry["client"].is_connected:
+            entry["last_used"] = time.monotonic()
+            self._touch(account_id)
+            return entry["client"]
+
+        # Miss: only callers for the same account wait on each other
+        async with self._lock_for(account_id):
+            # Another caller may have created the client while we waited
             entry = self._pool.get(account_id)
             if entry and entry["client"].is_connected:
-                entry["last_used"] = time.time()
+                entry["last_used"] = time.monotonic()
+                self._touch(account_id)
                 return entry["client"]
 
-            # Evict oldest if at capacity
-            if len(self._pool) >= self.max_size:
-                await self._evict_oldest()
+            # Create new client outside the pool lock, reusing a prewarmed
+            # connection if one is in flight
+            client = await self._take_warming(account_id)
+            if client is None:
+                client = await client_factory()
 
-        # Create new client outside the lock
-        client = await client_factory()
-
-        async with self._lock:
-            self._pool[account_id] = {
-                "client": client,
-                "last_used": time.time()
-            }
+            async with self._lock:
+                self._pool[account_id] = {
+                    "client": client,
+                    "last_used": time.monotonic()
+                }
+                self._touch(account_id)
+                # Evict past capacity (lru-dict evicts on insert by itself)
+                evicted = self._pop_overflow()
+        # Stop evicted clients outside the locks
+        await self._stop_all(evicted)
         return client
 
-    async def release_client(self, account_id: int):
+    def release_client(self, account_id: int):
         """Mark client as available (update last_used)."""
-        async with self._lock:
-            if account_id in self._pool:
-                self._pool[account_id]["last_used"] = time.time()
-
-    async def remove_client(self, account_id: int):
-        """Disconnect and remove a client (on error)."""
-        async with self._lock:
-            entry = self._pool.pop(account_id, None)
+        entry = self._pool.get(account_id)
+        if entry is not None:
+            entry["last_used"] = time.monotonic()
+            self._touch(account_id)
+
+    async def remove_client(self, account_id: int, prewarm_factory=None):
+        """Disconnect and remove a client (on error).
+
+        If prewarm_factory is given, a replacement connection is started in
+        the background right away; the next get_client() awaits it instead of
+        paying the handshake on the caller's task.
+        """
+        entry = self._pool.pop(account_id, None)
+        if prewarm_factory is not None and account_id not in self._warming:
+            task = asyncio.get_running_loop().create_task(prewarm_factory())
+            task.add_done_callback(self._prewarm_done)
+            self._warming[account_id] = (task, time.monotonic())
         if entry:
-            try:
-                await entry["client"].stop()
-            except Exception:
-                pass
-
-    async def _evict_oldest(self):
-        """Remove the least recently used client."""
-        if not self._pool:
-            return
-        oldest_id = min(self._pool, key=lambda k: self._pool[k]["last_used"])
-        entry = self._pool.pop(oldest_id)
+            await self._stop(entry)
+
+    @staticmethod
+    def _prewarm_done(task: asyncio.Task):
+        """Retrieve a failed prewarm's exception even if nobody claims the task."""
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Prewarm failed: {task.exception()}")
+
+    async def _take_warming(self, account_id: int) -> Optional[Client]:
+        """Claim a prewarmed client, or None if there is none or it failed."""
+        task, _ = self._warming.pop(account_id, (None, 0.0))
+        if task is None:
+            return None
         try:
-            await entry["client"].stop()
-        except Exception:
-            pass
-        logger.debug(f"Evicted client for account {oldest_id}")
+            return await task
+        except Exception as e:
+            logger.debug(f"Prewarm for account {account_id} failed: {e}")
+            return None
+
+    def _pop_overflow(self) -> List[dict]:
+        """Pop least recently used entries beyond max_size; caller stops them."""
+        evicted = []
+        while len(self._pool) > self.max_size:
+            oldest_id, entry = self._oldest()
+            evicted.append(self._pool.pop(oldest_id))
+            logger.debug(f"Evicted client for account {oldest_id}")
+        return evicted
 
     async def cleanup_expired(self):
         """Remove clients that have been idle longer than TTL."""
-        now = time.time()
+        now = time.monotonic()
         expired = []
-        async with self._lock:
-            for account_id, entry in list(self._pool.items()):
-                if now - entry["last_used"] > self.ttl:
-                    expired.append(self._pool.pop(account_id))
+        # Entries are in recency order: stop at the first one still fresh
+        while (oldest := self._oldest()) is not None:
+            account_id, entry = oldest
+            if now - entry["last_used"] <= self.ttl:
+                break
+            expired.append(self._pool.pop(account_id))
 
-        for entry in expired:
-            try:
-                await entry["client"].stop()
-            except Exception:
-                pass
+        # Prewarmed clients nobody asked for within the TTL
+        stale = [
+            account_id for account_id, (_, started) in self._warming.items()
+            if now - started > self.ttl
+        ]
+        expired.extend(await self._discard_warming([self._warming.pop(a)[0] for a in stale]))
+
+        await self._stop_all(expired)
+
+    @staticmethod
+    async def _discard_warming(tasks: List[asyncio.Task]) -> List[dict]:
+        """Cancel prewarm tasks; entries for those that already connected."""
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        return [{"client": r} for r in results if not isinstance(r, BaseException)]
 
     async def close_all(self):
         """Disconnect all pooled clients."""
-        async with self._lock:
-            entries = list(self._pool.values())
-            self._pool.clear()
-        for entry in entries:
-            try:
-                await entry["client"].stop()
-            except Exception:
-                pass
+        entries = list(self._pool.values())
+        self._pool.clear()
+        warming = [task for task, _ in self._warming.values()]
+        self._warming.clear()
+        entries.extend(await self._discard_warming(warming))
+        await self._stop_all(entries)
+        if self._stopping:
+            await asyncio.gather(*self._stopping)
 
 
 # Global pool instance
@@ -121,7 +121,7 @@ class ConversationDirector:
 
     def __init__(self):
         # 由 ListenerService 启动后填充，避免我们账号互相回复
-        self.our_tg_ids: Set[str] = set()
+        self.our_tg_ids: Set[int] = set()
 
     # ── Redis key helpers ──────────────────────────────────────────────────────
 
@@ -290,7 +290,7 @@ class ConversationDirector:
         self.push_context(group_id, sender_name, text, msg_id)
 
         # 2. 不响应自己
-        if str(sender_id) in self.our_tg_ids:
+        if int(sender_id) in self.our_tg_ids:
             return
 
         # 3. 群级节流（3 分钟内只处理一次）
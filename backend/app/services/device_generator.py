@@ -7,7 +7,7 @@ class DeviceGenerator:
     """
     
     # 扩展的 Android 设备型号列表
-    MODELS = [
+    MODELS = (
         # Samsung
         "Samsung Galaxy S24 Ultra", "Samsung Galaxy S24+", "Samsung Galaxy S24",
         "Samsung Galaxy S23 Ultra", "Samsung Galaxy S23", "Samsung Galaxy S22 Ultra",
@@ -33,25 +33,26 @@ class DeviceGenerator:
         # Other
         "Sony Xperia 1 V", "Motorola Edge 40 Pro", "Nothing Phone (2)",
         "Asus Zenfone 10", "Honor Magic6 Pro"
-    ]
+    )
     
     # Android 系统版本
-    SYSTEM_VERSIONS = [
+    SYSTEM_VERSIONS = (
         "Android 14", "Android 13", "Android 12", "Android 11"
-    ]
+    )
     
     # Telegram 应用版本 (更新至较新版本)
-    APP_VERSIONS = [
+    APP_VERSIONS = (
         "10.9.1", "10.8.1", "10.7.3", 
         "10.6.1", "10.5.0", "10.4.3", 
         "10.3.2", "10.2.9"
-    ]
+    )
     
     @classmethod
     def generate(cls):
         """生成一套随机的设备参数"""
+        choice = random.choice
         return {
-            "device_model": random.choice(cls.MODELS),
-            "system_version": random.choice(cls.SYSTEM_VERSIONS),
-            "app_version": random.choice(cls.APP_VERSIONS)
+            "device_model": choice(cls.MODELS),
+            "system_version": choice(cls.SYSTEM_VERSIONS),
+            "app_version": choice(cls.APP_VERSIONS)
         }
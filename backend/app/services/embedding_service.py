@@ -42,6 +42,21 @@ MAX_CONCURRENCY = 5
 MAX_BATCH_SIZE = 64
 MAX_INPUT_CHARS = 8000  # 单条文本最长（避免 token 超限）
 
+# 消息（query）对场景描述（document）的 cosine 校准阈值。
+# 非对称检索的相似度明显低于 query 对 query，沿用 0.8 这类阈值会系统性漏判；
+# 阈值按模型而定，换模型时已存向量也随之失效（见 KeywordMonitor.embedding_model）。
+SIMILARITY_THRESHOLDS = {
+    "gemini-embedding-001": 0.70,
+    "text-embedding-3-small": 0.40,
+    "all-mpnet-base-v2": 0.78,
+}
+DEFAULT_COSINE_THRESHOLD = 0.50
+
+
+def similarity_threshold_for(model: str) -> float:
+    """模型对应的 query-document cosine 阈值；未校准的模型用保守的默认值"""
+    return SIMILARITY_THRESHOLDS.get(model, DEFAULT_COSINE_THRESHOLD)
+
 
 class EmbeddingService:
     def __init__(self, db_session: Session, model: str = DEFAULT_MODEL):
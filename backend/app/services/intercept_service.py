@@ -8,18 +8,253 @@
 """
 import logging
 import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from dataclasses import dataclass
+import orjson
+from sqlalchemy import exists, func, update
 from sqlmodel import Session, select
 
 from app.models.source_group import SourceGroup
 from app.models.target_user import TargetUser
 from app.models.account import Account
-from app.services.ai_engine import AIEngine
 
 logger = logging.getLogger(__name__)
 
+# ---------------------------------------------------------------------------
+# 流量源信息缓存
+# ---------------------------------------------------------------------------
+# 每个新成员事件都要流量源的 (type, link, name)，这几列很少变：进程内按 id 做
+# 带 TTL 的 LRU 缓存。计数列不缓存（入库时原子累加），本进程改/删流量源时
+# 主动失效，其他进程靠短 TTL 收敛。
+
+_SOURCE_GROUP_CACHE_TTL = 60  # 秒
+_SOURCE_GROUP_CACHE_MAX_SIZE = 1024
+
+# source_group_id -> (过期时间, (type, link, name))
+_source_group_cache: "OrderedDict[int, Tuple[float, Any]]" = OrderedDict()
+_source_group_cache_lock = threading.Lock()
+
+
+def _get_source_group_info(session: Session, source_group_id: int):
+    """流量源的 (type, link, name) 行，不存在返回 None"""
+    with _source_group_cache_lock:
+        entry = _source_group_cache.get(source_group_id)
+        if entry is not None:
+            if entry[0] >= time.monotonic():
+                _source_group_cache.move_to_end(source_group_id)
+                return entry[1]
+            del _source_group_cache[source_group_id]
+
+    info = session.exec(
+        select(SourceGroup.type, SourceGroup.link, SourceGroup.name)
+        .where(SourceGroup.id == source_group_id)
+    ).first()
+    if info is not None:
+        with _source_group_cache_lock:
+            _source_group_cache[source_group_id] = (time.monotonic() + _SOURCE_GROUP_CACHE_TTL, info)
+            _source_group_cache.move_to_end(source_group_id)
+            while len(_source_group_cache) > _SOURCE_GROUP_CACHE_MAX_SIZE:
+                _source_group_cache.popitem(last=False)
+    return info
+
+
+# 竞品群 id 集合：非竞品群的入群事件直接拒绝，不查库
+_COMPETITOR_IDS_TTL = 30  # 秒
+
+_competitor_ids: frozenset = frozenset()
+_competitor_ids_expire_at = 0.0
+
+
+def _get_competitor_ids(session: Session) -> frozenset:
+    global _competitor_ids, _competitor_ids_expire_at
+    now = time.monotonic()
+    if now >= _competitor_ids_expire_at:
+        _competitor_ids = frozenset(session.exec(
+            select(SourceGroup.id).where(SourceGroup.type == "competitor")
+        ).all())
+        _competitor_ids_expire_at = now + _COMPETITOR_IDS_TTL
+    return _competitor_ids
+
+
+def invalidate_source_group_cache(source_group_id: Optional[int] = None) -> None:
+    """流量源被新增、修改或删除后调用；不传 id 时清空全部"""
+    global _competitor_ids_expire_at
+    with _source_group_cache_lock:
+        if source_group_id is None:
+            _source_group_cache.clear()
+        else:
+            _source_group_cache.pop(source_group_id, None)
+    _competitor_ids_expire_at = 0.0
+
+
+# 狙击账号候选：按优先级排好序的账号 id，_SNIPER_CACHE_TTL 秒内共用一次查询
+_SNIPER_CACHE_TTL = 5  # 秒
+
+_sniper_candidates: List[int] = []
+_sniper_candidates_expire_at = 0.0
+
+
+def invalidate_sniper_cache() -> None:
+    """账号状态 / 角色 / 健康分变化后调用，下一次取号重新查询"""
+    global _sniper_candidates_expire_at
+    _sniper_candidates_expire_at = 0.0
+
+
+# ---------------------------------------------------------------------------
+# 新成员批量入库
+# ---------------------------------------------------------------------------
+# API 进程在 lifespan 中启动后台 flusher：process_new_member 完成 AI 评估后只把
+# 待写入的行放进队列，flusher 每 _CAPTURE_FLUSH_INTERVAL 秒（或攒满
+# _CAPTURE_BATCH_SIZE 条）用一次 IN 查重 + 一次 INSERT ... ON CONFLICT DO NOTHING
+# + 按流量源聚合的计数 UPDATE 写入并提交一次，提交后再唤醒各自的调用方。
+# 没有运行中的 flusher（Celery、脚本、测试）时直接用当前会话写单条批次。
+
+_CAPTURE_BATCH_SIZE = 200
+_CAPTURE_FLUSH_INTERVAL = 0.2  # 秒
+
+_capture_queue: Optional[asyncio.Queue] = None
+_capture_loop: Optional[asyncio.AbstractEventLoop] = None
+_capture_flusher_task: Optional[asyncio.Task] = None
+
+# 队列元素：(target_user 行, source_group_id, 入库结果 future)
+_CaptureItem = Tuple[dict, int, Optional[asyncio.Future]]
+
+
+def _insert_ignore_target_users(session: Session, rows: List[dict]) -> None:
+    """INSERT ... ON CONFLICT (telegram_id) DO NOTHING，并发截获同一用户时不撞唯一键"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for row in rows:
+            session.add(TargetUser(**row))
+        return
+    session.exec(insert(TargetUser).values(rows).on_conflict_do_nothing(index_elements=["telegram_id"]))
+
+
+def _write_capture_batch(session: Session, batch: List[_CaptureItem]) -> List[bool]:
+    """写入一批截获用户并提交，按批次顺序返回每条是否为新入库"""
+    ids = {row["telegram_id"] for row, _, _ in batch}
+    existing = set(session.exec(
+        select(TargetUser.telegram_id).where(TargetUser.telegram_id.in_(ids))
+    ).all())
+
+    rows: List[dict] = []
+    captured: List[bool] = []
+    counters: Dict[int, List[int]] = {}  # source_group_id -> [total, high_value]
+    for row, source_group_id, _ in batch:
+        telegram_id = row["telegram_id"]
+        captured.append(telegram_id not in existing)
+        if telegram_id in existing:
+            continue
+        existing.add(telegram_id)  # 同一批次内重复加入只算第一次
+        rows.append(row)
+        counter = counters.setdefault(source_group_id, [0, 0])
+        counter[0] += 1
+        if (row["ai_score"] or 0) >= 70:
+            counter[1] += 1
+
+    if rows:
+        _insert_ignore_target_users(session, rows)
+        for source_group_id, (total, high_value) in counters.items():
+            session.exec(
+                update(SourceGroup)
+                .where(SourceGroup.id == source_group_id)
+                .values(
+                    total_scraped=SourceGroup.total_scraped + total,
+                    high_value_count=SourceGroup.high_value_count + high_value,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        session.commit()
+    return captured
+
+
+def _flush_capture_batch(batch: List[_CaptureItem]) -> List[bool]:
+    from app.core.db import engine
+
+    with Session(engine) as session:
+        return _write_capture_batch(session, batch)
+
+
+async def _collect_capture_batch(batch: List[_CaptureItem]) -> None:
+    loop = asyncio.get_running_loop()
+    batch.append(await _capture_queue.get())
+    deadline = loop.time() + _CAPTURE_FLUSH_INTERVAL
+    while len(batch) < _CAPTURE_BATCH_SIZE:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(_capture_queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+
+
+def _resolve_capture_batch(batch: List[_CaptureItem], captured: Optional[List[bool]], error: Optional[Exception]) -> None:
+    for i, (_, _, future) in enumerate(batch):
+        if future is None or future.done():
+            continue
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(captured[i])
+
+
+async def _flush_captures_forever() -> None:
+    while True:
+        batch: List[_CaptureItem] = []
+        try:
+            await _collect_capture_batch(batch)
+        except asyncio.CancelledError:
+            # 关闭时已出队的行不能丢
+            if batch:
+                _resolve_capture_batch(batch, _flush_capture_batch(batch), None)
+            raise
+        try:
+            captured = await asyncio.to_thread(_flush_capture_batch, batch)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} intercepted users: {e}")
+            _resolve_capture_batch(batch, None, e)
+        else:
+            _resolve_capture_batch(batch, captured, None)
+
+
+def start_capture_flusher() -> None:
+    """在当前事件循环上启动截获用户批量写入任务"""
+    global _capture_queue, _capture_loop, _capture_flusher_task
+    if _capture_flusher_task is not None:
+        return
+    _capture_queue = asyncio.Queue()
+    _capture_loop = asyncio.get_running_loop()
+    _capture_flusher_task = _capture_loop.create_task(_flush_captures_forever())
+
+
+async def stop_capture_flusher() -> None:
+    """停止 flusher，并同步写入队列中剩余的行"""
+    global _capture_queue, _capture_loop, _capture_flusher_task
+    if _capture_flusher_task is None:
+        return
+    _capture_flusher_task.cancel()
+    try:
+        await _capture_flusher_task
+    except asyncio.CancelledError:
+        pass
+    batch: List[_CaptureItem] = []
+    while not _capture_queue.empty():
+        batch.append(_capture_queue.get_nowait())
+    _capture_queue = _capture_loop = _capture_flusher_task = None
+    for start in range(0, len(batch), _CAPTURE_BATCH_SIZE):
+        chunk = batch[start:start + _CAPTURE_BATCH_SIZE]
+        _resolve_capture_batch(chunk, _flush_capture_batch(chunk), None)
+
 
 @dataclass
 class InterceptConfig:
@@ -31,22 +266,67 @@ class InterceptConfig:
     enable_ai_opener: bool = True  # 是否使用AI生成开场白
 
 
+class DMTokenBucket:
+    """私聊限速令牌桶：容量 capacity，每秒回填 capacity / period 个。
+
+    检查与扣减在同一把锁内完成，并发截获不会超发；按单调时钟回填，
+    与墙钟和整点无关。
+    """
+    
+    def __init__(self, capacity: int, period: float = 3600):
+        self.capacity = float(capacity)
+        self.rate = capacity / period
+        self._tokens = float(capacity)
+        self._refill_ts = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._refill_ts) * self.rate)
+        self._refill_ts = now
+    
+    def try_consume(self) -> bool:
+        """有令牌则扣一个并返回 True"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+    
+    def refund(self):
+        """退回一个令牌（已扣减但最终没有私聊）"""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + 1)
+    
+    @property
+    def used(self) -> int:
+        """最近一个周期内已消耗（尚未回填）的令牌数"""
+        with self._lock:
+            self._refill()
+            return math.ceil(self.capacity - self._tokens)
+
+
+# 进程级私聊限速：InterceptService 按请求创建，计数不能放在实例上
+_dm_bucket = DMTokenBucket(InterceptConfig.max_dm_per_hour)
+
+
 class InterceptService:
     """竞品截流服务"""
     
     def __init__(self, session: Session):
         self.session = session
         self.config = InterceptConfig()
-        self.ai_engine = AIEngine(session)
-        self._dm_count_this_hour = 0
-        self._last_hour_reset = datetime.utcnow().hour
+        self._ai_engine = None
+        self._dm_bucket = _dm_bucket
     
-    def _reset_hourly_counter(self):
-        """重置小时计数器"""
-        current_hour = datetime.utcnow().hour
-        if current_hour != self._last_hour_reset:
-            self._dm_count_this_hour = 0
-            self._last_hour_reset = current_hour
+    @property
+    def ai_engine(self):
+        """Lazy load AI engine：非竞品群 / 统计等路径用不到，不在构造时加载 LLM 相关模块"""
+        if self._ai_engine is None:
+            from app.services.ai_engine import AIEngine
+            self._ai_engine = AIEngine(self.session)
+        return self._ai_engine
     
     async def process_new_member(
         self,
@@ -69,54 +349,64 @@ class InterceptService:
         Returns:
             处理结果
         """
-        self._reset_hourly_counter()
+        # 非竞品群直接跳过（按缓存的 id 集合判断，不查库）
+        if source_group_id not in _get_competitor_ids(self.session):
+            return {"status": "skipped", "message": "Not a competitor group"}
         
-        # 获取流量源信息
-        source_group = self.session.get(SourceGroup, source_group_id)
-        if not source_group:
+        # 获取流量源信息：只取过滤和返回需要的列（带缓存）。计数由入库时的原子
+        # UPDATE 累加，不加载 ORM 对象，提交后也不会因过期再 SELECT 一次
+        source_group = _get_source_group_info(self.session, source_group_id)
+        if source_group is None:
             return {"status": "error", "message": "Source group not found"}
         
         # 检查是否是竞品群
         if source_group.type != "competitor":
             return {"status": "skipped", "message": "Not a competitor group"}
         
-        # 检查用户是否已存在
-        existing = self.session.exec(
-            select(TargetUser).where(TargetUser.telegram_id == user_id)
-        ).first()
-        
-        if existing:
-            return {"status": "skipped", "message": "User already exists", "user_id": user_id}
-        
-        # AI评估用户
-        analysis = await self.ai_engine.analyze_user(
+        # AI 评估（慢，外部 LLM）与用户去重查询并行；已存在则取消评估
+        ai_task = asyncio.create_task(self.ai_engine.analyze_user(
             username=username or str(user_id),
             bio=bio,
             messages=None
-        )
-        
-        # 保存用户
-        target_user = TargetUser(
-            telegram_id=user_id,
-            username=username,
-            first_name=first_name,
-            bio=bio,
-            source_group=source_group.link,
-            ai_score=analysis.score,
-            ai_tags=str(analysis.tags),
-            ai_summary=analysis.summary,
-            funnel_stage="raw"
-        )
-        self.session.add(target_user)
+        ))
+        try:
+            existing = await asyncio.to_thread(self._user_exists, user_id)
+        except BaseException:
+            ai_task.cancel()
+            raise
+        if existing:
+            ai_task.cancel()
+            return {"status": "skipped", "message": "User already exists", "user_id": user_id}
+        analysis = await ai_task
         
-        # 更新流量源统计
-        source_group.total_scraped += 1
-        if analysis.score >= 70:
-            source_group.high_value_count += 1
-        self.session.add(source_group)
+        # 评估后即可决定是否触发私聊，入库时一次写好 funnel_stage
+        dm_reason = None
+        if analysis.score < self.config.min_score_for_dm:
+            dm_reason = f"Score {analysis.score} below threshold {self.config.min_score_for_dm}"
+        elif not self._dm_bucket.try_consume():
+            dm_reason = "Hourly limit reached"
         
-        self.session.commit()
-        self.session.refresh(target_user)
+        row = {
+            "telegram_id": user_id,
+            "username": username,
+            "first_name": first_name,
+            "source_group": source_group.link,
+            "ai_score": analysis.score,
+            # JSONText 列在应用层是 JSON 字符串（PG 落库为 JSONB）；orjson 输出即 UTF-8 原文
+            "ai_tags": orjson.dumps(analysis.tags).decode(),
+            "ai_summary": analysis.summary,
+            "funnel_stage": "raw" if dm_reason else "qualified",
+        }
+        # 保存用户并更新流量源统计（批量写入，提交后返回）
+        captured = False
+        try:
+            captured = await self._save_capture(row, source_group_id)
+        finally:
+            # 没有入库（已存在或写入失败）就不会私聊，退回令牌
+            if dm_reason is None and not captured:
+                self._dm_bucket.refund()
+        if not captured:
+            return {"status": "skipped", "message": "User already exists", "user_id": user_id}
         
         result = {
             "status": "captured",
@@ -127,48 +417,56 @@ class InterceptService:
             "source_group": source_group.name or source_group.link
         }
         
-        # 检查是否应该触发私聊
-        if analysis.score >= self.config.min_score_for_dm:
-            if self._dm_count_this_hour < self.config.max_dm_per_hour:
-                result["dm_scheduled"] = True
-                result["dm_delay_seconds"] = self.config.delay_before_dm_seconds
-                self._dm_count_this_hour += 1
-                
-                # 更新用户状态
-                target_user.funnel_stage = "qualified"
-                self.session.add(target_user)
-                self.session.commit()
-            else:
-                result["dm_scheduled"] = False
-                result["dm_reason"] = "Hourly limit reached"
+        if dm_reason is None:
+            result["dm_scheduled"] = True
+            result["dm_delay_seconds"] = self.config.delay_before_dm_seconds
         else:
             result["dm_scheduled"] = False
-            result["dm_reason"] = f"Score {analysis.score} below threshold {self.config.min_score_for_dm}"
+            result["dm_reason"] = dm_reason
         
         logger.info(f"Intercepted new member: {username or user_id}, score: {analysis.score}")
         return result
     
+    def _user_exists(self, user_id: int) -> bool:
+        """在工作线程里查重：用独立会话，self.session 同时被 AI 评估（加载 LLM 配置）使用"""
+        with Session(self.session.get_bind()) as session:
+            # SELECT EXISTS(...)：telegram_id 唯一索引上的一次探测，只回一个布尔值
+            return session.exec(
+                select(exists().where(TargetUser.telegram_id == user_id))
+            ).one()
+    
+    async def _save_capture(self, row: dict, source_group_id: int) -> bool:
+        """写入截获用户，返回是否为新用户（已存在则不写）"""
+        loop, queue = _capture_loop, _capture_queue
+        if queue is not None and loop is asyncio.get_running_loop():
+            future = loop.create_future()
+            queue.put_nowait((row, source_group_id, future))
+            return await future
+        return _write_capture_batch(self.session, [(row, source_group_id, None)])[0]
+    
+    async def warmup(self):
+        """预热 AI 引擎（LLM 配置 + 连接），首批私聊开场白不必付握手开销"""
+        await self.ai_engine.prewarm()
+    
     async def get_sniper_account(self) -> Optional[Account]:
-        """获取可用的狙击账号"""
-        query = select(Account).where(
-            Account.status == "active",
-            Account.combat_role == "sniper"
-        )
-        
-        accounts = self.session.exec(query).all()
-        if not accounts:
-            # 降级到演员组
-            query = select(Account).where(
-                Account.status == "active",
-                Account.combat_role == "actor"
-            )
-            accounts = self.session.exec(query).all()
-        
-        if not accounts:
-            return None
+        """获取可用的狙击账号：狙击组优先，无可用时降级到演员组，组内取健康分最高"""
+        global _sniper_candidates, _sniper_candidates_expire_at
+        now = time.monotonic()
+        if now >= _sniper_candidates_expire_at:
+            # 一次查询拿到排好序的候选：sniper > actor（按字母倒序），再按健康分降序
+            _sniper_candidates = list(self.session.exec(
+                select(Account.id)
+                .where(Account.status == "active", Account.combat_role.in_(("sniper", "actor")))
+                .order_by(Account.combat_role.desc(), func.coalesce(Account.health_score, 0).desc())
+            ).all())
+            _sniper_candidates_expire_at = now + _SNIPER_CACHE_TTL
         
-        # 选择健康分最高的账号
-        return max(accounts, key=lambda a: a.health_score or 0)
+        for account_id in _sniper_candidates:
+            account = self.session.get(Account, account_id)
+            # 缓存期内账号可能已被停用
+            if account is not None and account.status == "active":
+                return account
+        return None
     
     async def generate_dm_content(
         self,
@@ -189,31 +487,36 @@ class InterceptService:
     
     def get_intercept_stats(self) -> Dict[str, Any]:
         """获取截流统计"""
-        # 获取所有竞品群
+        # 竞品群数
         competitor_groups = self.session.exec(
-            select(SourceGroup).where(SourceGroup.type == "competitor")
-        ).all()
+            select(func.count()).select_from(SourceGroup).where(SourceGroup.type == "competitor")
+        ).one()
         
-        # 今日截获数
-        today = datetime.utcnow().date()
-        today_captures = self.session.exec(
-            select(TargetUser).where(
-                TargetUser.created_at >= datetime.combine(today, datetime.min.time())
-            )
-        ).all()
-        
-        # 高分用户
-        high_value_today = [u for u in today_captures if (u.ai_score or 0) >= 70]
+        # 今日截获数 / 高分用户数：数据库聚合，不把当天的行拉回来
+        today_midnight = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        today_captures, high_value_today = self.session.exec(
+            select(func.count(), func.count().filter(TargetUser.ai_score >= 70))
+            .select_from(TargetUser)
+            .where(TargetUser.created_at >= today_midnight)
+        ).one()
         
         return {
-            "competitor_groups": len(competitor_groups),
-            "today_captures": len(today_captures),
-            "today_high_value": len(high_value_today),
-            "dm_count_this_hour": self._dm_count_this_hour,
+            "competitor_groups": competitor_groups,
+            "today_captures": today_captures,
+            "today_high_value": high_value_today,
+            "dm_count_this_hour": self._dm_bucket.used,
             "dm_limit_per_hour": self.config.max_dm_per_hour
         }
 
 
+async def warm_up_intercept():
+    """应用启动时在后台调用：用独立会话预热截流服务"""
+    from app.core.db import engine
+    
+    with Session(engine) as session:
+        await InterceptService(session).warmup()
+
+
 # Celery 任务
 def create_intercept_dm_task(user_id: int, delay_seconds: int = 300):
     """创建延迟私聊任务"""
@@ -9,18 +9,21 @@
 import logging
 import asyncio
 import random
-import json
 import re
+import threading
+from collections import OrderedDict
 from typing import List, Optional, Dict, Tuple, Any
 from sqlmodel import Session, select, func, and_, or_
-from sqlalchemy import text
+from sqlalchemy import case, text, tuple_
 from datetime import datetime, timedelta
 import time
+import orjson
 
 from app.models.account import Account
 from app.models.target_user import TargetUser
+from app.models.types import epoch_seconds, json_array_contains_any
 from app.models.invite_task import InviteTask
-from app.models.invite_log import InviteLog, InviteLogCreate, InviteStats, AccountInviteStats
+from app.models.invite_log import InviteLog, InviteLogBrief, InviteLogCreate, InviteStats, AccountInviteStats
 from app.services.telegram_client import _create_client_and_run
 
 logger = logging.getLogger(__name__)
@@ -42,23 +45,92 @@ ERROR_CODE_MAP = {
     "USER_CHANNELS_TOO_MUCH": "channels_too_much",
 }
 
+# FloodWait 及其等待秒数
+_FLOOD_WAIT_RE = re.compile(r'FLOOD_WAIT[_\s]*(\d+)')
 
-def parse_error_code(error_str: str) -> Tuple[str, Optional[int]]:
-    """解析错误字符串，返回错误代码和可能的等待时间"""
-    error_upper = error_str.upper()
-    
+# 所有已知错误代码合成一个预编译的多选正则：一次扫描找到匹配，命中的文本直接查表
+# 长的在前，保证 USER_PRIVACY_RESTRICTED 优先于其子串 PRIVACY_RESTRICTED
+_ERROR_CODE_RE = re.compile("|".join(
+    re.escape(key) for key in sorted(ERROR_CODE_MAP, key=len, reverse=True)
+))
+
+
+def _match_error_code(error_str: str) -> Optional[Tuple[str, Optional[int]]]:
+    """在给定字符串上按大写错误名匹配，未命中返回 None"""
     # 检查 FloodWait 并提取等待时间
-    flood_match = re.search(r'FLOOD_WAIT[_\s]*(\d+)', error_upper)
-    if flood_match:
-        wait_seconds = int(flood_match.group(1))
-        return "peer_flood", wait_seconds
+    if "FLOOD_WAIT" in error_str:
+        flood_match = _FLOOD_WAIT_RE.search(error_str)
+        if flood_match:
+            wait_seconds = int(flood_match.group(1))
+            return "peer_flood", wait_seconds
     
     # 匹配已知错误代码
-    for key, code in ERROR_CODE_MAP.items():
-        if key in error_upper:
-            return code, None
-    
-    return "other_error", None
+    code_match = _ERROR_CODE_RE.search(error_str)
+    if code_match:
+        return ERROR_CODE_MAP[code_match.group(0)], None
+    return None
+
+
+def parse_error_code(error_str: str) -> Tuple[str, Optional[int]]:
+    """解析错误字符串，返回错误代码和可能的等待时间"""
+    # Pyrogram 的错误名本身就是大写：先在原串上匹配，
+    # 只有没命中时才转大写重试，省掉大多数情况下整串 upper() 的拷贝
+    result = _match_error_code(error_str)
+    if result is None:
+        result = _match_error_code(error_str.upper())
+    return result or ("other_error", None)
+
+
+# 任务统计缓存：task_id -> ((success_count, fail_count), InviteStats)
+# 服务按请求创建，缓存放在模块级；任务计数变化即视为失效
+_TASK_STATS_CACHE_MAX_SIZE = 256
+_task_stats_cache: "OrderedDict[int, Tuple[Tuple[int, int], InviteStats]]" = OrderedDict()
+_task_stats_cache_lock = threading.Lock()
+
+# 邀请过程中的日志 / 目标状态写入累计到这么多条再统一提交
+_INVITE_COMMIT_EVERY = 10
+# 邀请前的随机延迟超过这么多秒时先提交已攒的写入：事务不跨越长时间等待，
+# 否则任务行锁会一直挡住暂停 / 取消等接口的更新（SQLite 下整个库被锁）
+_INVITE_MAX_TXN_IDLE_SECONDS = 5
+
+# === 风控冷却 ===
+# 默认冷却24小时；有具体等待时间时使用它（加上 50% 缓冲），取较大者
+_FLOOD_COOLDOWN_SECONDS = 24 * 3600
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _cooldown_seconds(flood_wait_seconds):
+    """冷却秒数：传入数值时直接计算，传入列时生成等价的 SQL 表达式"""
+    if isinstance(flood_wait_seconds, (int, float, type(None))):
+        return max(_FLOOD_COOLDOWN_SECONDS, (flood_wait_seconds or 0) * 1.5)
+    buffered = func.coalesce(flood_wait_seconds, 0) * 1.5
+    return case((buffered > _FLOOD_COOLDOWN_SECONDS, buffered), else_=_FLOOD_COOLDOWN_SECONDS)
+
+
+def _latest_flood_select(account_ids: Optional[List[int]] = None):
+    """每个账号最近一次风控：(account_id, last_flood_at, flood_wait_seconds)，窗口函数取各分区第一行"""
+    ranked = select(
+        InviteLog.account_id,
+        InviteLog.created_at,
+        InviteLog.flood_wait_seconds,
+        func.row_number().over(
+            partition_by=InviteLog.account_id,
+            order_by=InviteLog.created_at.desc(),
+        ).label("rn"),
+    ).where(InviteLog.error_code == "peer_flood")
+    if account_ids is not None:
+        ranked = ranked.where(InviteLog.account_id.in_(account_ids))
+    ranked = ranked.subquery()
+    return select(
+        ranked.c.account_id,
+        ranked.c.created_at.label("last_flood_at"),
+        ranked.c.flood_wait_seconds,
+    ).where(ranked.c.rn == 1)
+
+
+def _load_json_list(raw: Optional[str]) -> Optional[list]:
+    """解析任务上的 JSON 配置列（用 orjson，大的 ID 列表解析更快）；空值返回 None"""
+    return orjson.loads(raw) if raw else None
 
 
 class InviteService:
@@ -66,6 +138,8 @@ class InviteService:
     
     def __init__(self, session: Session):
         self.session = session
+        self._pending_writes = 0  # 已 add 但尚未提交的写入数
+        self._log_buffer: List[dict] = []  # 待批量插入的邀请日志
     
     # ==================== 账号池管理 ====================
     
@@ -88,10 +162,23 @@ class InviteService:
         Returns:
             可用账号列表，按今日已用次数升序排列
         """
-        # 基础查询：活跃账号
-        query = select(Account).where(
-            Account.status == "active",
-            Account.is_banned == False
+        now = datetime.utcnow()
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        
+        # 今日已用次数：按账号分组的子查询，LEFT JOIN 后没有日志的账号记 0
+        today = (
+            select(InviteLog.account_id, func.count(InviteLog.id).label("cnt"))
+            .where(InviteLog.created_at >= today_start)
+            .group_by(InviteLog.account_id)
+            .subquery()
+        )
+        today_count = func.coalesce(today.c.cnt, 0)
+        
+        # 活跃账号（封禁账号的 status 为 banned，已被排除）且未达每日限额
+        query = (
+            select(Account, today_count)
+            .outerjoin(today, today.c.account_id == Account.id)
+            .where(Account.status == "active", today_count < daily_limit)
         )
         
         # 按账号ID或账号组筛选
@@ -100,110 +187,85 @@ class InviteService:
         elif account_group:
             query = query.where(Account.combat_role == account_group)
         
-        accounts = list(self.session.exec(query).all())
+        # 排除冷却中的账号：最近一次风控时间 + 冷却时长已过
+        if exclude_cooling:
+            flood = _latest_flood_select().subquery()
+            query = query.outerjoin(flood, flood.c.account_id == Account.id).where(or_(
+                flood.c.account_id.is_(None),
+                epoch_seconds(flood.c.last_flood_at) + _cooldown_seconds(flood.c.flood_wait_seconds)
+                <= (now - _EPOCH).total_seconds(),
+            ))
         
-        # 获取每个账号的今日统计
+        # 按今日使用次数升序排列（优先使用用得少的账号）
         available = []
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        for account in accounts:
-            stats = self.get_account_invite_stats(account.id, today_start)
-            
-            # 检查每日限额
-            if stats.today_count >= daily_limit:
-                logger.debug(f"Account {account.id} reached daily limit ({stats.today_count}/{daily_limit})")
-                continue
-            
-            # 检查冷却状态
-            if exclude_cooling and stats.cooldown_until and stats.cooldown_until > datetime.utcnow():
-                logger.debug(f"Account {account.id} is cooling down until {stats.cooldown_until}")
-                continue
-            
-            # 附加统计信息
-            account._invite_stats = stats
+        for account, count in self.session.exec(query.order_by(today_count, Account.id)).all():
+            account._invite_today_count = count
             available.append(account)
         
-        # 按今日使用次数升序排列（优先使用用得少的账号）
-        available.sort(key=lambda a: a._invite_stats.today_count)
-        
         return available
     
     def get_account_invite_stats(self, account_id: int, since: Optional[datetime] = None) -> AccountInviteStats:
         """获取账号的邀请统计"""
+        return self.get_account_invite_stats_bulk([account_id], since)[account_id]
+    
+    def get_account_invite_stats_bulk(
+        self,
+        account_ids: List[int],
+        since: Optional[datetime] = None
+    ) -> Dict[int, AccountInviteStats]:
+        """
+        批量获取账号的邀请统计：不论账号数多少都只发两条分组查询
+        
+        Returns:
+            account_id -> AccountInviteStats（没有日志的账号计数为 0）
+        """
+        now = datetime.utcnow()
         if since is None:
-            since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            since = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        if not account_ids:
+            return {}
 
-        # 今日统计 - use COUNT queries instead of loading all logs
-        today_count = self.session.exec(
-            select(func.count(InviteLog.id)).where(
-                InviteLog.account_id == account_id,
-                InviteLog.created_at >= since
+        # 今日 / 总计数与最后邀请时间：条件计数用 COUNT(CASE ...)，各方言通用
+        is_today = InviteLog.created_at >= since
+        is_success = InviteLog.status == "success"
+        counts = self.session.exec(
+            select(
+                InviteLog.account_id,
+                func.count(case((is_today, 1))),
+                func.count(case((and_(is_today, is_success), 1))),
+                func.count(InviteLog.id),
+                func.count(case((is_success, 1))),
+                func.max(InviteLog.created_at),
             )
-        ).one()
-
-        today_success = self.session.exec(
-            select(func.count(InviteLog.id)).where(
-                InviteLog.account_id == account_id,
-                InviteLog.created_at >= since,
-                InviteLog.status == "success"
-            )
-        ).one()
-
-        today_failed = today_count - today_success
-
-        # 总统计
-        total_count = self.session.exec(
-            select(func.count(InviteLog.id)).where(InviteLog.account_id == account_id)
-        ).one()
-
-        total_success = self.session.exec(
-            select(func.count(InviteLog.id)).where(
-                InviteLog.account_id == account_id,
-                InviteLog.status == "success"
-            )
-        ).one()
-
-        # 最后邀请时间 - only fetch the timestamp, not the full row
-        last_log = self.session.exec(
-            select(InviteLog.created_at).where(InviteLog.account_id == account_id)
-            .order_by(InviteLog.created_at.desc()).limit(1)
-        ).first()
+            .where(InviteLog.account_id.in_(account_ids))
+            .group_by(InviteLog.account_id)
+        ).all()
 
-        # 最后风控时间和冷却状态
-        last_flood = self.session.exec(
-            select(InviteLog.created_at, InviteLog.flood_wait_seconds).where(
-                InviteLog.account_id == account_id,
-                InviteLog.error_code == "peer_flood"
-            ).order_by(InviteLog.created_at.desc()).limit(1)
-        ).first()
+        # 每个账号最近一次风控及其等待秒数
+        floods = {
+            account_id: (last_flood_at, flood_wait_seconds)
+            for account_id, last_flood_at, flood_wait_seconds in self.session.exec(
+                _latest_flood_select(account_ids)
+            ).all()
+        }
 
-        cooldown_until = None
-        last_flood_at = None
-        if last_flood:
-            last_flood_at = last_flood[0]
-            flood_wait_seconds = last_flood[1]
-            # 默认冷却24小时
-            cooldown_hours = 24
-            if flood_wait_seconds:
-                # 如果有具体等待时间，使用它（加上缓冲）
-                cooldown_hours = max(24, flood_wait_seconds / 3600 * 1.5)
-            cooldown_until = last_flood_at + timedelta(hours=cooldown_hours)
+        result = {account_id: AccountInviteStats(account_id=account_id) for account_id in account_ids}
+        for account_id, today_count, today_success, total_count, total_success, last_invite_at in counts:
+            stats = result[account_id]
+            stats.today_count = today_count
+            stats.today_success = today_success
+            stats.today_failed = today_count - today_success
+            stats.total_count = total_count
+            stats.total_success = total_success
+            stats.last_invite_at = last_invite_at
 
-        account = self.session.get(Account, account_id)
+        for account_id, (last_flood_at, flood_wait_seconds) in floods.items():
+            stats = result[account_id]
+            stats.last_flood_at = last_flood_at
+            stats.cooldown_until = last_flood_at + timedelta(seconds=_cooldown_seconds(flood_wait_seconds))
+            stats.is_available = stats.cooldown_until <= now
 
-        return AccountInviteStats(
-            account_id=account_id,
-            account_username=account.username if account else None,
-            today_count=today_count,
-            today_success=today_success,
-            today_failed=today_failed,
-            total_count=total_count,
-            total_success=total_success,
-            last_invite_at=last_log if last_log else None,
-            last_flood_at=last_flood_at,
-            cooldown_until=cooldown_until,
-            is_available=cooldown_until is None or cooldown_until <= datetime.utcnow()
-        )
+        return result
     
     # ==================== 目标用户筛选 ====================
     
@@ -217,7 +279,8 @@ class InviteService:
         exclude_invited: bool = True,
         exclude_failed_recently: bool = True,
         failed_cooldown_hours: int = 72,
-        max_targets: int = 100
+        max_targets: int = 100,
+        after: Optional[Tuple[Optional[int], int, datetime, int]] = None
     ) -> List[TargetUser]:
         """
         高级目标用户筛选
@@ -232,6 +295,8 @@ class InviteService:
             exclude_failed_recently: 排除近期失败的用户
             failed_cooldown_hours: 失败冷却时间
             max_targets: 最大返回数量
+            after: 上一页最后一个用户的 (ai_score, engagement_score, created_at, id)，
+                   传入后从它之后继续取（keyset 分页，不用 OFFSET；id 保证游标唯一）
         
         Returns:
             符合条件的目标用户列表
@@ -243,14 +308,12 @@ class InviteService:
         if target_user_ids:
             conditions.append(TargetUser.id.in_(target_user_ids))
         
-        # 标签筛选
+        # 标签筛选：人工标签或 AI 标签包含任一给定标签，每列一个谓词
         if filter_tags:
-            tag_conditions = []
-            for tag in filter_tags:
-                tag_conditions.append(TargetUser.tags.contains(tag))
-                tag_conditions.append(TargetUser.ai_tags.contains(tag))
-            if tag_conditions:
-                conditions.append(or_(*tag_conditions))
+            conditions.append(or_(
+                json_array_contains_any(TargetUser.tags, filter_tags),
+                json_array_contains_any(TargetUser.ai_tags, filter_tags),
+            ))
         
         # 评分筛选
         if filter_min_score is not None:
@@ -264,32 +327,47 @@ class InviteService:
         if filter_source_groups:
             conditions.append(TargetUser.source_group.in_(filter_source_groups))
         
-        # 排除已成功邀请
-        if exclude_invited:
+        # 排除已成功邀请（排除近期失败同样不含成功用户）：
+        # 单独一个顶层条件，与部分索引 ix_targetuser_eligible 的谓词一致，规划器才能选用它
+        if exclude_invited or exclude_failed_recently:
             conditions.append(TargetUser.invite_status != "success")
         
-        # 排除近期失败
+        # 排除近期失败：未尝试过，或上次尝试已过冷却期
         if exclude_failed_recently:
             cooldown_threshold = datetime.utcnow() - timedelta(hours=failed_cooldown_hours)
             conditions.append(
                 or_(
                     TargetUser.invite_attempted_at.is_(None),
                     TargetUser.invite_status == "untried",
-                    and_(
-                        TargetUser.invite_status != "success",
-                        TargetUser.invite_attempted_at < cooldown_threshold
-                    )
+                    TargetUser.invite_attempted_at < cooldown_threshold
                 )
             )
         
+        # keyset 分页：排在游标之后的行。ai_score 为 NULL 的排在最后，元组比较不能直接覆盖
+        if after is not None:
+            last_score, last_engagement, last_created_at, last_id = after
+            rest = (
+                tuple_(TargetUser.engagement_score, TargetUser.created_at, TargetUser.id)
+                < tuple_(last_engagement, last_created_at, last_id)
+            )
+            if last_score is None:
+                conditions.append(and_(TargetUser.ai_score.is_(None), rest))
+            else:
+                conditions.append(or_(
+                    TargetUser.ai_score < last_score,
+                    and_(TargetUser.ai_score == last_score, rest),
+                    TargetUser.ai_score.is_(None),
+                ))
+        
         if conditions:
             query = query.where(and_(*conditions))
         
-        # 优先级排序：高评分优先
+        # 优先级排序：高评分优先；id 兜底，排序完全确定，分页游标才不会跳过并列的行
         query = query.order_by(
             TargetUser.ai_score.desc().nullslast(),
             TargetUser.engagement_score.desc(),
-            TargetUser.created_at.desc()
+            TargetUser.created_at.desc(),
+            TargetUser.id.desc()
         ).limit(max_targets)
         
         return list(self.session.exec(query).all())
@@ -325,12 +403,12 @@ class InviteService:
             elif result.get("flood_stopped"):
                 task.status = "paused"
                 task.last_error = "Paused due to FloodWait"
-            else:
+            elif task.status != "paused":
                 task.status = "completed"
             
             task.completed_at = datetime.utcnow()
             self.session.add(task)
-            self.session.commit()
+            self._maybe_flush(force=True)
             
             return result
             
@@ -339,16 +417,16 @@ class InviteService:
             task.status = "failed"
             task.last_error = str(e)[:500]
             self.session.add(task)
-            self.session.commit()
+            self._maybe_flush(force=True)
             return {"success": False, "error": str(e)}
     
     async def _execute_task_internal(self, task: InviteTask) -> Dict[str, Any]:
         """内部执行逻辑"""
         # 解析配置
-        account_ids = json.loads(task.account_ids_json) if task.account_ids_json else None
-        target_user_ids = json.loads(task.target_user_ids_json) if task.target_user_ids_json else None
-        filter_tags = json.loads(task.filter_tags) if task.filter_tags else None
-        filter_funnel_stages = json.loads(task.filter_funnel_stages) if task.filter_funnel_stages else None
+        account_ids = _load_json_list(task.account_ids_json)
+        target_user_ids = _load_json_list(task.target_user_ids_json)
+        filter_tags = _load_json_list(task.filter_tags)
+        filter_funnel_stages = _load_json_list(task.filter_funnel_stages)
         
         # 获取可用账号
         accounts = self.get_available_accounts(
@@ -393,22 +471,30 @@ class InviteService:
         
         target_index = 0
         account_index = 0
+        # 各账号今日已用次数：以查询结果为起点在内存中累加，不再每次邀请后回查数据库
+        today_counts = {account.id: account._invite_today_count for account in accounts}
         
         while target_index < len(targets):
-            if task.status == "paused":
+            # 暂停由接口在另一个会话里提交，直接读库里的状态，不受批量提交节奏影响；
+            # 关闭 autoflush，避免这次查询把内存里的任务计数提前写库并锁住任务行
+            with self.session.no_autoflush:
+                status = self.session.exec(
+                    select(InviteTask.status).where(InviteTask.id == task.id)
+                ).one()
+            if status == "paused":
+                task.status = "paused"
                 break
             
             # 获取当前账号
             account = accounts[account_index % len(accounts)]
             
             # 检查账号是否还能用
-            stats = self.get_account_invite_stats(account.id)
-            if stats.today_count >= task.max_invites_per_account:
-                account_index += 1
-                if account_index >= len(accounts):
+            if today_counts[account.id] >= task.max_invites_per_account:
+                if all(count >= task.max_invites_per_account for count in today_counts.values()):
                     # 所有账号都用完了
                     logger.warning("All accounts reached daily limit")
                     break
+                account_index += 1
                 continue
             
             # 获取当前目标
@@ -424,6 +510,7 @@ class InviteService:
                 min_delay=task.min_delay,
                 max_delay=task.max_delay
             )
+            today_counts[account.id] += 1
             
             # 更新统计
             if invite_result["status"] == "success":
@@ -439,19 +526,23 @@ class InviteService:
                 elif invite_result["error_code"] == "peer_flood":
                     result["peer_flood"] += 1
                     task.flood_wait_count += 1
+                    # 触发风控的账号进入冷却（至少24小时），本任务内不再使用
+                    today_counts[account.id] = task.max_invites_per_account
                     
                     if task.stop_on_flood:
                         result["flood_stopped"] = True
                         logger.warning(f"Task {task.id} stopped due to FloodWait")
                         break
             
+            # 任务计数只改内存，和日志、目标状态一起批量提交
             task.pending_count -= 1
             self.session.add(task)
-            self.session.commit()
+            self._maybe_flush()
             
             # 切换账号（轮询）
             account_index += 1
         
+        self._maybe_flush(force=True)
         return result
     
     async def _invite_single_user(
@@ -478,8 +569,9 @@ class InviteService:
             "flood_wait_seconds": None
         }
         
-        # 随机延迟
+        # 随机延迟；等待较长时先把攒下的写入提交掉，不带着事务睡眠
         delay = random.uniform(min_delay, max_delay)
+        self._maybe_flush(force=delay > _INVITE_MAX_TXN_IDLE_SECONDS)
         await asyncio.sleep(delay)
         
         # 定义 Pyrogram 操作
@@ -513,12 +605,14 @@ class InviteService:
             result["flood_wait_seconds"] = flood_wait
         
         result["duration_ms"] = int((time.time() - start_time) * 1000)
+        # 日志与目标状态共用同一个时间戳
+        now = datetime.utcnow()
         
         # 记录日志
-        self._log_invite(task, account, target, channel_link, result)
+        self._log_invite(task, account, target, channel_link, result, now=now)
         
         # 更新目标用户状态
-        self._update_target_status(target, account, channel_link, result)
+        self._update_target_status(target, account, channel_link, result, now=now)
         
         return result
     
@@ -528,10 +622,12 @@ class InviteService:
         account: Account,
         target: TargetUser,
         channel_link: str,
-        result: Dict
+        result: Dict,
+        now: Optional[datetime] = None
     ):
         """记录邀请日志"""
-        log = InviteLog(
+        # 先缓冲成字典，提交时一次 bulk insert，不走 ORM 对象的状态跟踪
+        self._log_buffer.append(dict(
             task_id=task.id,
             account_id=account.id,
             target_user_id=target.id,
@@ -542,27 +638,29 @@ class InviteService:
             error_code=result.get("error_code"),
             error_message=result.get("error_message"),
             duration_ms=result.get("duration_ms"),
-            account_username=account.username,
-            flood_wait_seconds=result.get("flood_wait_seconds")
-        )
-        self.session.add(log)
-        self.session.commit()
+            account_username=account.phone_number,
+            flood_wait_seconds=result.get("flood_wait_seconds"),
+            created_at=now or datetime.utcnow(),
+        ))
+        self._pending_writes += 1
     
     def _update_target_status(
         self,
         target: TargetUser,
         account: Account,
         channel_link: str,
-        result: Dict
+        result: Dict,
+        now: Optional[datetime] = None
     ):
         """更新目标用户的邀请状态"""
-        target.invite_attempted_at = datetime.utcnow()
+        now = now or datetime.utcnow()
+        target.invite_attempted_at = now
         target.invite_account_id = account.id
         target.invite_attempt_count += 1
         
         if result["status"] == "success":
             target.invite_status = "success"
-            target.invite_success_at = datetime.utcnow()
+            target.invite_success_at = now
             target.invite_target_group = channel_link
         else:
             target.invite_status = result.get("error_code", "other_error")
@@ -570,54 +668,72 @@ class InviteService:
             target.invite_error_message = result.get("error_message")
         
         self.session.add(target)
-        self.session.commit()
+        self._pending_writes += 1
+    
+    def _maybe_flush(self, force: bool = False):
+        """累计写入达到批量大小（或强制）时统一提交，避免每次邀请都提交好几次"""
+        if force or self._pending_writes >= _INVITE_COMMIT_EVERY:
+            if self._log_buffer:
+                self.session.bulk_insert_mappings(InviteLog, self._log_buffer)
+                self._log_buffer = []
+            self.session.commit()
+            self._pending_writes = 0
     
     # ==================== 统计查询 ====================
     
     def get_task_stats(self, task_id: int) -> InviteStats:
-        """获取任务统计 - uses GROUP BY aggregation instead of loading all logs"""
-        # Count by status
-        status_counts = self.session.exec(
-            select(InviteLog.status, func.count(InviteLog.id)).where(
-                InviteLog.task_id == task_id
-            ).group_by(InviteLog.status)
-        ).all()
+        """获取任务统计：一条按 (status, error_code) 分组的查询，结果按任务进度缓存"""
+        # 任务计数与日志在同一事务提交，两者不变说明没有新日志，轮询直接返回上次结果
+        task = self.session.get(InviteTask, task_id)
+        etag = (task.success_count, task.fail_count) if task else None
+        with _task_stats_cache_lock:
+            cached = _task_stats_cache.get(task_id)
+        if etag is not None and cached is not None and cached[0] == etag:
+            return cached[1]
 
-        # Count by error_code for failed logs
-        error_counts = self.session.exec(
-            select(InviteLog.error_code, func.count(InviteLog.id)).where(
-                InviteLog.task_id == task_id,
-                InviteLog.status != "success"
-            ).group_by(InviteLog.error_code)
+        counts = self.session.exec(
+            select(InviteLog.status, InviteLog.error_code, func.count(InviteLog.id))
+            .where(InviteLog.task_id == task_id)
+            .group_by(InviteLog.status, InviteLog.error_code)
         ).all()
 
         stats = InviteStats()
-
-        # Process status counts
-        for status, count in status_counts:
+        for status, error_code, count in counts:
             stats.total += count
             if status == "success":
                 stats.success += count
-            else:
-                stats.failed += count
-
-        # Process error code counts
-        error_map = dict(error_counts)
-        stats.privacy_restricted = error_map.get("privacy_restricted", 0)
-        stats.peer_flood = error_map.get("peer_flood", 0)
-        stats.user_banned = error_map.get("banned", 0)
+                continue
+            stats.failed += count
+            if error_code == "privacy_restricted":
+                stats.privacy_restricted += count
+            elif error_code == "peer_flood":
+                stats.peer_flood += count
+            elif error_code == "banned":
+                stats.user_banned += count
         stats.other_errors = stats.failed - stats.privacy_restricted - stats.peer_flood - stats.user_banned
 
         if stats.total > 0:
             stats.success_rate = round(stats.success / stats.total * 100, 2)
 
+        if etag is not None:
+            with _task_stats_cache_lock:
+                _task_stats_cache[task_id] = (etag, stats)
+                _task_stats_cache.move_to_end(task_id)
+                while len(_task_stats_cache) > _TASK_STATS_CACHE_MAX_SIZE:
+                    _task_stats_cache.popitem(last=False)
         return stats
     
-    def get_recent_logs(self, task_id: int, limit: int = 50) -> List[InviteLog]:
-        """获取最近的邀请日志"""
-        return list(self.session.exec(
-            select(InviteLog)
-            .where(InviteLog.task_id == task_id)
-            .order_by(InviteLog.created_at.desc())
-            .limit(limit)
-        ).all())
+    def get_recent_logs(
+        self,
+        task_id: int,
+        limit: int = 50,
+        status: Optional[str] = None
+    ) -> List[InviteLogBrief]:
+        """获取最近的邀请日志：只查询展示用的列，不构造 ORM 对象"""
+        query = select(*(getattr(InviteLog, name) for name in InviteLogBrief.model_fields)).where(
+            InviteLog.task_id == task_id
+        )
+        if status:
+            query = query.where(InviteLog.status == status)
+        rows = self.session.exec(query.order_by(InviteLog.created_at.desc()).limit(limit)).all()
+        return [InviteLogBrief.model_validate(row._mapping) for row in rows]
@@ -0,0 +1,295 @@
+"""
+关键词匹配器
+
+把所有 active KeywordMonitor 的关键词预编译成一次扫描即可完成匹配的结构，
+每条消息只扫描一遍就能得到全部命中的 monitor id，代价与规则数量无关。
+
+- partial: Aho-Corasick 自动机（pyahocorasick；未安装时退化为逐词子串查找）
+- word:    按词边界匹配（FlashText KeywordProcessor；未安装时退化为
+           带边界断言的预编译正则），`ban` 不会命中 `banana`
+- exact:   整条消息（小写）→ monitor id 的字典查找
+- regex:   所有正则编译进一个 Hyperscan 数据库单次扫描（python-hyperscan；
+           未安装或模式不被支持时退化为预编译的 re 逐条 search）
+- semantic: auto_keywords 与 partial 共用同一个自动机做 Level 1 粗筛，
+           Level 2 由 ListenerService 对候选规则做向量比对
+
+匹配器是不可变对象：规则变化时整体重建再替换引用，读路径无需加锁。
+KeywordMonitor 的 ORM 事件在规则增删改提交后递增 Redis 中的版本号，
+监听进程据此在后台重建并整体替换，不必等缓存 TTL 过期。
+"""
+import json
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.models.keyword_monitor import KeywordMonitor
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+    logger.info("pyahocorasick not installed, keyword matcher uses substring scan")
+
+try:
+    import hyperscan
+    HYPERSCAN_AVAILABLE = True
+except ImportError:
+    HYPERSCAN_AVAILABLE = False
+    logger.info("hyperscan not installed, regex monitors use the re module")
+
+try:
+    from flashtext import KeywordProcessor
+    FLASHTEXT_AVAILABLE = True
+except ImportError:
+    FLASHTEXT_AVAILABLE = False
+    logger.info("flashtext not installed, word monitors use a compiled regex")
+
+# 与 FlashText 默认 non_word_boundaries 一致：字母、数字、下划线之间不算词边界
+_WORD_CHARS = "A-Za-z0-9_"
+
+# 规则版本号：任何 monitor 增删改后递增，监听进程发现变化即重建匹配器
+MONITORS_VERSION_KEY = "keyword_monitors:version"
+
+
+def bump_monitors_version() -> None:
+    """递增规则版本号（Redis 不可用时只记录日志，监听进程仍会按 TTL 刷新）"""
+    try:
+        from app.core.security import _get_redis
+        _get_redis().incr(MONITORS_VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Failed to bump keyword monitor version: {e}")
+
+
+def get_monitors_version() -> Optional[int]:
+    """读取规则版本号；Redis 不可用时返回 None"""
+    try:
+        from app.core.security import _get_redis
+        value = _get_redis().get(MONITORS_VERSION_KEY)
+        return int(value) if value is not None else 0
+    except Exception as e:
+        logger.debug(f"Failed to read keyword monitor version: {e}")
+        return None
+
+
+@lru_cache(maxsize=4096)
+def compile_regex(pattern: str, flags: int = re.IGNORECASE) -> Optional["re.Pattern"]:
+    """
+    编译并缓存 regex 规则；非法模式返回 None（与旧逻辑一致：永不命中）。
+    以模式文本为键，规则改了关键词自然换键，无需额外失效处理。
+    """
+    try:
+        return re.compile(pattern, flags)
+    except re.error:
+        return None
+
+
+def compile_word(word: str) -> "re.Pattern":
+    """word 规则的单词边界正则（缓存复用）"""
+    return compile_regex(
+        f"(?<![{_WORD_CHARS}]){re.escape(word)}(?![{_WORD_CHARS}])"
+    )
+
+
+def parse_auto_keywords(raw: Optional[str]) -> List[str]:
+    """解析 auto_keywords（JSON 数组，兼容逗号分隔），返回小写关键词列表"""
+    if not raw:
+        return []
+    try:
+        keywords = json.loads(raw)
+    except (json.JSONDecodeError, TypeError, ValueError):
+        keywords = [k.strip() for k in raw.split(",")]
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    if not isinstance(keywords, list):
+        return []
+    return [str(k).lower() for k in keywords if k is not None]
+
+
+def normalize_auto_keywords(raw: Optional[str]) -> Optional[str]:
+    """入库前规整 auto_keywords：合法 JSON 原样保留，逗号分隔转成 JSON 数组"""
+    if raw is None or not raw.strip():
+        return None
+    try:
+        json.loads(raw)
+        return raw
+    except (json.JSONDecodeError, ValueError):
+        return json.dumps([k.strip() for k in raw.split(",") if k.strip()], ensure_ascii=False)
+
+
+class KeywordMatcher:
+    """active monitors 的关键词索引（含 semantic 规则的 Level 1 粗筛）"""
+
+    # 由本匹配器判定的 match_type；其余类型调用方自行处理
+    INDEXED_TYPES = frozenset({"exact", "partial", "word", "regex"})
+
+    _HS_FLAGS = (
+        (hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+         | hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH)
+        if HYPERSCAN_AVAILABLE else 0
+    )
+
+    def __init__(self, monitors: Iterable[KeywordMonitor]):
+        self._exact: Dict[str, Tuple[int, ...]] = {}
+        self._partial: Dict[str, Tuple[int, ...]] = {}
+        # 空关键词的 partial 规则：与原来的 `"" in text` 语义一致，总是命中
+        self._always: Set[int] = set()
+        # semantic 规则：auto_keywords -> ids；未配置关键词的规则总是通过 Level 1
+        self._level1: Dict[str, Tuple[int, ...]] = {}
+        self._level1_always: Set[int] = set()
+
+        exact: Dict[str, List[int]] = {}
+        partial: Dict[str, List[int]] = {}
+        word: Dict[str, List[int]] = {}
+        regex: Dict[int, str] = {}
+        level1: Dict[str, List[int]] = {}
+        for monitor in monitors:
+            match_type = self.match_type_of(monitor)
+            if match_type == "semantic":
+                keywords = parse_auto_keywords(monitor.auto_keywords)
+                if not keywords or "" in keywords:
+                    self._level1_always.add(monitor.id)
+                for keyword in set(keywords):
+                    if keyword:
+                        level1.setdefault(keyword, []).append(monitor.id)
+                continue
+            if match_type == "regex":
+                regex[monitor.id] = monitor.keyword or ""
+                continue
+            keyword = (monitor.keyword or "").lower()
+            if match_type == "exact":
+                exact.setdefault(keyword, []).append(monitor.id)
+            elif match_type == "word":
+                if keyword.strip():
+                    word.setdefault(keyword.strip(), []).append(monitor.id)
+            elif keyword:
+                partial.setdefault(keyword, []).append(monitor.id)
+            else:
+                self._always.add(monitor.id)
+
+        self._exact = {k: tuple(v) for k, v in exact.items()}
+        self._partial = {k: tuple(v) for k, v in partial.items()}
+        self._word = {k: tuple(v) for k, v in word.items()}
+        self._level1 = {k: tuple(v) for k, v in level1.items()}
+
+        # partial 与 Level 1 关键词共用一个自动机，payload 为 (partial ids, level1 ids)
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and (self._partial or self._level1):
+            automaton = ahocorasick.Automaton()
+            for keyword in self._partial.keys() | self._level1.keys():
+                automaton.add_word(
+                    keyword, (self._partial.get(keyword, ()), self._level1.get(keyword, ()))
+                )
+            automaton.make_automaton()
+            self._automaton = automaton
+
+        self._word_processor = None
+        self._word_pattern = None
+        if self._word:
+            if FLASHTEXT_AVAILABLE:
+                processor = KeywordProcessor(case_sensitive=False)
+                for keyword in self._word:
+                    processor.add_keyword(keyword, keyword)
+                self._word_processor = processor
+            else:
+                # 长词优先，与 FlashText 的最长匹配一致
+                alternation = "|".join(
+                    re.escape(k) for k in sorted(self._word, key=len, reverse=True)
+                )
+                self._word_pattern = re.compile(
+                    f"(?<![{_WORD_CHARS}])(?:{alternation})(?![{_WORD_CHARS}])",
+                    re.IGNORECASE,
+                )
+
+        self._hs_db = None
+        # Hyperscan 不支持的模式（反向引用、环视等）仍走 re
+        self._re_patterns: List[Tuple[int, "re.Pattern"]] = []
+        self._build_regex(regex)
+
+    def _build_regex(self, regex: Dict[int, str]) -> None:
+        if not regex:
+            return
+
+        fallback = dict(regex)
+        if HYPERSCAN_AVAILABLE:
+            supported = {}
+            for monitor_id, pattern in regex.items():
+                try:
+                    hyperscan.Database().compile(
+                        expressions=[pattern.encode("utf-8")], flags=self._HS_FLAGS
+                    )
+                    supported[monitor_id] = pattern
+                except hyperscan.error:
+                    pass
+            if supported:
+                ids = list(supported)
+                db = hyperscan.Database()
+                db.compile(
+                    expressions=[supported[i].encode("utf-8") for i in ids],
+                    ids=ids,
+                    flags=[self._HS_FLAGS] * len(ids),
+                )
+                self._hs_db = db
+                for monitor_id in ids:
+                    del fallback[monitor_id]
+
+        for monitor_id, pattern in fallback.items():
+            compiled = compile_regex(pattern)
+            if compiled is None:
+                # 非法正则与旧逻辑一致：永不命中
+                logger.warning(f"Monitor {monitor_id} has invalid regex: {pattern!r}")
+                continue
+            self._re_patterns.append((monitor_id, compiled))
+
+    @staticmethod
+    def match_type_of(monitor: KeywordMonitor) -> str:
+        """未知 / 空的 match_type 按 partial 处理（与旧的 else 分支一致）"""
+        match_type = monitor.match_type or "partial"
+        if match_type in ("exact", "word", "regex", "semantic"):
+            return match_type
+        return "partial"
+
+    def match(self, content: str) -> Set[int]:
+        """返回 content 命中的 exact / partial / word / regex monitor id 集合"""
+        return self.scan(content)[0]
+
+    def scan(self, content: str) -> Tuple[Set[int], Set[int]]:
+        """
+        单次扫描返回 (命中的 exact/partial/word/regex monitor id,
+        通过 Level 1 粗筛的 semantic monitor id)
+        """
+        text = content.lower()
+        hits = set(self._always)
+        hits.update(self._exact.get(text, ()))
+        level1 = set(self._level1_always)
+
+        if self._automaton is not None:
+            for _end, (ids, level1_ids) in self._automaton.iter(text):
+                hits.update(ids)
+                level1.update(level1_ids)
+        else:
+            for keyword, ids in self._partial.items():
+                if keyword in text:
+                    hits.update(ids)
+            for keyword, ids in self._level1.items():
+                if keyword in text:
+                    level1.update(ids)
+
+        if self._word_processor is not None:
+            for keyword in self._word_processor.extract_keywords(text):
+                hits.update(self._word.get(keyword, ()))
+        elif self._word_pattern is not None:
+            for m in self._word_pattern.finditer(text):
+                hits.update(self._word.get(m.group(0), ()))
+
+        if self._hs_db is not None:
+            def on_match(monitor_id, _from, _to, _flags, _context):
+                hits.add(monitor_id)
+            self._hs_db.scan(content.encode("utf-8"), match_event_handler=on_match)
+        for monitor_id, pattern in self._re_patterns:
+            if pattern.search(content):
+                hits.add(monitor_id)
+        return hits, level1
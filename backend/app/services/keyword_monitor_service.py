@@ -1,6 +1,8 @@
 from typing import List, Optional
-from sqlmodel import Session, select
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select, update
 from app.models.keyword_monitor import KeywordMonitor, KeywordMonitorCreate, KeywordMonitorUpdate, KeywordHit, KeywordHitBase
+from app.services.keyword_matcher import normalize_auto_keywords
 
 class KeywordMonitorService:
     def __init__(self, session: Session):
@@ -8,6 +10,8 @@ class KeywordMonitorService:
 
     def create_monitor(self, monitor_create: KeywordMonitorCreate) -> KeywordMonitor:
         db_monitor = KeywordMonitor.from_orm(monitor_create)
+        # auto_keywords 在 PG 上是 JSONB 列，逗号分隔的输入需先转成 JSON 数组
+        db_monitor.auto_keywords = normalize_auto_keywords(db_monitor.auto_keywords)
         self.session.add(db_monitor)
         self.session.commit()
         self.session.refresh(db_monitor)
@@ -30,6 +34,12 @@ class KeywordMonitorService:
             return None
         
         monitor_data = monitor_update.dict(exclude_unset=True)
+        if monitor_data.get("scenario_description", db_monitor.scenario_description) != db_monitor.scenario_description:
+            # 场景描述变了，量化向量作废，监听进程会重新 embed
+            db_monitor.scenario_embedding_q8 = None
+            db_monitor.embedding_model = None
+        if "auto_keywords" in monitor_data:
+            monitor_data["auto_keywords"] = normalize_auto_keywords(monitor_data["auto_keywords"])
         for key, value in monitor_data.items():
             setattr(db_monitor, key, value)
             
@@ -42,6 +52,12 @@ class KeywordMonitorService:
         db_monitor = self.get_monitor(monitor_id)
         if not db_monitor:
             return False
+        # 没有 hits 关系可供 ORM 级联置空，一条 UPDATE 解除命中记录的外键
+        self.session.exec(
+            update(KeywordHit)
+            .where(KeywordHit.keyword_monitor_id == monitor_id)
+            .values(keyword_monitor_id=None)
+        )
         self.session.delete(db_monitor)
         self.session.commit()
         return True
@@ -54,7 +70,8 @@ class KeywordMonitorService:
         return db_hit
 
     def get_hits(self, skip: int = 0, limit: int = 100, status: Optional[str] = None) -> List[KeywordHit]:
-        statement = select(KeywordHit)
+        # KeywordHitRead 带 keyword_monitor，一次 IN 查询预加载，避免逐行懒加载
+        statement = select(KeywordHit).options(selectinload(KeywordHit.keyword_monitor))
         if status:
             statement = statement.where(KeywordHit.status == status)
         statement = statement.order_by(KeywordHit.detected_at.desc()).offset(skip).limit(limit)
@@ -5,20 +5,26 @@
 import logging
 import asyncio
 import time
+import threading
 import re
 import json
 import random
 from datetime import datetime, date
-from typing import List, Dict, Optional, Tuple
-from sqlmodel import Session, select
+from typing import List, Dict, Optional, Set, Tuple
+from sqlmodel import Session, select, update
 from pyrogram import Client, filters, idle, enums
 from pyrogram.handlers import MessageHandler
 from app.core.db import engine
 from app.models.account import Account
-from app.models.keyword_monitor import KeywordMonitor, KeywordHit
+from app.models.keyword_monitor import KeywordMonitor, KeywordHit, DEFAULT_SIMILARITY_THRESHOLD
 from app.services.telegram_client import get_proxy_dict, _create_client_and_run
 from app.services.keyword_monitor_service import KeywordMonitorService
+from app.services.keyword_matcher import (
+    KeywordMatcher, get_monitors_version,
+)
+from app.services.semantic_index import SemanticMonitorIndex
 from app.services.score_service import ScoreService
+from app.services.llm import close_shared_http_client, enable_shared_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -39,8 +45,12 @@ class ListenerService:
         self.monitors: List[KeywordMonitor] = []
         self.monitor_service: KeywordMonitorService = None
 
-        # 冷却时间记录: key = f"{monitor_id}_{chat_id}", value = last_trigger_timestamp
-        self.cooldowns: Dict[str, float] = {}
+        # 冷却 / 每日回复计数放在 Redis（多分片共享，热路径不写 DB）；
+        # Redis 不可用时冷却退化为本进程内存记录: key = (monitor_id, chat_id)
+        self.cooldowns: Dict[Tuple[int, int], float] = {}
+        # 待回写的每日回复计数: monitor_id -> (YYYY-MM-DD, count)，由后台任务每分钟落库
+        self._reply_counts: Dict[int, Tuple[str, int]] = {}
+        self._reply_counts_lock = threading.Lock()
 
         # 上下文缓存: key = chat_id, value = List of recent messages (保留兼容)
         self.context_cache: Dict[int, List[str]] = {}
@@ -49,23 +59,69 @@ class ListenerService:
         # ConversationDirector — 动态对话引擎
         from app.services.conversation_director import ConversationDirector
         self.director = ConversationDirector()
-        self._our_tg_ids: set = set()   # 我们自己账号的 Telegram user_id
-
-        # active_monitors 内存缓存：避免每条消息打一次 DB。
-        # 1000+ 账号 × 群活跃度可能 ≥ 几千 QPS，按 30s TTL 刷新已足够。
-        self._monitors_cache: List[KeywordMonitor] = []
-        self._monitors_cache_ts: float = 0.0
+        self._our_tg_ids: Set[int] = set()   # 我们自己账号的 Telegram user_id
+
+        # active_monitors 内存快照：避免每条消息打一次 DB。
+        # (monitors, 预编译的匹配器, 加载时间) 作为一个元组整体替换（双缓冲），
+        # 热路径只读引用、不加锁；重建在后台线程完成。
+        # 1000+ 账号 × 群活跃度可能 ≥ 几千 QPS，按 30s TTL 兜底刷新已足够。
+        self._monitor_snapshot: Tuple[List[KeywordMonitor], KeywordMatcher, float] = (
+            [], KeywordMatcher([]), 0.0
+        )
         self._monitors_cache_ttl: float = 30.0
-
-    def _get_active_monitors(self, session: Session) -> List[KeywordMonitor]:
-        """返回缓存的 active monitors；过期则刷新。"""
-        now = time.time()
-        if now - self._monitors_cache_ts > self._monitors_cache_ttl:
-            self._monitors_cache = list(session.exec(
+        # 规则版本号：增删改后提前刷新快照，轮询间隔远小于 TTL
+        self._monitors_version: Optional[int] = None
+        self._monitors_version_ts: float = 0.0
+        self._monitors_version_poll: float = 2.0
+        self._monitors_refreshing = False
+        # semantic 规则的场景向量索引，随 monitors 快照刷新增量同步
+        self._semantic_index = SemanticMonitorIndex()
+        self._semantic_index_ts: float = 0.0
+        self._embedder = None
+
+    def _load_monitor_snapshot(self) -> None:
+        """加载 active monitors 并预编译匹配器，完成后整体替换快照"""
+        with Session(engine) as session:
+            monitors = list(session.exec(
                 select(KeywordMonitor).where(KeywordMonitor.is_active == True)
             ).all())
-            self._monitors_cache_ts = now
-        return self._monitors_cache
+        self._monitor_snapshot = (monitors, KeywordMatcher(monitors), time.time())
+
+    def _refresh_monitor_snapshot(self, expired: bool) -> None:
+        """后台线程：规则版本变化或 TTL 过期时重建快照"""
+        try:
+            version = get_monitors_version()
+            if version is not None and version != self._monitors_version:
+                self._monitors_version = version
+                expired = True
+            if expired:
+                self._load_monitor_snapshot()
+        except Exception as e:
+            logger.error(f"Refresh keyword monitors failed: {e}")
+        finally:
+            self._monitors_refreshing = False
+
+    def _get_active_monitors(self) -> Tuple[List[KeywordMonitor], KeywordMatcher]:
+        """返回当前快照 (active monitors, 匹配器)；需要刷新时交给后台线程。"""
+        monitors, matcher, loaded_at = self._monitor_snapshot
+        if not loaded_at:
+            # 首次加载同步完成，之后都不阻塞消息处理
+            self._monitors_version = get_monitors_version()
+            self._load_monitor_snapshot()
+            monitors, matcher, _ = self._monitor_snapshot
+            return monitors, matcher
+
+        now = time.time()
+        if not self._monitors_refreshing and now - self._monitors_version_ts > self._monitors_version_poll:
+            self._monitors_version_ts = now
+            self._monitors_refreshing = True
+            threading.Thread(
+                target=self._refresh_monitor_snapshot,
+                args=(now - loaded_at > self._monitors_cache_ttl,),
+                name="keyword-monitor-refresh",
+                daemon=True,
+            ).start()
+        return monitors, matcher
 
     async def _handle_message(self, client: Client, message):
         """
@@ -99,33 +155,54 @@ class ListenerService:
             )
 
         with Session(engine) as session:
-            active_monitors = self._get_active_monitors(session)
+            active_monitors, keyword_matcher = self._get_active_monitors()
 
             chat_title = message.chat.title or str(chat_id)
             username = message.from_user.username if message.from_user else ""
             first_name = message.from_user.first_name if message.from_user else ""
             content = message.text
+            # 一次扫描得到全部命中的 monitor id，以及通过 Level 1 粗筛的 semantic 规则
+            matched_ids, level1_ids = keyword_matcher.scan(content)
+            # semantic 规则的向量判定：没有 Level 1 候选的消息完全不会 embed。
+            # semantic_hits 为 None 表示向量不可用（退回 LLM 精判）
+            semantic_checked = False
+            semantic_hits: Optional[Dict[int, float]] = None
 
             for monitor in active_monitors:
+                indexed = KeywordMatcher.match_type_of(monitor) in KeywordMatcher.INDEXED_TYPES
+                if indexed and monitor.id not in matched_ids:
+                    continue
+
                 # === Step 1: 检查目标群组过滤 ===
                 if not self._check_target_group(monitor, message):
                     continue
                 
                 # === Step 2: 关键词匹配 (根据模式选择) ===
-                is_match, match_confidence = await self._check_match(
-                    monitor, content, session
-                )
+                if indexed:
+                    is_match, match_confidence = True, 100
+                else:
+                    # match_type_of 只会返回索引类型或 semantic
+                    if monitor.id not in level1_ids:
+                        continue
+                    if not semantic_checked:
+                        semantic_checked = True
+                        semantic_hits = await self._semantic_hits(
+                            content, session, level1_ids
+                        )
+                    is_match, match_confidence = await self._semantic_level2(
+                        monitor, content, session, semantic_hits
+                    )
                 
                 if not is_match:
                     continue
                 
                 # === Step 3: 冷却检查 ===
-                if not self._check_cooldown(monitor, chat_id):
+                if not await self._check_cooldown(monitor, chat_id):
                     continue
                 
                 # === Step 4: 熔断检查 (主动营销模式) ===
                 if monitor.marketing_mode == "active":
-                    if not self._check_circuit_breaker(monitor, session):
+                    if not await self._check_circuit_breaker(monitor, session):
                         logger.warning(f"Monitor {monitor.id} hit daily limit, skipping")
                         continue
 
@@ -178,64 +255,70 @@ class ListenerService:
                 return True
         return False
 
-    async def _check_match(
-        self, monitor: KeywordMonitor, content: str, session: Session
-    ) -> Tuple[bool, int]:
+    async def _refresh_semantic_index(self, session: Session) -> None:
+        """monitors 快照刷新后同步语义索引，只 embed 新增 / 描述变更的规则"""
+        monitors, _, loaded_at = self._monitor_snapshot
+        if self._semantic_index_ts == loaded_at:
+            return
+        self._semantic_index_ts = loaded_at
+
+        from app.services.embedding_service import EmbeddingService
+        self._embedder = EmbeddingService(session, model=self._semantic_index.model)
+        pending = self._semantic_index.pending(monitors)
+        vectors: Dict[int, List[float]] = {}
+        if pending and self._embedder.is_configured():
+            ids = list(pending)
+            results = await self._embedder.embed_batch([pending[i] for i in ids])
+            vectors = {i: v for i, v in zip(ids, results) if v}
+        fresh = self._semantic_index.sync(monitors, vectors)
+
+        # 量化向量回写 DB，重启后直接加载；描述已被改动的行不覆盖
+        for monitor_id, blob in fresh.items():
+            session.exec(
+                update(KeywordMonitor)
+                .where(KeywordMonitor.id == monitor_id)
+                .where(KeywordMonitor.scenario_description == pending[monitor_id])
+                .values(scenario_embedding_q8=blob, embedding_model=self._semantic_index.model)
+            )
+        if fresh:
+            session.commit()
+
+    async def _semantic_hits(
+        self, content: str, session: Session, candidates: Set[int]
+    ) -> Optional[Dict[int, float]]:
         """
-        检查消息是否匹配规则
-        返回: (是否匹配, 置信度0-100)
+        消息 embed 一次，只与 Level 1 候选规则的场景向量做内积，
+        返回达到阈值的 monitor_id -> cosine；向量不可用时返回 None
         """
-        # === 语义匹配模式 (方案A两级过滤) ===
-        if monitor.match_type == "semantic":
-            return await self._semantic_match(monitor, content, session)
-        
-        # === 传统匹配模式 ===
-        if monitor.match_type == "exact":
-            if monitor.keyword.lower() == content.lower():
-                return True, 100
-        elif monitor.match_type == "regex":
-            try:
-                if re.search(monitor.keyword, content, re.IGNORECASE):
-                    return True, 100
-            except re.error:
-                pass
-        else:  # partial
-            if monitor.keyword.lower() in content.lower():
-                return True, 100
-        
-        return False, 0
+        try:
+            await self._refresh_semantic_index(session)
+            if not self._embedder.is_configured():
+                return None
+            if not any(monitor_id in self._semantic_index for monitor_id in candidates):
+                return None
+            query = await self._embedder.embed(content)
+            if not query:
+                return None
+            return self._semantic_index.match(query, candidates=candidates)
+        except Exception as e:
+            logger.error(f"Semantic index search failed: {e}")
+            return None
 
-    async def _semantic_match(
-        self, monitor: KeywordMonitor, content: str, session: Session
+    async def _semantic_level2(
+        self,
+        monitor: KeywordMonitor,
+        content: str,
+        session: Session,
+        semantic_hits: Optional[Dict[int, float]] = None,
     ) -> Tuple[bool, int]:
-        """
-        方案A两级过滤：语义匹配
-        Level 1: 关键词粗筛 (本地快速过滤)
-        Level 2: LLM 精判 (AI 理解语境)
-        """
-        # === Level 1: 关键词粗筛 ===
-        auto_keywords = []
-        if monitor.auto_keywords:
-            try:
-                auto_keywords = json.loads(monitor.auto_keywords)
-            except (json.JSONDecodeError, TypeError, ValueError):
-                auto_keywords = [k.strip() for k in monitor.auto_keywords.split(",")]
-        
-        # 如果有自动关键词，先进行粗筛
-        if auto_keywords:
-            content_lower = content.lower()
-            keyword_hit = False
-            for kw in auto_keywords:
-                if kw.lower() in content_lower:
-                    keyword_hit = True
-                    break
-            
-            if not keyword_hit:
-                # Level 1 未通过，直接丢弃
-                return False, 0
-            
-            logger.debug(f"Level 1 passed: keyword hit in auto_keywords")
-        
+        """Level 2: 场景向量相似度优先；向量不可用时退回 LLM 精判"""
+        # === Level 2: 场景向量相似度（阈值已在索引内按规则批量比较）===
+        if semantic_hits is not None and monitor.id in self._semantic_index:
+            if monitor.id in semantic_hits:
+                return True, int(round(semantic_hits[monitor.id] * 100))
+            logger.debug(f"Level 2 rejected: monitor {monitor.id} below similarity threshold")
+            return False, 0
+
         # === Level 2: LLM 精判 ===
         if not monitor.scenario_description:
             # 没有场景描述，跳过 Level 2
@@ -266,7 +349,7 @@ class ListenerService:
                     result = json.loads(json_match.group())
                     is_match = result.get("match", False)
                     confidence = result.get("confidence", 0)
-                    threshold = monitor.similarity_threshold or 70
+                    threshold = monitor.similarity_threshold or DEFAULT_SIMILARITY_THRESHOLD
                     
                     if is_match and confidence >= threshold:
                         return True, confidence
@@ -280,22 +363,62 @@ class ListenerService:
         
         return False, 0
 
-    def _check_cooldown(self, monitor: KeywordMonitor, chat_id: int) -> bool:
-        """冷却时间检查"""
-        cooldown_key = f"{monitor.id}_{chat_id}"
-        last_trigger = self.cooldowns.get(cooldown_key, 0)
+    async def _check_cooldown(self, monitor: KeywordMonitor, chat_id: int) -> bool:
+        """冷却时间检查：SET NX EX 原子占位，键过期即冷却结束"""
         cooldown_secs = monitor.cooldown_seconds or 300
-        
+        try:
+            from app.core.security import _get_redis
+            # 同步 Redis 调用放到线程里，Redis 卡顿时不阻塞 Pyrogram 事件循环
+            return bool(await asyncio.to_thread(
+                _get_redis().set, f"kw:{monitor.id}:cd:{chat_id}", 1, ex=cooldown_secs, nx=True
+            ))
+        except Exception as e:
+            logger.debug(f"Redis cooldown unavailable, using local state: {e}")
+
+        cooldown_key = (monitor.id, chat_id)
+        last_trigger = self.cooldowns.get(cooldown_key, 0)
         if time.time() - last_trigger < cooldown_secs:
             return False
-        
         self.cooldowns[cooldown_key] = time.time()
         return True
 
-    def _check_circuit_breaker(self, monitor: KeywordMonitor, session: Session) -> bool:
+    @staticmethod
+    def _incr_daily_reply(key: str) -> int:
+        """按天计数原子 +1 并续期，返回新计数（在线程里执行）"""
+        from app.core.security import _get_redis
+        pipe = _get_redis().pipeline()
+        pipe.incr(key)
+        pipe.expire(key, 48 * 3600)
+        return pipe.execute()[0]
+
+    async def _check_circuit_breaker(self, monitor: KeywordMonitor, session: Session) -> bool:
         """
         熔断机制检查：防止单规则回复过多。
-        monitor 可能来自 _monitors_cache（detached），需要 merge 到当前 session 才能 commit。
+        计数为 Redis 中按天分键的 INCR（48h 过期），原子递增后比较，不再逐条 UPDATE 规则行；
+        计数结果记入 _reply_counts，由 _flush_reply_counts 每分钟回写 daily_reply_count。
+        """
+        today = date.today()
+        max_replies = monitor.max_replies_per_day or 10
+        try:
+            count = await asyncio.to_thread(
+                self._incr_daily_reply, f"kw:{monitor.id}:daily:{today:%Y%m%d}"
+            )
+        except Exception as e:
+            logger.debug(f"Redis reply counter unavailable, using DB: {e}")
+            return self._check_circuit_breaker_db(monitor, session)
+
+        allowed = count <= max_replies
+        count = min(count, max_replies)
+        with self._reply_counts_lock:
+            self._reply_counts[monitor.id] = (today.isoformat(), count)
+        monitor.daily_reply_count = count
+        monitor.last_reply_date = today.isoformat()
+        return allowed
+
+    def _check_circuit_breaker_db(self, monitor: KeywordMonitor, session: Session) -> bool:
+        """
+        Redis 不可用时的熔断检查：直接读写规则行。
+        monitor 可能来自 _monitor_snapshot（detached），需要 merge 到当前 session 才能 commit。
         """
         today = date.today().isoformat()
 
@@ -320,6 +443,36 @@ class ListenerService:
 
         return True
 
+    def _flush_reply_counts(self) -> int:
+        """把 Redis 熔断计数批量回写到 KeywordMonitor 行，返回写入的规则数"""
+        with self._reply_counts_lock:
+            pending, self._reply_counts = self._reply_counts, {}
+        if not pending:
+            return 0
+        try:
+            with Session(engine) as session:
+                for monitor_id, (day, count) in pending.items():
+                    session.exec(
+                        update(KeywordMonitor)
+                        .where(KeywordMonitor.id == monitor_id)
+                        .values(daily_reply_count=count, last_reply_date=day)
+                    )
+                session.commit()
+        except Exception as e:
+            logger.warning(f"Failed to flush reply counters: {e}")
+            # 放回去下次重试；期间的新计数更新，优先保留
+            with self._reply_counts_lock:
+                for monitor_id, value in pending.items():
+                    self._reply_counts.setdefault(monitor_id, value)
+            return 0
+        return len(pending)
+
+    async def _reply_counts_flusher(self, interval: float = 60.0) -> None:
+        """后台任务：每 interval 秒回写一次熔断计数"""
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self._flush_reply_counts)
+
     async def _execute_passive_marketing(
         self, client: Client, message, session: Session, 
         monitor: KeywordMonitor, hit: KeywordHit,
@@ -523,6 +676,8 @@ class ListenerService:
         # 创建统一的临时工作目录，存放解密后的 session 文件
         temp_workdir = tempfile.mkdtemp(prefix="tgsc_listener_")
         logger.info(f"Temp session workdir: {temp_workdir}")
+        # 监听进程常驻：AI 回复等 LLM 调用共用一个连接池
+        enable_shared_http_client()
 
         try:
             with Session(engine) as session:
@@ -626,23 +781,30 @@ class ListenerService:
                 try:
                     me = await c.get_me()
                     if me:
-                        self._our_tg_ids.add(str(me.id))
+                        self._our_tg_ids.add(me.id)
                         logger.info(f"Listener account id={me.id} ({me.first_name}) registered")
                 except Exception:
                     pass
             self.director.our_tg_ids = self._our_tg_ids
             logger.info(f"Director initialized, our_tg_ids={self._our_tg_ids}")
 
+            # 熔断计数每分钟回写一次规则行
+            flusher = asyncio.create_task(self._reply_counts_flusher())
+
             # 保持运行，直到进程退出
             from pyrogram import idle
             await idle()
 
+            flusher.cancel()
+            self._flush_reply_counts()
+
         finally:
             # 清理临时解密文件
             try:
                 shutil.rmtree(temp_workdir)
             except Exception:
                 pass
+            await close_shared_http_client()
             # 关闭所有客户端
             for c in self.clients:
                 try:
@@ -1,6 +1,9 @@
 import asyncio
+import hashlib
+import weakref
+import httpx
 import openai
-from typing import Optional, List, Dict
+from typing import AsyncIterator, Optional, List, Dict
 import logging
 import json
 import os
@@ -11,6 +14,53 @@ from sqlmodel import Session, select
 
 logger = logging.getLogger(__name__)
 
+# 进行中的 get_response 请求：(事件循环, 请求摘要) -> Future
+_inflight: Dict[tuple, asyncio.Future] = {}
+
+# HTTP/2 需要可选依赖 h2，没有时用 HTTP/1.1 keep-alive
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# 长生命周期的事件循环（API 服务、监听进程）共用一个 httpx 连接池。LLMService 按请求创建，
+# 各自新建客户端时每次调用都要重新 DNS + TLS 握手；共用后连接在请求之间保持复用。
+# Celery 任务每次新建并关闭事件循环，共享客户端会随已关闭的循环遗留下来，
+# 这些循环不登记，仍由 SDK 为每个服务创建自己的客户端
+_http_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def enable_shared_http_client() -> None:
+    """为当前事件循环启用共享 httpx 客户端；须与 close_shared_http_client 配对调用"""
+    loop = asyncio.get_running_loop()
+    if loop not in _http_clients:
+        # SDK 的默认客户端带有它的超时 / 重定向设置，这里只调大连接池
+        _http_clients[loop] = openai.DefaultAsyncHttpxClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
+
+
+def _shared_http_client() -> Optional[httpx.AsyncClient]:
+    """当前事件循环的共享 httpx 客户端；未启用或不在事件循环中时返回 None（使用 SDK 自带客户端）"""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+    client = _http_clients.get(loop)
+    if client is None or client.is_closed:
+        return None
+    return client
+
+
+async def close_shared_http_client() -> None:
+    """关闭当前事件循环的共享 httpx 客户端（应用关闭时调用）"""
+    client = _http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
 # Try to import Google GenAI SDK (new version)
 try:
     from google import genai
@@ -45,6 +95,7 @@ class LLMService:
         self.config_id = config_id
         self.client = None
         self.gemini_client = None
+        self._http_client: Optional[httpx.AsyncClient] = None
         
         # 尝试从 AIConfig 表加载配置
         config = self._load_ai_config(config_id)
@@ -124,10 +175,12 @@ class LLMService:
                 "X-Title": "TGSC Marketing System"
             }
 
+        self._http_client = _shared_http_client()
         self.client = openai.AsyncOpenAI(
             api_key=self.api_key,
             base_url=self.base_url,
-            default_headers=default_headers if default_headers else None
+            default_headers=default_headers if default_headers else None,
+            http_client=self._http_client,
         )
         logger.info(f"Async OpenAI-compatible client initialized for {self.provider} with model: {self.model}")
 
@@ -245,11 +298,72 @@ class LLMService:
             logger.error(f"Gemini connection test failed: {e}")
             return False
 
+    async def prewarm(self) -> None:
+        """提前与提供商建立连接并放入共享连接池，首个真实请求省掉 DNS + TLS 握手"""
+        if self._http_client is None or not self.base_url:
+            return
+        try:
+            await self._http_client.head(self.base_url)
+        except httpx.HTTPError as e:
+            logger.debug(f"LLM prewarm for {self.provider} failed: {e}")
+
     async def get_response(
         self,
         prompt: str,
         system_prompt: str = "You are a helpful assistant.",
         history: List[Dict[str, str]] = None
+    ) -> Optional[str]:
+        """
+        同一事件循环里完全相同的并发请求（同一端点 / 模型 / system prompt / 历史 / prompt）
+        合并为一次 LLM 调用，其余调用方等待并共享结果；请求结束即出表，不做缓存。
+        """
+        key = (asyncio.get_running_loop(), self._request_digest(prompt, system_prompt, history))
+        inflight = _inflight.get(key)
+        if inflight is not None:
+            # shield：跟随方被取消时不连带取消共享的请求
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # 只有领头方被取消、自己没被取消时才接手：重新发起（或跟随新的领头方）
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return await self.get_response(prompt, system_prompt, history)
+
+        future = asyncio.get_running_loop().create_future()
+        # 没有跟随方时也标记异常已读取，避免 "exception was never retrieved" 告警
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        _inflight[key] = future
+        try:
+            result = await self._dispatch_response(prompt, system_prompt, history)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            _inflight.pop(key, None)
+
+    def _request_digest(
+        self,
+        prompt: str,
+        system_prompt: str,
+        history: Optional[List[Dict[str, str]]],
+    ) -> str:
+        payload = json.dumps(
+            [self.provider, self.base_url, self.model, system_prompt, history or [], prompt],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _dispatch_response(
+        self,
+        prompt: str,
+        system_prompt: str,
+        history: Optional[List[Dict[str, str]]],
     ) -> Optional[str]:
         if self.provider in ("gemini", "vertex") and self.gemini_client:
             return await self._get_gemini_response(prompt, system_prompt, history)
@@ -320,6 +434,46 @@ class LLMService:
                 logger.error(f"Gemini generation failed: {e}")
                 return None
 
+    async def stream_response(
+        self,
+        prompt: str,
+        system_prompt: str = "You are a helpful assistant."
+    ) -> AsyncIterator[str]:
+        """
+        流式生成：逐段 yield 文本增量，首个 token 到达即可推给前端。
+        未配置或出错时直接结束（调用方按空输出处理）。
+        """
+        if self.provider in ("gemini", "vertex") and self.gemini_client:
+            full_prompt = f"{system_prompt}\n\n{prompt}" if system_prompt else prompt
+            try:
+                stream = await self.gemini_client.aio.models.generate_content_stream(
+                    model=self.model,
+                    contents=[{"role": "user", "parts": [{"text": full_prompt}]}],
+                )
+                async for chunk in stream:
+                    if chunk.text:
+                        yield chunk.text
+            except Exception as e:
+                logger.error(f"Gemini streaming failed: {e}")
+        elif self.client:
+            try:
+                stream = await self.client.chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": prompt},
+                    ],
+                    model=self.model,
+                    temperature=0.7,
+                    stream=True,
+                )
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            except Exception as e:
+                logger.error(f"OpenAI streaming failed: {e}")
+        else:
+            logger.warning("LLM client not configured")
+
     async def generate(self, prompt: str, system_prompt: str = "You are a helpful assistant.") -> Optional[str]:
         """Convenience alias for get_response (used by AIEngine for content generation)"""
         return await self.get_response(prompt, system_prompt)
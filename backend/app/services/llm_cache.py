@@ -0,0 +1,74 @@
+"""
+LLM 响应缓存
+
+两级缓存：进程内 LRU（1024 条）+ Redis（TTL 4h），键为
+sha256(provider/model + 渲染后的 prompt)。命中时省掉整次网络往返与生成，
+同一用户被重复评分、同一群组被重复分析时直接返回上次结果。
+
+只缓存「分析 / 打分」类确定性请求；开场白、回复、改写等生成类请求
+本身追求多样性（防指纹），不走缓存。
+Redis 不可用时只用进程内缓存。
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PREFIX = "llm:cache:"
+LLM_CACHE_TTL = 4 * 3600  # seconds
+_LOCAL_MAX_SIZE = 1024
+
+# key -> (expires_at, response)
+_local: "OrderedDict[str, tuple]" = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def cache_key(model: str, prompt: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def get(key: str) -> Optional[str]:
+    """先查进程内 LRU，再查 Redis；Redis 命中回填本地"""
+    with _local_lock:
+        entry = _local.get(key)
+        if entry is not None:
+            if entry[0] >= time.monotonic():
+                _local.move_to_end(key)
+                return entry[1]
+            del _local[key]
+
+    try:
+        from app.core.security import _get_redis
+        value = _get_redis().get(LLM_CACHE_PREFIX + key)
+    except Exception as e:
+        logger.debug(f"LLM cache read failed: {e}")
+        return None
+    if value is not None:
+        _store_local(key, value)
+    return value
+
+
+def put(key: str, value: str) -> None:
+    _store_local(key, value)
+    try:
+        from app.core.security import _get_redis
+        _get_redis().setex(LLM_CACHE_PREFIX + key, LLM_CACHE_TTL, value)
+    except Exception as e:
+        logger.debug(f"LLM cache write failed: {e}")
+
+
+def _store_local(key: str, value: str) -> None:
+    with _local_lock:
+        _local[key] = (time.monotonic() + LLM_CACHE_TTL, value)
+        _local.move_to_end(key)
+        while len(_local) > _LOCAL_MAX_SIZE:
+            _local.popitem(last=False)
+
+
+def clear_local() -> None:
+    with _local_lock:
+        _local.clear()
@@ -9,6 +9,7 @@ from typing import List, Optional, Tuple, Dict
 from datetime import datetime, date, timedelta
 from dataclasses import dataclass
 
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select, func
 from app.models.account import Account
 from app.models.account_stats import AccountSendStats
@@ -93,12 +94,11 @@ class SafeSendDispatcher:
         if stat_date is None:
             stat_date = date.today()
             
-        stats = self.session.exec(
-            select(AccountSendStats).where(
-                AccountSendStats.account_id == account_id,
-                AccountSendStats.stat_date == stat_date
-            )
-        ).first()
+        query = select(AccountSendStats).where(
+            AccountSendStats.account_id == account_id,
+            AccountSendStats.stat_date == stat_date
+        )
+        stats = self.session.exec(query).first()
         
         if not stats:
             stats = AccountSendStats(
@@ -106,7 +106,12 @@ class SafeSendDispatcher:
                 stat_date=stat_date
             )
             self.session.add(stats)
-            self.session.commit()
+            try:
+                self.session.commit()
+            except IntegrityError:
+                # 并发创建撞上 (account_id, stat_date) 唯一索引，取已写入的那条
+                self.session.rollback()
+                return self.session.exec(query).one()
             self.session.refresh(stats)
             
         return stats
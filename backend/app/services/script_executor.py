@@ -3,7 +3,7 @@ import random
 import json
 import logging
 from datetime import datetime
-from sqlmodel import Session
+from sqlmodel import Session, update
 from app.models.script import ScriptTask, Script
 from app.models.account import Account
 from app.services.telegram_client import send_message_with_client
@@ -28,9 +28,16 @@ class ScriptExecutorService:
             logger.error("Script not ready or not found")
             return
 
-        task.status = "running"
-        self.session.add(task)
+        # 条件 UPDATE 认领任务：Celery 重投递时只有一个 worker 能从 pending 转为 running
+        claimed = self.session.exec(
+            update(ScriptTask)
+            .where(ScriptTask.id == task_id, ScriptTask.status == "pending")
+            .values(status="running")
+        ).rowcount
         self.session.commit()
+        if not claimed:
+            logger.warning(f"ScriptTask {task_id} already claimed (status={task.status}), skipping")
+            return
 
         lines = json.loads(script.lines_json)
         account_map = json.loads(task.account_mapping_json) # role_name -> account_id
@@ -0,0 +1,208 @@
+"""
+语义监控向量索引
+
+semantic 类型 KeywordMonitor 的 scenario_description 向量化后（L2 归一化，
+内积即 cosine）集中存放：一条消息只需 embed 一次，再与全部规则做一次批量
+内积即可得到命中的规则，代价与规则数量基本无关。
+
+向量以 int8 存储（归一化后各分量在 [-1, 1]，乘 127 取整），内存与内积带宽
+约为 float32 的 1/4；cosine 误差约 0.01，远小于阈值本身的调节粒度。
+量化结果持久化在 KeywordMonitor.scenario_embedding_q8（连同 embedding_model），
+重启后无需重新 embed；模型变化时已存向量作废、重新 embed。
+
+消息对场景描述是非对称（query-document）比较，cosine 整体偏低，
+阈值以模型校准值为基准（见 embedding_service.SIMILARITY_THRESHOLDS），
+规则上的 similarity_threshold 按其相对默认值的比例收紧或放宽。
+
+后端按可用性选择：
+- numpy:  (n, dim) int8 矩阵 @ query，与阈值数组比较
+- 纯 Python: 逐行点积（规则很少时也够用）
+
+描述文本未变化的规则复用已有向量，只对新增 / 修改的规则调用 embedding。
+
+热路径只用三组连续数组（SoA）：ids int64[N]、thresholds float32[N]（cosine）、
+int8 向量矩阵 [N, dim]；判定即 `scores = M @ q; ids[scores >= thresholds]`，
+不需要逐行访问 KeywordMonitor 对象。
+"""
+import logging
+import math
+from array import array
+from typing import Collection, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.models.keyword_monitor import DEFAULT_SIMILARITY_THRESHOLD, KeywordMonitor
+from app.services.embedding_service import DEFAULT_MODEL, EMBEDDING_DIM, similarity_threshold_for
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None  # type: ignore
+    NUMPY_AVAILABLE = False
+    logger.info("numpy not installed, semantic monitor index uses pure Python dot products")
+
+# int8 量化刻度：归一化向量分量 x -> round(x * 127)
+Q8_SCALE = 127
+
+
+def normalize(vector: Sequence[float]) -> List[float]:
+    """L2 归一化；零向量原样返回"""
+    norm = math.sqrt(sum(x * x for x in vector))
+    if not norm:
+        return list(vector)
+    return [x / norm for x in vector]
+
+
+def quantize(vector: Sequence[float]) -> bytes:
+    """归一化后量化为 int8，返回可直接入库的 bytes"""
+    return array(
+        "b", (max(-Q8_SCALE, min(Q8_SCALE, round(x * Q8_SCALE))) for x in normalize(vector))
+    ).tobytes()
+
+
+def dequantize(blob: bytes) -> List[float]:
+    return [x / Q8_SCALE for x in array("b", blob)]
+
+
+class SemanticMonitorIndex:
+    """semantic monitors 的 scenario_description 向量索引（int8 存储）"""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, model: str = DEFAULT_MODEL):
+        self.dim = dim
+        self.model = model
+        # 该模型在默认 similarity_threshold 下的 cosine 阈值
+        self.base_threshold = similarity_threshold_for(model)
+        # monitor_id -> (已嵌入的 scenario_description, int8 量化向量)
+        self._entries: Dict[int, Tuple[str, bytes]] = {}
+        # monitor_id -> 相似度阈值（0~1），随每次 sync 从规则上刷新
+        self._thresholds: Dict[int, float] = {}
+        self._ids: List[int] = []
+        self._rows: Dict[int, int] = {}
+        self._id_array = None
+        self._threshold_array = None
+        self._matrix = None
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, monitor_id: int) -> bool:
+        return monitor_id in self._entries
+
+    @staticmethod
+    def _semantic_monitors(monitors: Iterable[KeywordMonitor]) -> Dict[int, KeywordMonitor]:
+        return {
+            m.id: m
+            for m in monitors
+            if m.match_type == "semantic" and m.scenario_description
+        }
+
+    def _stored(self, monitor: KeywordMonitor) -> Optional[bytes]:
+        """monitor 上持久化的量化向量（维度或模型不符视为无效）"""
+        blob = monitor.scenario_embedding_q8
+        if blob and len(blob) == self.dim and monitor.embedding_model == self.model:
+            return bytes(blob)
+        return None
+
+    def pending(self, monitors: Iterable[KeywordMonitor]) -> Dict[int, str]:
+        """返回需要（重新）embed 的规则：monitor_id -> scenario_description"""
+        out = {}
+        for monitor_id, monitor in self._semantic_monitors(monitors).items():
+            entry = self._entries.get(monitor_id)
+            if entry and entry[0] == monitor.scenario_description:
+                continue
+            if self._stored(monitor) is not None:
+                continue
+            out[monitor_id] = monitor.scenario_description
+        return out
+
+    def sync(
+        self,
+        monitors: Iterable[KeywordMonitor],
+        vectors: Optional[Dict[int, Sequence[float]]] = None,
+    ) -> Dict[int, bytes]:
+        """
+        与当前 active monitors 对齐：删除已下线 / 已改描述的条目，
+        写入 vectors 中新算好的向量（或 monitor 上已持久化的量化向量），
+        然后重建检索结构。返回本次新量化、需要持久化的 monitor_id -> bytes。
+        """
+        vectors = vectors or {}
+        entries: Dict[int, Tuple[str, bytes]] = {}
+        fresh: Dict[int, bytes] = {}
+        monitors_by_id = self._semantic_monitors(monitors)
+        for monitor_id, monitor in monitors_by_id.items():
+            text = monitor.scenario_description
+            vector = vectors.get(monitor_id)
+            entry = self._entries.get(monitor_id)
+            if vector is not None and len(vector) == self.dim:
+                fresh[monitor_id] = quantize(vector)
+                entries[monitor_id] = (text, fresh[monitor_id])
+            elif entry and entry[0] == text:
+                entries[monitor_id] = entry
+            elif self._stored(monitor) is not None:
+                entries[monitor_id] = (text, self._stored(monitor))
+        self._entries = entries
+        self._thresholds = {
+            monitor_id: self.threshold_for(monitors_by_id[monitor_id]) for monitor_id in entries
+        }
+        self._rebuild()
+        return fresh
+
+    def threshold_for(self, monitor: KeywordMonitor) -> float:
+        """规则的 cosine 阈值：模型校准值按 similarity_threshold / 默认值 等比缩放"""
+        percent = monitor.similarity_threshold or DEFAULT_SIMILARITY_THRESHOLD
+        return min(1.0, self.base_threshold * percent / DEFAULT_SIMILARITY_THRESHOLD)
+
+    def _rebuild(self) -> None:
+        self._ids = list(self._entries)
+        self._rows = {monitor_id: row for row, monitor_id in enumerate(self._ids)}
+        self._id_array = None
+        self._threshold_array = None
+        self._matrix = None
+        if not self._ids or not NUMPY_AVAILABLE:
+            return
+
+        self._id_array = np.asarray(self._ids, dtype=np.int64)
+        self._threshold_array = np.asarray(
+            [self._thresholds[i] for i in self._ids], dtype=np.float32
+        )
+
+        self._matrix = np.frombuffer(
+            b"".join(self._entries[i][1] for i in self._ids), dtype=np.int8
+        ).reshape(len(self._ids), self.dim)
+
+    def _dot(self, monitor_id: int, q: List[float]) -> float:
+        return sum(a * b for a, b in zip(array("b", self._entries[monitor_id][1]), q)) / Q8_SCALE
+
+    def match(
+        self, query: Sequence[float], candidates: Optional[Collection[int]] = None
+    ) -> Dict[int, float]:
+        """
+        返回得分达到各自阈值的规则：monitor_id -> cosine。
+        给定 candidates 时只比对这些规则。
+        """
+        if not self._ids or len(query) != self.dim:
+            return {}
+        q = normalize(query)
+
+        if self._matrix is not None:
+            if candidates is None:
+                matrix, ids, thresholds = self._matrix, self._id_array, self._threshold_array
+            else:
+                rows = [self._rows[i] for i in candidates if i in self._rows]
+                if not rows:
+                    return {}
+                matrix = self._matrix[rows]
+                ids = self._id_array[rows]
+                thresholds = self._threshold_array[rows]
+            scores = (matrix @ np.asarray(q, dtype=np.float32)) / Q8_SCALE
+            mask = scores >= thresholds
+            return dict(zip(ids[mask].tolist(), scores[mask].tolist()))
+
+        ids = self._ids if candidates is None else [i for i in candidates if i in self._rows]
+        hits = {}
+        for monitor_id in ids:
+            score = self._dot(monitor_id, q)
+            if score >= self._thresholds[monitor_id]:
+                hits[monitor_id] = score
+        return hits
@@ -4,7 +4,7 @@ import logging
 import json
 from typing import List, Optional
 from datetime import datetime, timedelta
-from sqlmodel import Session, select
+from sqlmodel import Session, select, update
 from app.models.account import Account
 from app.models.warmup_task import WarmupTask
 from app.services.telegram_client import _create_client_and_run
@@ -28,9 +28,16 @@ class WarmupService:
         if not task:
             raise ValueError(f"WarmupTask {task_id} not found")
             
-        task.status = "running"
-        self.session.add(task)
+        # 条件 UPDATE 认领任务：Celery 重投递时只有一个 worker 能从 pending 转为 running
+        claimed = self.session.exec(
+            update(WarmupTask)
+            .where(WarmupTask.id == task_id, WarmupTask.status == "pending")
+            .values(status="running")
+        ).rowcount
         self.session.commit()
+        if not claimed:
+            logger.warning(f"WarmupTask {task_id} already claimed (status={task.status}), skipping")
+            return
         
         account_ids = json.loads(task.account_ids_json)
         
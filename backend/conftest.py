@@ -5,7 +5,9 @@ Provides:
 - In-memory SQLite database session
 - FastAPI TestClient with DB override
 - Helper fixtures for creating test accounts and proxies
+- run_async() for driving async services from sync tests
 """
+import asyncio
 import os
 import sys
 
@@ -27,9 +29,25 @@ from sqlmodel.pool import StaticPool
 from fastapi.testclient import TestClient
 
 
+def run_async(coro):
+    """Run a coroutine to completion on a fresh event loop.
+
+    Not asyncio.run(): that clears the main thread's default event loop and
+    leaks into later tests.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
 @pytest.fixture
 def engine():
     """Create an in-memory SQLite engine with all tables."""
+    from app.models import import_all_models
+
+    import_all_models()
     _engine = create_engine(
         "sqlite://",
         connect_args={"check_same_thread": False},
@@ -0,0 +1,202 @@
+"""
+Tests for app.services.ai_engine — AIEngine batch helpers.
+"""
+import asyncio
+import json
+import string
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from conftest import run_async
+from app.services import llm_cache
+from app.services.ai_engine import AIEngine, UserAnalysis
+
+
+def _analysis(score):
+    return UserAnalysis(
+        score=score, tags=[], is_bot=False, is_advertiser=False,
+        interest_keywords=[], summary="",
+    )
+
+
+class TestBatchScoreUsers:
+
+    def test_concurrent_bounded_and_ordered(self):
+        in_flight = 0
+        peak = 0
+
+        async def fake_analyze(username, bio=None, messages=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            if username == "bad":
+                raise RuntimeError("llm down")
+            return _analysis(int(username))
+
+        users = [{"username": str(i)} for i in range(6)] + [{"username": "bad"}]
+        engine = AIEngine()
+        with patch.object(engine, "analyze_user", side_effect=fake_analyze):
+            results = run_async(engine.batch_score_users(users, max_concurrency=3, chunk_size=1))
+
+        assert peak == 3
+        assert [r["ai_score"] for r in results] == [0, 1, 2, 3, 4, 5, 50]
+        assert results[-1]["ai_summary"] == "评分失败"
+
+    def test_fallback_stays_within_chunk_permit(self):
+        in_flight = 0
+        peak = 0
+
+        async def tracked(result):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return result
+
+        async def fake_batch(chunk):
+            # 第一个分块批量解析失败，走逐个回退；其余分块正常
+            if chunk[0]["username"] == "0":
+                return await tracked(None)
+            return await tracked([_analysis(int(u["username"])) for u in chunk])
+
+        async def fake_analyze(username, bio=None, messages=None):
+            return await tracked(_analysis(int(username)))
+
+        users = [{"username": str(i)} for i in range(12)]
+        engine = AIEngine()
+        with patch.object(engine, "_analyze_users_batch", side_effect=fake_batch), \
+                patch.object(engine, "analyze_user", side_effect=fake_analyze):
+            results = run_async(engine.batch_score_users(users, max_concurrency=2, chunk_size=3))
+
+        assert peak == 2
+        assert [r["ai_score"] for r in results] == list(range(12))
+
+    def test_chunks_share_one_llm_call(self):
+        users = [{"username": f"u{i}"} for i in range(5)]
+        engine = _engine([
+            json.dumps([{"score": 10 + i} for i in range(3)]),
+            json.dumps([{"score": 20 + i} for i in range(2)]),
+        ])
+        results = run_async(engine.batch_score_users(users, max_concurrency=1, chunk_size=3))
+
+        assert engine._llm.generate.await_count == 2
+        assert [r["ai_score"] for r in results] == [10, 11, 12, 20, 21]
+        assert [r["username"] for r in results] == [u["username"] for u in users]
+
+    def test_length_mismatch_falls_back_per_user(self, local_llm_cache):
+        users = [{"username": "a"}, {"username": "b"}]
+        engine = _engine([
+            json.dumps([{"score": 99}]),
+            '{"score": 61}',
+            '{"score": 62}',
+        ])
+        results = run_async(engine.batch_score_users(users, max_concurrency=1))
+
+        assert engine._llm.generate.await_count == 3
+        assert [r["ai_score"] for r in results] == [61, 62]
+
+
+@pytest.fixture
+def local_llm_cache():
+    llm_cache.clear_local()
+    with patch("app.core.security._get_redis", side_effect=ConnectionError("no redis")):
+        yield
+    llm_cache.clear_local()
+
+
+def _engine(responses):
+    engine = AIEngine()
+    engine._llm = MagicMock(provider="openai", model="gpt-test")
+    engine._llm.generate = AsyncMock(side_effect=responses)
+    return engine
+
+
+class TestAnalysisCache:
+
+    def test_repeat_prompt_served_from_cache(self, local_llm_cache):
+        engine = _engine(['{"score": 88, "tags": ["whale"]}'])
+        first = run_async(engine.analyze_user("alice", bio="trader"))
+        second = run_async(engine.analyze_user("alice", bio="trader"))
+
+        assert first.score == second.score == 88
+        assert engine._llm.generate.await_count == 1
+
+    def test_unparseable_response_not_cached(self, local_llm_cache):
+        engine = _engine(["not json", '{"score": 70}'])
+        assert run_async(engine.analyze_user("bob")).summary == "分析失败"
+        assert run_async(engine.analyze_user("bob")).score == 70
+        assert engine._llm.generate.await_count == 2
+
+    def test_key_includes_model(self):
+        assert llm_cache.cache_key("openai/a", "p") != llm_cache.cache_key("openai/b", "p")
+
+
+class TestStreaming:
+
+    def test_reply_stream_yields_tokens(self):
+        async def fake_stream(prompt, system_prompt=None):
+            for token in ["你", "好", "！"]:
+                yield token
+
+        engine = AIEngine()
+        engine._llm = MagicMock()
+        engine._llm.stream_response = fake_stream
+
+        async def collect():
+            return [t async for t in engine.generate_reply_stream([{"role": "user", "content": "hi"}])]
+
+        assert run_async(collect()) == ["你", "好", "！"]
+
+    def test_empty_stream_falls_back(self):
+        async def empty_stream(prompt, system_prompt=None):
+            return
+            yield
+
+        engine = AIEngine()
+        engine._llm = MagicMock()
+        engine._llm.stream_response = empty_stream
+
+        async def collect():
+            return [t async for t in engine.generate_opener_stream("trader")]
+
+        assert run_async(collect()) == [AIEngine.OPENER_FALLBACK]
+
+
+class TestPromptRendering:
+
+    def test_render_matches_str_format(self):
+        for name, template in AIEngine.PROMPTS.items():
+            fields = {f for _, f, _, _ in string.Formatter().parse(template) if f is not None}
+            values = {f: f"<{f}>{{}}" for f in fields}
+            assert AIEngine._render(name, **values) == template.format(**values), name
+
+
+class TestDetectRisk:
+
+    def _engine(self, response='{"risk_level": "medium"}'):
+        engine = AIEngine()
+        engine._llm = MagicMock()
+        engine._llm.chat = AsyncMock(return_value=response)
+        return engine
+
+    def test_clear_cut_logs_skip_llm(self):
+        engine = self._engine()
+        bans = [{"type": "UserDeactivatedBan"}] * 2 + [{"type": "PhoneNumberBanned"}]
+        assert run_async(engine.detect_risk(bans))["risk_level"] == "critical"
+        floods = [{"type": "FloodWait"}] * 5 + [{"type": None}]
+        assert run_async(engine.detect_risk(floods))["risk_level"] == "high"
+        assert run_async(engine.detect_risk([{"type": "Timeout"}] * 4))["risk_level"] == "low"
+        engine._llm.chat.assert_not_awaited()
+
+    def test_ambiguous_logs_use_llm(self):
+        engine = self._engine('{"risk_level": "high"}')
+        logs = [{"type": "FloodWait"}] * 4 + [{"type": "Timeout"}] * 3
+        assert run_async(engine.detect_risk(logs))["risk_level"] == "high"
+        engine._llm.chat.assert_awaited_once()
+
+        engine._llm.chat = AsyncMock(side_effect=RuntimeError("down"))
+        assert run_async(engine.detect_risk(logs))["risk_level"] == "medium"
@@ -0,0 +1,94 @@
+"""
+Tests for app.services.ai_reply_service — lead tagging & reply generation.
+"""
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlmodel import select
+
+from conftest import run_async
+from app.models.account import Account
+from app.models.chat_history import ChatHistory
+from app.models.lead import Lead
+from app.services.ai_reply_service import AIReplyService
+
+
+def _account(session):
+    account = Account(phone_number="+10000000001")
+    session.add(account)
+    session.commit()
+    return account
+
+
+class TestUpdateLeadTags:
+
+    def test_creates_then_merges_in_database(self, session):
+        account = _account(session)
+        service = AIReplyService(session)
+
+        service._update_lead_tags(account.id, 42, "alice", "Alice", {"tags": ["price"], "intent": "inquiry"})
+        session.commit()
+        lead = session.exec(select(Lead).where(Lead.telegram_user_id == 42)).one()
+        assert json.loads(lead.tags_json) == ["price"]
+
+        service._update_lead_tags(account.id, 42, "alice", "Alice", {"tags": ["price", "usdt"], "intent": "purchase"})
+        session.commit()
+        session.refresh(lead)
+        assert sorted(json.loads(lead.tags_json)) == ["intent:purchase", "price", "usdt"]
+        assert len(session.exec(select(Lead)).all()) == 1
+
+    def test_no_intent_keeps_tags_only(self, session):
+        account = _account(session)
+        service = AIReplyService(session)
+        session.add(Lead(account_id=account.id, telegram_user_id=7, tags_json='["vip"]'))
+        session.commit()
+
+        service._update_lead_tags(account.id, 7, None, None, {"tags": ["vip"]})
+        session.commit()
+        lead = session.exec(select(Lead).where(Lead.telegram_user_id == 7)).one()
+        assert json.loads(lead.tags_json) == ["vip"]
+
+
+    def test_new_lead_tags_deduplicated_and_sorted(self, session):
+        account = _account(session)
+        AIReplyService(session)._update_lead_tags(account.id, 9, None, None, {"tags": ["usdt", "price", "usdt"]})
+        session.commit()
+        lead = session.exec(select(Lead).where(Lead.telegram_user_id == 9)).one()
+        assert json.loads(lead.tags_json) == ["price", "usdt"]
+
+class TestGenerateReply:
+
+    def test_reply_with_intent_tags(self, session):
+        account = _account(session)
+        session.add(ChatHistory(account_id=account.id, target_user_id=42, role="user", content="hello"))
+        session.commit()
+        service = AIReplyService(session)
+        service.llm = MagicMock()
+        service.llm.analyze_intent = AsyncMock(return_value={"tags": ["price"], "intent": "inquiry"})
+        service.llm.get_response = AsyncMock(return_value="ok")
+
+        with patch("app.services.kb_retrieval.retrieve_relevant_kb", AsyncMock(return_value=[])):
+            reply = run_async(service._generate_reply(account, "how much?", 42, "Alice", "alice"))
+        session.commit()
+
+        assert reply == "ok"
+        kwargs = service.llm.get_response.await_args.kwargs
+        assert kwargs["history"] == [{"role": "user", "content": "hello"}]
+        lead = session.exec(select(Lead).where(Lead.telegram_user_id == 42)).one()
+        assert json.loads(lead.tags_json) == ["price"]
+
+    def test_intent_task_awaited_when_prompt_build_fails(self, session):
+        account = _account(session)
+        service = AIReplyService(session)
+        service.llm = MagicMock()
+        service.llm.analyze_intent = AsyncMock(return_value={})
+        service.llm.get_response = AsyncMock(return_value="ok")
+
+        with patch.object(service, "_build_system_prompt", side_effect=RuntimeError("boom")), \
+                patch.object(service, "_finish_intent", AsyncMock()) as finish:
+            with pytest.raises(RuntimeError):
+                run_async(service._generate_reply(account, "hi", 42, "Alice", "alice"))
+
+        finish.assert_awaited_once()
+        service.llm.get_response.assert_not_awaited()
@@ -49,6 +49,18 @@ class TestGetAccounts:
         data = resp.json()
         assert all(a["status"] == "active" for a in data)
 
+    def test_list_includes_proxy(self, client, session, sample_account, sample_proxy):
+        sample_account.proxy_id = sample_proxy.id
+        session.add(sample_account)
+        session.commit()
+        expected = (sample_proxy.ip, sample_proxy.port)
+        session.expunge_all()
+
+        resp = client.get("/api/v1/accounts/")
+        assert resp.status_code == 200
+        proxy = resp.json()[0]["proxy"]
+        assert (proxy["ip"], proxy["port"]) == expected
+
 
 # ---------------------------------------------------------------------------
 # Get single account
@@ -94,6 +106,20 @@ class TestCreateAccount:
         # SQLite will raise IntegrityError -> 500
         assert resp.status_code == 500
 
+    def test_create_pins_device_fingerprint(self, client):
+        resp = client.post("/api/v1/accounts/", json={"phone_number": "+3000000003"})
+        data = resp.json()
+        assert data["device_model"] and data["system_version"] and data["app_version"]
+
+        # 导入时带来的指纹保持不变
+        resp = client.post("/api/v1/accounts/", json={
+            "phone_number": "+3000000004",
+            "device_model": "Desktop",
+            "system_version": "Windows 10",
+            "app_version": "4.16.8 x64",
+        })
+        assert resp.json()["device_model"] == "Desktop"
+
 
 # ---------------------------------------------------------------------------
 # Delete account
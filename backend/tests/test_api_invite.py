@@ -0,0 +1,25 @@
+"""
+Tests for the /api/v1/invites endpoints.
+"""
+from app.models.target_user import TargetUser
+
+
+class TestPreviewTargets:
+
+    def test_pages_with_after_id(self, client, session):
+        for telegram_id in range(1, 4):
+            session.add(TargetUser(telegram_id=telegram_id, ai_score=50))
+        session.commit()
+
+        first = client.post("/api/v1/invites/preview-targets", params={"max_targets": 2}).json()
+        assert first["count"] == 2 and first["next_after_id"] is not None
+
+        rest = client.post("/api/v1/invites/preview-targets",
+                           params={"max_targets": 2, "after_id": first["next_after_id"]}).json()
+        assert rest["next_after_id"] is None
+        ids = [t["id"] for t in first["targets"] + rest["targets"]]
+        assert sorted(ids) == [1, 2, 3]
+
+    def test_unknown_after_id_rejected(self, client):
+        resp = client.post("/api/v1/invites/preview-targets", params={"after_id": 999})
+        assert resp.status_code == 400
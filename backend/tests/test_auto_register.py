@@ -0,0 +1,113 @@
+"""
+Tests for app.services.auto_register — ClientPool & proxy selection.
+"""
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from conftest import run_async
+from app.models.proxy import Proxy
+from app.services.auto_register import AutoRegisterService, ClientPool
+
+
+def _fake_client(*args, **kwargs):
+    client = MagicMock(is_connected=False)
+
+    async def connect():
+        client.is_connected = True
+
+    async def disconnect():
+        client.is_connected = False
+
+    client.connect = AsyncMock(side_effect=connect)
+    client.disconnect = AsyncMock(side_effect=disconnect)
+    return client
+
+
+@pytest.fixture
+def fake_clients():
+    with patch("app.services.auto_register.Client", side_effect=_fake_client) as factory:
+        yield factory
+
+
+class TestClientPool:
+
+    def test_reusable_lease_keeps_connection(self, fake_clients):
+        pool = ClientPool()
+        proxy = Proxy(id=1, ip="1.1.1.1", port=1080)
+
+        async def scenario():
+            async with pool.lease(proxy, 6, "hash") as first:
+                first.reusable = True
+            async with pool.lease(proxy, 6, "hash") as second:
+                assert not second.reusable
+            return first, second
+
+        first, second = run_async(scenario())
+        assert second is first
+        assert fake_clients.call_count == 1
+        # 第二次租用未标记可复用，归还时断开
+        first.client.disconnect.assert_awaited_once()
+
+    def test_authorized_or_failed_lease_disconnects(self, fake_clients):
+        pool = ClientPool()
+        proxy = Proxy(id=1, ip="1.1.1.1", port=1080)
+
+        async def scenario():
+            async with pool.lease(proxy, 6, "hash") as first:
+                pass
+            with pytest.raises(RuntimeError):
+                async with pool.lease(proxy, 6, "hash") as second:
+                    second.reusable = True
+                    raise RuntimeError("boom")
+            return first, second
+
+        first, second = run_async(scenario())
+        assert second is not first
+        assert fake_clients.call_count == 2
+        first.client.disconnect.assert_awaited_once()
+
+    def test_keyed_by_proxy_and_bounded(self, fake_clients):
+        pool = ClientPool(max_idle_per_key=1)
+        proxy_a = Proxy(id=1, ip="1.1.1.1", port=1080)
+        proxy_b = Proxy(id=2, ip="2.2.2.2", port=1080)
+
+        async def scenario():
+            entries = [await pool.acquire(proxy_a, 6, "hash") for _ in range(2)]
+            for entry in entries:
+                entry.reusable = True
+                await pool.release(proxy_a.id, 6, entry)
+            other = await pool.acquire(proxy_b, 6, "hash")
+            again = await pool.acquire(proxy_a, 6, "hash")
+            return entries, other, again
+
+        entries, other, again = run_async(scenario())
+        assert other not in entries
+        assert again is entries[0]
+        entries[1].client.disconnect.assert_awaited_once()
+        assert fake_clients.call_count == 3
+
+
+class TestGetAvailableProxy:
+
+    def test_least_failed_active_proxy_in_category(self, session):
+        session.add_all([
+            Proxy(ip="10.0.0.1", port=1, category="rotating", fail_count=3),
+            Proxy(ip="10.0.0.2", port=1, category="rotating", fail_count=1),
+            Proxy(ip="10.0.0.3", port=1, category="rotating", fail_count=0, status="dead"),
+            Proxy(ip="10.0.0.4", port=1, category="static", fail_count=0),
+        ])
+        session.commit()
+        service = AutoRegisterService(session)
+
+        assert service._get_available_proxy("rotating").ip in {"10.0.0.1", "10.0.0.2"}
+        assert service._get_available_proxy("static").ip == "10.0.0.4"
+        assert service._get_available_proxy("isp") is None
+
+    def test_random_among_five_least_failed(self, session):
+        session.add_all([Proxy(ip=f"10.0.1.{n}", port=1, fail_count=n) for n in range(8)])
+        session.commit()
+        service = AutoRegisterService(session)
+
+        picked = {service._get_available_proxy().fail_count for _ in range(40)}
+        assert picked <= {0, 1, 2, 3, 4} and len(picked) > 1
@@ -0,0 +1,189 @@
+"""
+Tests for app.services.client_pool — TelegramClientPool.
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from conftest import run_async
+from app.services.client_pool import TelegramClientPool
+
+
+def _factory(created):
+    async def factory():
+        client = MagicMock(is_connected=True)
+        client.stop = AsyncMock()
+        created.append(client)
+        return client
+    return factory
+
+
+class TestTelegramClientPool:
+
+    def test_evicts_least_recently_used(self):
+        pool = TelegramClientPool(max_size=2)
+        created = []
+
+        async def scenario():
+            await pool.get_client(1, _factory(created))
+            await pool.get_client(2, _factory(created))
+            # 命中 1 后，2 成为最久未用
+            await pool.get_client(1, _factory(created))
+            await pool.get_client(3, _factory(created))
+            # lru-dict 在后台任务里 stop 被淘汰的客户端
+            await asyncio.sleep(0)
+
+        run_async(scenario())
+        assert set(pool._pool.keys()) == {1, 3}
+        assert len(created) == 3
+        created[1].stop.assert_awaited_once()
+
+    def test_hit_does_not_wait_for_lock(self):
+        pool = TelegramClientPool()
+        created = []
+
+        async def scenario():
+            first = await pool.get_client(1, _factory(created))
+            async with pool._lock:
+                hit = await asyncio.wait_for(pool.get_client(1, _factory(created)), timeout=1)
+            return first, hit
+
+        first, hit = run_async(scenario())
+        assert hit is first
+        assert len(created) == 1
+
+    def test_cleanup_expired_stops_at_fresh_entry(self):
+        pool = TelegramClientPool(ttl=100)
+        created = []
+
+        async def scenario():
+            with patch("app.services.client_pool.time.monotonic", return_value=1000):
+                await pool.get_client(1, _factory(created))
+                await pool.get_client(2, _factory(created))
+            with patch("app.services.client_pool.time.monotonic", return_value=1050):
+                pool.release_client(1)
+            with patch("app.services.client_pool.time.monotonic", return_value=1120):
+                await pool.cleanup_expired()
+
+        run_async(scenario())
+        assert set(pool._pool.keys()) == {1}
+        created[1].stop.assert_awaited_once()
+        created[0].stop.assert_not_awaited()
+
+    def test_concurrent_misses_share_one_factory_call(self):
+        pool = TelegramClientPool()
+        created = []
+        factory = _factory(created)
+
+        async def slow_factory():
+            await asyncio.sleep(0.01)
+            return await factory()
+
+        async def scenario():
+            return await asyncio.gather(
+                pool.get_client(1, slow_factory),
+                pool.get_client(1, slow_factory),
+                pool.get_client(2, slow_factory),
+            )
+
+        a, b, c = run_async(scenario())
+        assert a is b and c is not a
+        assert len(created) == 2
+
+    def test_lock_kept_for_waiter_across_remove(self):
+        pool = TelegramClientPool()
+        created = []
+        factory = _factory(created)
+
+        async def slow_factory():
+            await asyncio.sleep(0.01)
+            return await factory()
+
+        async def scenario():
+            lock = pool._lock_for(1)
+            await lock.acquire()
+            waiter = asyncio.ensure_future(pool.get_client(1, slow_factory))
+            await asyncio.sleep(0)
+            # 锁已释放、等待者尚未恢复运行时移除客户端，锁不能被丢掉
+            lock.release()
+            await pool.remove_client(1)
+            late = asyncio.ensure_future(pool.get_client(1, slow_factory))
+            return await asyncio.gather(waiter, late)
+
+        waiter, late = run_async(scenario())
+        assert waiter is late
+        assert len(created) == 1
+
+    def test_remove_client_prewarms_replacement(self):
+        pool = TelegramClientPool()
+        created = []
+        factory = _factory(created)
+
+        async def scenario():
+            first = await pool.get_client(1, factory)
+            await pool.remove_client(1, prewarm_factory=factory)
+            # 重连已在后台发起，下一次 get_client 直接拿到它
+            assert 1 in pool._warming
+            never = AsyncMock(side_effect=AssertionError("factory should not run"))
+            second = await pool.get_client(1, never)
+            return first, second
+
+        first, second = run_async(scenario())
+        assert len(created) == 2
+        assert second is created[1] and second is not first
+        first.stop.assert_awaited_once()
+        assert pool._warming == {}
+
+    def test_failed_prewarm_falls_back_to_factory(self):
+        pool = TelegramClientPool()
+        created = []
+
+        async def scenario():
+            await pool.get_client(1, _factory(created))
+            await pool.remove_client(1, prewarm_factory=AsyncMock(side_effect=ConnectionError))
+            return await pool.get_client(1, _factory(created))
+
+        client = run_async(scenario())
+        assert client is created[1]
+
+    def test_unclaimed_prewarm_stopped_after_ttl(self):
+        pool = TelegramClientPool(ttl=100)
+        created = []
+        factory = _factory(created)
+
+        async def scenario():
+            with patch("app.services.client_pool.time.monotonic", return_value=1000):
+                await pool.get_client(1, factory)
+                await pool.remove_client(1, prewarm_factory=factory)
+                await pool.remove_client(2, prewarm_factory=AsyncMock(side_effect=ConnectionError))
+                await asyncio.sleep(0)
+            with patch("app.services.client_pool.time.monotonic", return_value=1050):
+                await pool.cleanup_expired()
+                assert set(pool._warming) == {1, 2}
+            with patch("app.services.client_pool.time.monotonic", return_value=1120):
+                await pool.cleanup_expired()
+
+        run_async(scenario())
+        assert pool._warming == {}
+        # 没人领取的预热连接过期后被断开
+        created[1].stop.assert_awaited_once()
+
+    def test_close_all_stops_clients_concurrently(self):
+        pool = TelegramClientPool()
+        running = []
+        peak = []
+
+        async def slow_stop():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+        async def scenario():
+            for account_id in range(3):
+                client = await pool.get_client(account_id, _factory([]))
+                client.stop = AsyncMock(side_effect=slow_stop)
+            await pool.close_all()
+
+        run_async(scenario())
+        assert max(peak) == 3
+        assert len(pool._pool) == 0
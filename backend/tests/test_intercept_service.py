@@ -0,0 +1,248 @@
+"""
+Tests for app.services.intercept_service — batched new-member capture.
+"""
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlmodel import select
+
+from conftest import run_async
+from app.models.account import Account
+from app.models.source_group import SourceGroup
+from app.models.target_user import TargetUser
+from app.services import intercept_service
+from app.services.ai_engine import UserAnalysis
+from app.services.intercept_service import (
+    DMTokenBucket, InterceptService, start_capture_flusher, stop_capture_flusher,
+)
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    intercept_service.invalidate_source_group_cache()
+    intercept_service.invalidate_sniper_cache()
+    yield
+    intercept_service.invalidate_source_group_cache()
+    intercept_service.invalidate_sniper_cache()
+
+
+def _analysis(score):
+    return UserAnalysis(score=score, tags=["defi", "投资"], is_bot=False, is_advertiser=False,
+                        interest_keywords=[], summary="s")
+
+
+def _group(session):
+    group = SourceGroup(link="t.me/rival", type="competitor")
+    session.add(group)
+    session.commit()
+    return group
+
+
+def _service(session, score, dm_limit=10):
+    service = InterceptService(session)
+    service._dm_bucket = DMTokenBucket(dm_limit)
+    service.ai_engine.analyze_user = AsyncMock(return_value=_analysis(score))
+    return service
+
+
+class TestProcessNewMember:
+
+    def test_captures_without_flusher(self, session):
+        group = _group(session)
+        service = _service(session, 80)
+
+        result = run_async(service.process_new_member(group.id, 1001, username="alice"))
+        assert result["status"] == "captured" and result["dm_scheduled"] is True
+
+        user = session.exec(select(TargetUser).where(TargetUser.telegram_id == 1001)).one()
+        assert user.funnel_stage == "qualified"
+        assert user.ai_tags == '["defi","投资"]'
+        session.refresh(group)
+        assert (group.total_scraped, group.high_value_count) == (1, 1)
+
+        again = run_async(service.process_new_member(group.id, 1001, username="alice"))
+        assert again["status"] == "skipped"
+        session.refresh(group)
+        assert group.total_scraped == 1
+
+    def test_existing_user_cancels_ai_call(self, session):
+        group = _group(session)
+        session.add(TargetUser(telegram_id=5))
+        session.commit()
+        service = InterceptService(session)
+        cancelled = []
+
+        async def slow_analysis(**kwargs):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        service.ai_engine.analyze_user = slow_analysis
+
+        async def scenario():
+            result = await service.process_new_member(group.id, 5)
+            await asyncio.sleep(0)
+            return result
+
+        assert run_async(scenario())["message"] == "User already exists"
+        assert cancelled == [True]
+
+    def test_flusher_batches_concurrent_members(self, engine, session):
+        group = _group(session)
+        service = _service(session, 50)
+
+        async def scenario():
+            start_capture_flusher()
+            try:
+                return await asyncio.gather(
+                    service.process_new_member(group.id, 1, username="a"),
+                    service.process_new_member(group.id, 2, username="b"),
+                    # 同一用户同时从两处进来：只入库一次
+                    service.process_new_member(group.id, 2, username="b"),
+                )
+            finally:
+                await stop_capture_flusher()
+
+        real_write = intercept_service._write_capture_batch
+        with patch("app.core.db.engine", engine), \
+                patch.object(intercept_service, "_write_capture_batch", side_effect=real_write) as write:
+            results = run_async(scenario())
+
+        # 同一用户的两个事件谁先入队不确定，但只有一个入库
+        assert results[0]["status"] == "captured"
+        assert sorted(r["status"] for r in results[1:]) == ["captured", "skipped"]
+        assert write.call_count == 1
+        assert all(r["dm_reason"].startswith("Score 50") for r in results if r["status"] == "captured")
+        session.expire_all()
+        assert len(session.exec(select(TargetUser)).all()) == 2
+        group = session.get(SourceGroup, group.id)
+        assert (group.total_scraped, group.high_value_count) == (2, 0)
+
+    def test_dm_limit_not_overshot_and_refunded_on_duplicate(self, session):
+        group = _group(session)
+        service = _service(session, 90, dm_limit=1)
+
+        async def scenario():
+            return await asyncio.gather(*(
+                service.process_new_member(group.id, user_id) for user_id in (1, 2)
+            ))
+
+        results = run_async(scenario())
+        assert sorted(r["dm_scheduled"] for r in results) == [False, True]
+        assert service._dm_bucket.used == 1
+
+        # 已存在的用户不私聊，也不占用名额
+        service._dm_bucket = DMTokenBucket(1)
+        with patch.object(service, "_save_capture", AsyncMock(return_value=False)):
+            assert run_async(service.process_new_member(group.id, 3))["status"] == "skipped"
+        assert service._dm_bucket.used == 0
+
+    def test_non_competitor_rejected_from_id_set(self, session):
+        _group(session)
+        traffic = SourceGroup(link="t.me/traffic", type="traffic")
+        session.add(traffic)
+        session.commit()
+        service = _service(session, 90)
+
+        assert run_async(service.process_new_member(traffic.id, 1))["status"] == "skipped"
+        # 集合已缓存：之后的非竞品群事件不再查库
+        with patch.object(session, "exec", side_effect=AssertionError("no query expected")):
+            assert run_async(service.process_new_member(traffic.id, 2))["message"] == "Not a competitor group"
+            assert run_async(service.process_new_member(999, 3))["status"] == "skipped"
+        service.ai_engine.analyze_user.assert_not_awaited()
+
+        # 新建的竞品群失效后立即生效
+        new_group = SourceGroup(link="t.me/rival2", type="competitor")
+        session.add(new_group)
+        session.commit()
+        intercept_service.invalidate_source_group_cache(new_group.id)
+        assert run_async(service.process_new_member(new_group.id, 4))["status"] == "captured"
+
+
+class TestSourceGroupCache:
+
+    def test_cached_until_invalidated(self, session):
+        group = _group(session)
+        info = intercept_service._get_source_group_info(session, group.id)
+        assert info.type == "competitor"
+
+        group.type = "traffic"
+        session.add(group)
+        session.commit()
+        assert intercept_service._get_source_group_info(session, group.id).type == "competitor"
+
+        intercept_service.invalidate_source_group_cache(group.id)
+        assert intercept_service._get_source_group_info(session, group.id).type == "traffic"
+
+    def test_expired_entry_is_reloaded(self, session):
+        group = _group(session)
+        with patch("app.services.intercept_service.time.monotonic", return_value=1000):
+            intercept_service._get_source_group_info(session, group.id)
+        session.delete(group)
+        session.commit()
+        with patch("app.services.intercept_service.time.monotonic", return_value=1061):
+            assert intercept_service._get_source_group_info(session, group.id) is None
+
+
+class TestInterceptStats:
+
+    def test_counts_today_in_sql(self, session):
+        _group(session)
+        session.add(SourceGroup(link="t.me/other", type="traffic"))
+        session.add(TargetUser(telegram_id=1, ai_score=90))
+        session.add(TargetUser(telegram_id=2, ai_score=20))
+        session.add(TargetUser(telegram_id=3))
+        session.add(TargetUser(telegram_id=4, ai_score=95, created_at=datetime(2000, 1, 1)))
+        session.commit()
+
+        stats = InterceptService(session).get_intercept_stats()
+        assert stats["competitor_groups"] == 1
+        assert (stats["today_captures"], stats["today_high_value"]) == (3, 1)
+
+
+class TestSniperAccount:
+
+    def test_prefers_sniper_then_health_and_caches(self, session):
+        session.add(Account(phone_number="+1", status="active", combat_role="actor", health_score=100))
+        session.add(Account(phone_number="+2", status="active", combat_role="sniper", health_score=40))
+        best = Account(phone_number="+3", status="active", combat_role="sniper", health_score=90)
+        session.add(best)
+        session.add(Account(phone_number="+4", combat_role="sniper", health_score=99, status="banned"))
+        session.commit()
+        service = InterceptService(session)
+
+        assert run_async(service.get_sniper_account()).phone_number == "+3"
+
+        # 缓存期内被停用的账号跳过，且不重新查询
+        best.status = "banned"
+        session.add(best)
+        session.add(Account(phone_number="+5", status="active", combat_role="sniper", health_score=95))
+        session.commit()
+        assert run_async(service.get_sniper_account()).phone_number == "+2"
+
+        intercept_service.invalidate_sniper_cache()
+        assert run_async(service.get_sniper_account()).phone_number == "+5"
+
+    def test_falls_back_to_actor(self, session):
+        session.add(Account(phone_number="+1", status="active", combat_role="actor", health_score=10))
+        session.add(Account(phone_number="+2", status="active", combat_role="cannon", health_score=100))
+        session.commit()
+        assert run_async(InterceptService(session).get_sniper_account()).phone_number == "+1"
+
+
+class TestDMTokenBucket:
+
+    def test_refills_over_time(self):
+        with patch("app.services.intercept_service.time.monotonic", return_value=0):
+            bucket = DMTokenBucket(2, period=3600)
+            assert bucket.try_consume() and bucket.try_consume()
+            assert not bucket.try_consume()
+        with patch("app.services.intercept_service.time.monotonic", return_value=1800):
+            assert bucket.try_consume()
+            assert not bucket.try_consume()
+        with patch("app.services.intercept_service.time.monotonic", return_value=100000):
+            assert bucket.used == 0
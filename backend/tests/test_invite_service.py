@@ -0,0 +1,340 @@
+"""
+Tests for app.services.invite_service — account pool selection & invite stats.
+"""
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+from sqlmodel import select
+
+from conftest import run_async
+from app.models.account import Account
+from app.models.invite_log import InviteLog, InviteLogBrief
+from app.models.invite_task import InviteTask
+from app.models.target_user import TargetUser
+from app.models.types import json_array_contains_any
+from app.services import invite_service
+from app.services.invite_service import InviteService, parse_error_code
+
+
+def _account(session, phone, status="active"):
+    account = Account(phone_number=phone, status=status)
+    session.add(account)
+    session.commit()
+    return account
+
+
+def _log(session, account_id, status="success", created_at=None, error_code=None, flood_wait_seconds=None):
+    session.add(InviteLog(
+        task_id=1, account_id=account_id, target_user_id=1, target_telegram_id=1,
+        target_channel="t.me/target", status=status, error_code=error_code,
+        flood_wait_seconds=flood_wait_seconds, created_at=created_at or datetime.utcnow(),
+    ))
+
+
+class TestParseErrorCode:
+
+    @pytest.mark.parametrize("error, expected", [
+        ("Telegram says: [420 FLOOD_WAIT_X] - A wait of 3600 seconds", ("peer_flood", None)),
+        ("FLOOD_WAIT_120", ("peer_flood", 120)),
+        ("[403 USER_PRIVACY_RESTRICTED] The user's privacy settings", ("privacy_restricted", None)),
+        ("chat_write_forbidden", ("chat_forbidden", None)),
+        ("flood_wait 45", ("peer_flood", 45)),
+        ("[400 USER_CHANNELS_TOO_MUCH]", ("channels_too_much", None)),
+        ("PEER_FLOOD", ("peer_flood", None)),
+        ("connection reset", ("other_error", None)),
+    ])
+    def test_known_codes(self, error, expected):
+        assert parse_error_code(error) == expected
+
+
+class TestFilterTargetUsers:
+
+    def test_tags_match_either_column(self, session):
+        session.add(TargetUser(telegram_id=1, tags='["vip"]'))
+        session.add(TargetUser(telegram_id=2, ai_tags='["defi", "nft"]'))
+        session.add(TargetUser(telegram_id=3, tags='["spam"]', ai_tags='["bot"]'))
+        session.add(TargetUser(telegram_id=4))
+        session.commit()
+
+        targets = InviteService(session).filter_target_users(filter_tags=["vip", "nft"])
+        assert sorted(t.telegram_id for t in targets) == [1, 2]
+
+    def test_excludes_invited_and_recently_failed(self, session):
+        now = datetime.utcnow()
+        session.add(TargetUser(telegram_id=1))
+        session.add(TargetUser(telegram_id=2, invite_status="success", invite_attempted_at=now))
+        session.add(TargetUser(telegram_id=3, invite_status="not_mutual", invite_attempted_at=now))
+        session.add(TargetUser(telegram_id=4, invite_status="not_mutual", invite_attempted_at=now - timedelta(days=4)))
+        session.commit()
+
+        targets = InviteService(session).filter_target_users(failed_cooldown_hours=72)
+        assert sorted(t.telegram_id for t in targets) == [1, 4]
+
+    def test_keyset_pages_cover_all_rows_once(self, session):
+        base = datetime(2026, 1, 1)
+        for telegram_id, score, engagement in [(1, 90, 0), (2, 90, 5), (3, 50, 1), (4, None, 3), (5, None, 0)]:
+            session.add(TargetUser(telegram_id=telegram_id, ai_score=score, engagement_score=engagement,
+                                   created_at=base + timedelta(minutes=telegram_id)))
+        session.commit()
+        service = InviteService(session)
+
+        seen, after = [], None
+        while True:
+            page = service.filter_target_users(max_targets=2, after=after)
+            if not page:
+                break
+            seen += [t.telegram_id for t in page]
+            last = page[-1]
+            after = (last.ai_score, last.engagement_score, last.created_at, last.id)
+        assert seen == [2, 1, 3, 4, 5]
+
+    def test_keyset_does_not_skip_full_ties(self, session):
+        created_at = datetime(2026, 1, 1)
+        for telegram_id in range(1, 4):
+            session.add(TargetUser(telegram_id=telegram_id, ai_score=50, created_at=created_at))
+        session.commit()
+        service = InviteService(session)
+
+        first = service.filter_target_users(max_targets=2)
+        last = first[-1]
+        rest = service.filter_target_users(
+            max_targets=2, after=(last.ai_score, last.engagement_score, last.created_at, last.id))
+        assert sorted(t.id for t in first + rest) == [1, 2, 3]
+
+    def test_tags_compile_to_one_containment_per_column_on_postgres(self):
+        query = select(TargetUser.id).where(json_array_contains_any(TargetUser.tags, ["a", "b", "c"]))
+        sql = str(query.compile(dialect=postgresql.dialect()))
+        assert sql.count("@>") == 1 and "ANY(ARRAY[" in sql
+
+
+class TestTaskStats:
+
+    def test_single_grouped_query_cached_until_task_progresses(self, session):
+        invite_service._task_stats_cache.clear()
+        task = InviteTask(name="t", target_channel="t.me/target", success_count=1, fail_count=3)
+        session.add(task)
+        session.commit()
+        for status, error_code in [("success", None), ("failed", "peer_flood"),
+                                   ("failed", "privacy_restricted"), ("failed", "other_error")]:
+            session.add(InviteLog(task_id=task.id, account_id=1, target_user_id=1, target_telegram_id=1,
+                                  target_channel="t.me/target", status=status, error_code=error_code))
+        session.commit()
+        service = InviteService(session)
+
+        stats = service.get_task_stats(task.id)
+        assert (stats.total, stats.success, stats.failed) == (4, 1, 3)
+        assert (stats.peer_flood, stats.privacy_restricted, stats.user_banned, stats.other_errors) == (1, 1, 0, 1)
+        assert stats.success_rate == 25.0
+
+        with patch.object(session, "exec", side_effect=AssertionError("no query expected")):
+            assert service.get_task_stats(task.id) is stats
+
+        session.add(InviteLog(task_id=task.id, account_id=1, target_user_id=1, target_telegram_id=1,
+                              target_channel="t.me/target", status="failed", error_code="banned"))
+        task.fail_count += 1
+        session.add(task)
+        session.commit()
+        assert service.get_task_stats(task.id).user_banned == 1
+
+
+class TestRecentLogs:
+
+    def test_brief_rows_newest_first(self, session):
+        now = datetime.utcnow()
+        _log(session, 1, created_at=now - timedelta(minutes=2))
+        _log(session, 1, status="failed", error_code="banned", created_at=now - timedelta(minutes=1))
+        _log(session, 1, created_at=now)
+        session.commit()
+        service = InviteService(session)
+
+        logs = service.get_recent_logs(1, limit=2)
+        assert [log.created_at for log in logs] == [now, now - timedelta(minutes=1)]
+        assert isinstance(logs[0], InviteLogBrief)
+
+        failed = service.get_recent_logs(1, status="failed")
+        assert [(log.status, log.error_code) for log in failed] == [("failed", "banned")]
+
+
+class TestAccountInviteStatsBulk:
+
+    def test_grouped_counts_and_latest_flood(self, session):
+        a = _account(session, "+1")
+        b = _account(session, "+2")
+        yesterday = datetime.utcnow() - timedelta(days=1, hours=1)
+        _log(session, a.id)
+        _log(session, a.id, status="failed")
+        _log(session, a.id, created_at=yesterday)
+        _log(session, a.id, status="failed", error_code="peer_flood", created_at=yesterday - timedelta(days=3))
+        _log(session, a.id, status="failed", error_code="peer_flood", created_at=yesterday, flood_wait_seconds=7200)
+        session.commit()
+
+        stats = InviteService(session).get_account_invite_stats_bulk([a.id, b.id])
+
+        sa = stats[a.id]
+        assert (sa.today_count, sa.today_success, sa.today_failed) == (2, 1, 1)
+        assert (sa.total_count, sa.total_success) == (5, 2)
+        assert sa.last_flood_at == yesterday
+        assert sa.cooldown_until == yesterday + timedelta(hours=24)
+        assert sa.is_available is True
+
+        sb = stats[b.id]
+        assert (sb.today_count, sb.total_count, sb.last_invite_at, sb.cooldown_until) == (0, 0, None, None)
+
+    def test_available_accounts_filter_and_order(self, session):
+        busy = _account(session, "+1")
+        idle = _account(session, "+2")
+        full = _account(session, "+3")
+        cooling = _account(session, "+4")
+        _account(session, "+5", status="banned")
+        _log(session, busy.id)
+        for _ in range(3):
+            _log(session, full.id)
+        _log(session, cooling.id, status="failed", error_code="peer_flood")
+        session.commit()
+
+        accounts = InviteService(session).get_available_accounts(daily_limit=3)
+        assert [a.id for a in accounts] == [idle.id, busy.id]
+        assert accounts[1]._invite_today_count == 1
+
+    def test_long_flood_wait_extends_cooldown_in_sql(self, session):
+        short = _account(session, "+1")
+        long = _account(session, "+2")
+        old = _account(session, "+3")
+        flood_at = datetime.utcnow() - timedelta(hours=30)
+        _log(session, short.id, status="failed", error_code="peer_flood", created_at=flood_at)
+        # 等待 24 小时 × 1.5 = 36 小时冷却，30 小时后仍在冷却中
+        _log(session, long.id, status="failed", error_code="peer_flood", created_at=flood_at, flood_wait_seconds=86400)
+        # 只看最近一次风控：更早的长等待已过期
+        _log(session, old.id, status="failed", error_code="peer_flood",
+             created_at=flood_at - timedelta(days=3), flood_wait_seconds=86400)
+        _log(session, old.id, status="failed", error_code="peer_flood", created_at=flood_at)
+        session.commit()
+
+        service = InviteService(session)
+        assert {a.id for a in service.get_available_accounts()} == {short.id, old.id}
+        assert {a.id for a in service.get_available_accounts(exclude_cooling=False)} == {short.id, long.id, old.id}
+        assert service.get_account_invite_stats(long.id).is_available is False
+
+
+class TestExecuteTask:
+
+    def _task(self, session, **kwargs):
+        for telegram_id in range(1, 7):
+            session.add(TargetUser(telegram_id=telegram_id))
+        task = InviteTask(name="t", target_channel="t.me/target", account_ids_json="[]", **kwargs)
+        session.add(task)
+        session.commit()
+        return task
+
+    def test_daily_limit_counted_in_memory(self, session):
+        busy = _account(session, "+1")
+        idle = _account(session, "+2")
+        _log(session, busy.id)
+        task = self._task(session, max_invites_per_account=2)
+        service = InviteService(session)
+        invite = AsyncMock(return_value={"status": "success", "error_code": None})
+
+        with patch.object(service, "_invite_single_user", invite), \
+                patch.object(service, "get_account_invite_stats", side_effect=AssertionError("no re-query")):
+            result = run_async(service._execute_task_internal(task))
+
+        # busy 今日已用 1 次，只剩 1 次；idle 剩 2 次
+        assert result["success"] == 3
+        used = [call.kwargs["account"].id for call in invite.await_args_list]
+        assert sorted(used) == [busy.id, idle.id, idle.id]
+
+    def test_flooded_account_leaves_rotation(self, session):
+        flooded = _account(session, "+1")
+        other = _account(session, "+2")
+        task = self._task(session, max_invites_per_account=5, stop_on_flood=False)
+        service = InviteService(session)
+
+        async def invite(task, account, **kwargs):
+            if account.id == flooded.id:
+                return {"status": "failed", "error_code": "peer_flood"}
+            return {"status": "success", "error_code": None}
+
+        with patch.object(service, "_invite_single_user", side_effect=invite) as mock:
+            result = run_async(service._execute_task_internal(task))
+
+        assert (result["peer_flood"], result["success"]) == (1, 5)
+        used = [call.kwargs["account"].id for call in mock.await_args_list]
+        assert used.count(flooded.id) == 1 and used.count(other.id) == 5
+
+    def test_writes_committed_in_batches(self, session):
+        _account(session, "+1")
+        task = self._task(session, min_delay=0, max_delay=0)
+        service = InviteService(session)
+
+        with patch("app.services.invite_service._create_client_and_run", AsyncMock(return_value=(True, {}))), \
+                patch.object(session, "commit", wraps=session.commit) as commit:
+            result = run_async(service._execute_task_internal(task))
+
+        assert result["success"] == 6
+        # 任务总数 1 次 + 12 条写入按 10 条一批 1 次 + 收尾 1 次，而不是每次邀请提交 3 次
+        assert commit.call_count == 3
+        session.expire_all()
+        logs = session.exec(select(InviteLog)).all()
+        assert len(logs) == 6
+        assert all(log.account_username == "+1" and log.created_at and log.retry_count == 0 for log in logs)
+        assert session.get(InviteTask, task.id).success_count == 6
+
+    def test_no_transaction_held_across_long_delay(self, tmp_path):
+        # 文件库 + 独立连接：另一个会话写任务行时，如果邀请循环还占着写事务就会 database is locked
+        from sqlmodel import Session, SQLModel, create_engine
+        from app.models import import_all_models
+
+        import_all_models()
+        engine = create_engine(f"sqlite:///{tmp_path / 'invite.db'}", connect_args={"timeout": 0.1})
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            _account(session, "+1")
+            task = self._task(session)
+            task_id = task.id
+            service = InviteService(session)
+            sleeps = 0
+
+            async def sleep(delay):
+                nonlocal sleeps
+                sleeps += 1
+                assert delay >= 30
+                if sleeps == 3:
+                    # 模拟暂停接口：另一个会话更新任务行
+                    with Session(engine) as other:
+                        other.get(InviteTask, task_id).status = "paused"
+                        other.commit()
+
+            with patch("app.services.invite_service._create_client_and_run", AsyncMock(return_value=(True, {}))), \
+                    patch("app.services.invite_service.asyncio.sleep", side_effect=sleep):
+                result = run_async(service.execute_invite_task(task_id))
+
+            # 第 3 次邀请照常完成，下一轮循环读到暂停
+            assert result["success"] == 3
+            session.expire_all()
+            assert session.get(InviteTask, task_id).status == "paused"
+            assert len(session.exec(select(InviteLog)).all()) == 3
+
+    def test_pause_seen_before_batch_flush(self, session):
+        _account(session, "+1")
+        task = self._task(session, max_invites_per_account=10)
+        service = InviteService(session)
+        calls = 0
+
+        async def invite(task, account, **kwargs):
+            nonlocal calls
+            calls += 1
+            if calls == 2:
+                # 模拟接口在别处提交的暂停，不经过内存里的 task 对象
+                session.connection().execute(
+                    text("UPDATE invitetask SET status = 'paused' WHERE id = :id"), {"id": task.id}
+                )
+            return {"status": "success", "error_code": None}
+
+        with patch.object(service, "_invite_single_user", side_effect=invite):
+            result = run_async(service.execute_invite_task(task.id))
+
+        assert result["success"] == 2
+        assert session.get(InviteTask, task.id).status == "paused"
@@ -0,0 +1,160 @@
+"""
+Tests for app.services.keyword_matcher — KeywordMatcher.
+"""
+from unittest.mock import patch
+
+from app.models.keyword_monitor import KeywordHit, KeywordMonitor
+from app.services.keyword_monitor_service import KeywordMonitorService
+from app.services.keyword_matcher import (
+    KeywordMatcher, compile_regex, compile_word, normalize_auto_keywords, parse_auto_keywords,
+)
+
+
+def _monitor(id, keyword, match_type="partial"):
+    return KeywordMonitor(id=id, keyword=keyword, match_type=match_type)
+
+
+class TestKeywordMatcher:
+
+    def test_partial_case_insensitive(self):
+        matcher = KeywordMatcher([_monitor(1, "USDT"), _monitor(2, "代收")])
+        assert matcher.match("求购 usdt 有吗") == {1}
+        assert matcher.match("找代收代付") == {2}
+        assert matcher.match("hello") == set()
+
+    def test_shared_and_overlapping_keywords(self):
+        matcher = KeywordMatcher([
+            _monitor(1, "pay"), _monitor(2, "pay"), _monitor(3, "payment"),
+        ])
+        assert matcher.match("payment gateway") == {1, 2, 3}
+
+    def test_exact_matches_whole_message_only(self):
+        matcher = KeywordMatcher([_monitor(1, "Hi", "exact")])
+        assert matcher.match("hi") == {1}
+        assert matcher.match("hi there") == set()
+
+    def test_word_respects_boundaries(self):
+        matcher = KeywordMatcher([
+            _monitor(1, "ban", "word"), _monitor(2, "usdt pay", "word"),
+            _monitor(3, "ban", "partial"),
+        ])
+        assert matcher.match("banana split") == {3}
+        assert matcher.match("got a BAN today") == {1, 3}
+        assert matcher.match("usdt pay, fast") == {2}
+        assert matcher.match("usdt payment") == set()
+
+    def test_regex_case_insensitive_search(self):
+        matcher = KeywordMatcher([
+            _monitor(1, r"usdt\s*\d+", "regex"), _monitor(2, r"^buy", "regex"),
+        ])
+        assert matcher.match("sell USDT 500 now") == {1}
+        assert matcher.match("Buy usdt 10") == {1, 2}
+        assert matcher.match("nothing") == set()
+
+    def test_invalid_regex_never_matches(self):
+        matcher = KeywordMatcher([_monitor(1, "(unclosed", "regex")])
+        assert matcher.match("(unclosed") == set()
+
+    def test_semantic_not_in_match(self):
+        matcher = KeywordMatcher([_monitor(1, "pay", "semantic")])
+        assert matcher.match("pay now") == set()
+
+    def test_semantic_level1_candidates(self):
+        with_keywords = _monitor(1, "m1", "semantic")
+        with_keywords.auto_keywords = '["价格", "Price"]'
+        comma_separated = _monitor(2, "m2", "semantic")
+        comma_separated.auto_keywords = "buy, 下单"
+        no_keywords = _monitor(3, "m3", "semantic")
+        partial = _monitor(4, "price")
+        matcher = KeywordMatcher([with_keywords, comma_separated, no_keywords, partial])
+
+        assert matcher.scan("what's the PRICE?") == ({4}, {1, 3})
+        assert matcher.scan("我要下单") == (set(), {2, 3})
+        assert matcher.scan("hello") == (set(), {3})
+
+    def test_parse_auto_keywords(self):
+        assert parse_auto_keywords(None) == []
+        assert parse_auto_keywords('["A", "b"]') == ["a", "b"]
+        assert parse_auto_keywords("A, b") == ["a", "b"]
+        assert parse_auto_keywords('"single"') == ["single"]
+
+    def test_empty_partial_keyword_always_matches(self):
+        matcher = KeywordMatcher([_monitor(1, "")])
+        assert matcher.match("anything") == {1}
+
+    def test_unknown_match_type_treated_as_partial(self):
+        monitor = _monitor(1, "abc", None)
+        assert KeywordMatcher.match_type_of(monitor) == "partial"
+        assert KeywordMatcher([monitor]).match("xabcx") == {1}
+
+    def test_normalize_auto_keywords(self):
+        assert normalize_auto_keywords(None) is None
+        assert normalize_auto_keywords("  ") is None
+        assert normalize_auto_keywords('["价格"]') == '["价格"]'
+        assert normalize_auto_keywords("价格, 下单,") == '["价格", "下单"]'
+
+    def test_compile_regex_cached(self):
+        assert compile_regex(r"usdt\s*\d+") is compile_regex(r"usdt\s*\d+")
+        assert compile_regex(r"usdt\s*\d+").search("USDT 5")
+        assert compile_regex("(unclosed") is None
+
+    def test_compile_word_boundaries(self):
+        assert compile_word("ban").search("a BAN here")
+        assert not compile_word("ban").search("banana")
+
+
+class TestMonitorVersionEvents:
+
+    def test_rule_changes_bump_after_commit(self, session):
+        with patch("app.services.keyword_matcher.bump_monitors_version") as bump:
+            monitor = KeywordMonitor(keyword="usdt")
+            session.add(monitor)
+            session.flush()
+            bump.assert_not_called()
+            session.commit()
+            assert bump.call_count == 1
+
+            monitor.keyword = "btc"
+            session.commit()
+            assert bump.call_count == 2
+
+            session.delete(monitor)
+            session.commit()
+            assert bump.call_count == 3
+
+    def test_runtime_counters_do_not_bump(self, session):
+        monitor = KeywordMonitor(keyword="usdt")
+        session.add(monitor)
+        session.commit()
+        with patch("app.services.keyword_matcher.bump_monitors_version") as bump:
+            monitor.daily_reply_count = 5
+            monitor.last_reply_date = "2026-10-17"
+            session.commit()
+            bump.assert_not_called()
+
+    def test_rollback_discards_pending_bump(self, session):
+        with patch("app.services.keyword_matcher.bump_monitors_version") as bump:
+            session.add(KeywordMonitor(keyword="usdt"))
+            session.flush()
+            session.rollback()
+            session.commit()
+            bump.assert_not_called()
+
+
+class TestDeleteMonitor:
+
+    def test_delete_detaches_hits(self, session):
+        monitor = KeywordMonitor(keyword="usdt")
+        session.add(monitor)
+        session.commit()
+        hit = KeywordHit(
+            keyword_monitor_id=monitor.id, source_group_id="1", source_user_id="2",
+            message_content="usdt", message_id="3",
+        )
+        session.add(hit)
+        session.commit()
+
+        assert KeywordMonitorService(session).delete_monitor(monitor.id)
+        session.refresh(hit)
+        assert hit.keyword_monitor_id is None
+        assert hit.keyword_monitor is None
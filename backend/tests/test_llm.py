@@ -0,0 +1,169 @@
+"""
+Tests for app.services.llm — LLMService request coalescing.
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+
+from conftest import run_async
+from app.models.system_config import SystemConfig
+from app.services.llm import (
+    LLMService, _inflight, _shared_http_client, close_shared_http_client, enable_shared_http_client,
+)
+
+
+class TestSingleFlight:
+
+    def _service(self, session, dispatch):
+        service = LLMService(session)
+        patcher = patch.object(service, "_dispatch_response", side_effect=dispatch)
+        return service, patcher
+
+    def test_identical_concurrent_requests_share_one_call(self, session):
+        calls = []
+
+        async def dispatch(prompt, system_prompt, history):
+            calls.append(prompt)
+            await asyncio.sleep(0.01)
+            return f"re:{prompt}"
+
+        service, patcher = self._service(session, dispatch)
+        history = [{"role": "user", "content": "hi"}]
+
+        async def scenario():
+            return await asyncio.gather(
+                service.get_response("hi", "persona", history),
+                service.get_response("hi", "persona", history),
+                service.get_response("hi", "other persona", history),
+            )
+
+        with patcher:
+            results = run_async(scenario())
+            assert results == ["re:hi", "re:hi", "re:hi"]
+            assert len(calls) == 2
+
+            # 请求结束后不保留结果，再次请求会重新调用
+            assert run_async(service.get_response("hi", "persona", history)) == "re:hi"
+            assert len(calls) == 3
+        assert _inflight == {}
+
+    def test_failure_propagates_to_followers(self, session):
+        async def dispatch(prompt, system_prompt, history):
+            await asyncio.sleep(0.01)
+            raise RuntimeError("down")
+
+        service, patcher = self._service(session, dispatch)
+
+        async def scenario():
+            return await asyncio.gather(
+                service.get_response("hi"), service.get_response("hi"), return_exceptions=True,
+            )
+
+        with patcher:
+            results = run_async(scenario())
+        assert [type(r) for r in results] == [RuntimeError, RuntimeError]
+        assert _inflight == {}
+
+    def test_leader_cancel_does_not_cancel_followers(self, session):
+        calls = []
+
+        async def dispatch(prompt, system_prompt, history):
+            calls.append(prompt)
+            await asyncio.sleep(0.01)
+            return f"re:{prompt}"
+
+        service, patcher = self._service(session, dispatch)
+
+        async def scenario():
+            leader = asyncio.ensure_future(service.get_response("hi"))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(service.get_response("hi")) for _ in range(2)]
+            await asyncio.sleep(0)
+            leader.cancel()
+            results = await asyncio.gather(*followers)
+            return leader, results
+
+        with patcher:
+            leader, results = run_async(scenario())
+        assert leader.cancelled()
+        # 领头方被取消后，跟随方里只有一个重新发起请求，另一个跟随它
+        assert results == ["re:hi", "re:hi"]
+        assert len(calls) == 2
+        assert _inflight == {}
+
+    def test_cancelled_follower_still_cancelled(self, session):
+        async def dispatch(prompt, system_prompt, history):
+            await asyncio.sleep(0.01)
+            return "ok"
+
+        service, patcher = self._service(session, dispatch)
+
+        async def scenario():
+            leader = asyncio.ensure_future(service.get_response("hi"))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(service.get_response("hi"))
+            await asyncio.sleep(0)
+            follower.cancel()
+            return await leader, follower
+
+        with patcher:
+            result, follower = run_async(scenario())
+        assert result == "ok" and follower.cancelled()
+
+
+class TestSharedHttpClient:
+
+    def test_one_client_per_enabled_event_loop(self):
+        async def pair():
+            assert _shared_http_client() is None  # 未启用的循环（如 Celery 任务）不共享
+            enable_shared_http_client()
+            first, second = _shared_http_client(), _shared_http_client()
+            await close_shared_http_client()
+            return first, second
+
+        a, b = run_async(pair())
+        c, _ = run_async(pair())
+        assert a is b
+        assert c is not a
+        assert a.is_closed
+        assert _shared_http_client() is None  # 不在事件循环中
+
+    def test_request_through_shared_client(self, session):
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                body = json.dumps({
+                    "id": "c1", "object": "chat.completion", "created": 0, "model": "m",
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "hi"}}],
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        session.add(SystemConfig(key="llm_api_key", value="k"))
+        session.add(SystemConfig(key="llm_base_url", value=f"http://127.0.0.1:{server.server_port}/v1"))
+        session.commit()
+
+        async def scenario():
+            enable_shared_http_client()
+            try:
+                service = LLMService(session)
+                assert service._http_client is _shared_http_client()
+                return await service.get_response("hello")
+            finally:
+                await close_shared_http_client()
+
+        try:
+            assert run_async(scenario()) == "hi"
+        finally:
+            server.shutdown()
@@ -0,0 +1,31 @@
+"""
+Tests for app.models.schemas_fast — list endpoint encoding.
+"""
+import json
+from datetime import datetime
+
+from app.models.keyword_monitor import KeywordMonitor, KeywordMonitorRead
+from app.models.schemas_fast import encode_list
+
+
+class TestEncodeList:
+
+    def test_matches_pydantic_output(self):
+        monitor = KeywordMonitor(
+            id=1, keyword="usdt", auto_keywords='["价格"]',
+            created_at=datetime(2026, 10, 17, 8, 30, 15, 123456),
+        )
+        response = encode_list([monitor], KeywordMonitorRead)
+
+        assert response.media_type == "application/json"
+        expected = json.loads(KeywordMonitorRead.model_validate(monitor).model_dump_json())
+        assert json.loads(response.body) == [expected]
+
+    def test_read_model_fields_only(self):
+        monitor = KeywordMonitor(id=1, keyword="usdt", scenario_embedding_q8=b"\x01")
+        item = json.loads(encode_list([monitor], KeywordMonitorRead).body)[0]
+        assert "scenario_embedding_q8" not in item
+        assert set(item) == set(KeywordMonitorRead.model_fields)
+
+    def test_empty(self):
+        assert json.loads(encode_list([], KeywordMonitorRead).body) == []
@@ -87,6 +87,20 @@ class TestCreateAccessToken:
 
         assert p1["jti"] != p2["jti"]
 
+    def test_decode_access_token_roundtrip(self):
+        from app.core.security import create_access_token, decode_access_token
+
+        payload = decode_access_token(create_access_token(subject="admin"))
+        assert payload["sub"] == "admin"
+
+    def test_decode_access_token_rejects_foreign_signature(self):
+        from jose import JWTError
+        from app.core.security import decode_access_token
+
+        token = jwt.encode({"sub": "admin", "exp": int(time.time()) + 60}, "x" * 64, algorithm="HS256")
+        with pytest.raises(JWTError):
+            decode_access_token(token)
+
 
 # ---------------------------------------------------------------------------
 # Password hashing & verification
@@ -124,6 +138,14 @@ class TestPasswordHashing:
         h2 = get_password_hash("password")
         assert h1 != h2
 
+    def test_verify_password_batch_keeps_order(self):
+        from app.core.security import get_password_hash, verify_password_batch
+
+        hashed = get_password_hash("right")
+        pairs = [("right", hashed), ("wrong", hashed)] * 3
+        assert verify_password_batch(pairs) == [True, False] * 3
+        assert verify_password_batch(pairs[:2]) == [True, False]
+
 
 # ---------------------------------------------------------------------------
 # Token revocation (mocked Redis)
@@ -160,3 +182,140 @@ class TestTokenRevocation:
         mock_get_redis.return_value = mock_redis
         mock_redis.exists.return_value = 0
         assert is_token_revoked("valid-jti") is False
+
+    @patch("app.core.security._get_redis")
+    def test_revoke_token_queues_on_given_pipeline(self, mock_get_redis):
+        from app.core.security import revoke_token
+
+        pipe = MagicMock()
+        revoke_token("piped-jti", ttl=60, pipe=pipe)
+        pipe.setex.assert_called_once_with("revoked_token:piped-jti", 60, "1")
+        mock_get_redis.return_value.setex.assert_not_called()
+
+    @patch("app.core.security._get_redis")
+    def test_not_revoked_result_is_cached(self, mock_get_redis):
+        from app.core.security import is_token_revoked
+
+        mock_redis = MagicMock()
+        mock_get_redis.return_value = mock_redis
+        mock_redis.exists.return_value = 0
+        assert is_token_revoked("cached-jti") is False
+        assert is_token_revoked("cached-jti") is False
+        mock_redis.exists.assert_called_once_with("revoked_token:cached-jti")
+
+    @patch("app.core.security._get_redis")
+    def test_revoke_token_evicts_cached_result(self, mock_get_redis):
+        from app.core.security import is_token_revoked, revoke_token
+
+        mock_redis = MagicMock()
+        mock_get_redis.return_value = mock_redis
+        mock_redis.exists.return_value = 0
+        assert is_token_revoked("evicted-jti") is False
+
+        revoke_token("evicted-jti", ttl=60)
+        mock_redis.publish.assert_called_once_with("revoked_token_events", "evicted-jti")
+        mock_redis.exists.return_value = 1
+        assert is_token_revoked("evicted-jti") is True
+
+    def test_shared_client_fails_fast(self):
+        from app.core import security
+
+        with patch.object(security, "_redis_client", None):
+            pool = security._get_redis().connection_pool
+        assert pool.timeout == security._REDIS_POOL_TIMEOUT
+        assert pool.connection_kwargs["socket_connect_timeout"] == security._REDIS_SOCKET_TIMEOUT
+        assert pool.connection_kwargs["socket_timeout"] == security._REDIS_SOCKET_TIMEOUT
+
+    @patch("app.core.security._get_redis")
+    def test_failed_listener_start_backs_off(self, mock_get_redis):
+        from app.core import security
+
+        mock_redis = MagicMock()
+        mock_get_redis.return_value = mock_redis
+        mock_redis.pubsub.side_effect = ConnectionError("redis down")
+        with patch.object(security, "_revocation_listener", None), \
+                patch.object(security, "_revocation_listener_retry_at", 0.0):
+            security._ensure_revocation_listener()
+            security._ensure_revocation_listener()
+            assert mock_redis.pubsub.call_count == 1
+
+            # Retried once the backoff has passed
+            security._revocation_listener_retry_at = 0.0
+            mock_redis.pubsub.side_effect = None
+            security._ensure_revocation_listener()
+            assert security._revocation_listener is not None
+
+    @patch("app.core.security._get_redis")
+    def test_eviction_during_lookup_not_cached(self, mock_get_redis):
+        from app.core import security
+
+        mock_redis = MagicMock()
+        mock_get_redis.return_value = mock_redis
+
+        def exists(key):
+            # Revocation broadcast lands while EXISTS is in flight
+            security._on_revocation_message({"type": "message", "data": "racing-jti"})
+            return 0
+
+        mock_redis.exists.side_effect = exists
+        assert security.is_token_revoked("racing-jti") is False
+        mock_redis.exists.side_effect = None
+        mock_redis.exists.return_value = 1
+        assert security.is_token_revoked("racing-jti") is True
+
+    @patch("app.core.security._get_redis")
+    def test_dead_listener_restarted_after_backoff(self, mock_get_redis):
+        from app.core import security
+
+        mock_redis = MagicMock()
+        mock_get_redis.return_value = mock_redis
+        dead = MagicMock()
+        dead.is_alive.return_value = False
+        with patch.object(security, "_revocation_listener", dead), \
+                patch.object(security, "_revocation_listener_retry_at", 0.0):
+            security._on_revocation_listener_error(ConnectionError("gone"), MagicMock(), dead)
+            dead.stop.assert_called_once()
+            security._ensure_revocation_listener()
+            mock_redis.pubsub.assert_not_called()
+
+            security._revocation_listener_retry_at = 0.0
+            security._ensure_revocation_listener()
+            mock_redis.pubsub.assert_called_once()
+            assert security._revocation_listener is not dead
+
+
+# ---------------------------------------------------------------------------
+# Audit log write-behind queue
+# ---------------------------------------------------------------------------
+
+class TestCreateLog:
+    """Tests for create_log() with and without the background flusher."""
+
+    def test_writes_synchronously_without_flusher(self, session):
+        from sqlmodel import select
+        from app.core.security import create_log
+        from app.models.operation_log import OperationLog
+
+        create_log(session, "login", "admin", "ok", "127.0.0.1")
+        logs = session.exec(select(OperationLog)).all()
+        assert [(l.action, l.username) for l in logs] == [("login", "admin")]
+
+    def test_flusher_bulk_inserts_queued_rows_on_stop(self, engine, session):
+        import asyncio
+        from sqlmodel import select
+        from app.core import security
+        from app.models.operation_log import OperationLog
+
+        async def run():
+            security.start_log_flusher()
+            for i in range(3):
+                security.create_log(None, "logout", f"user{i}")
+            await asyncio.sleep(0)
+            await security.stop_log_flusher()
+
+        with patch("app.core.db.engine", engine):
+            asyncio.run(run())
+
+        logs = session.exec(select(OperationLog)).all()
+        assert sorted(l.username for l in logs) == ["user0", "user1", "user2"]
+        assert all(l.created_at is not None for l in logs)
@@ -0,0 +1,126 @@
+"""
+Tests for app.services.semantic_index — SemanticMonitorIndex.
+"""
+import pytest
+
+from app.models.keyword_monitor import KeywordMonitor
+from app.services.embedding_service import DEFAULT_COSINE_THRESHOLD, DEFAULT_MODEL
+from app.services.semantic_index import SemanticMonitorIndex, dequantize, normalize, quantize
+
+
+def _semantic(id, description):
+    return KeywordMonitor(
+        id=id, keyword=f"m{id}", match_type="semantic", scenario_description=description
+    )
+
+
+class TestSemanticMonitorIndex:
+
+    def test_normalize(self):
+        assert normalize([3.0, 4.0]) == pytest.approx([0.6, 0.8])
+        assert normalize([0.0, 0.0]) == [0.0, 0.0]
+
+    def test_quantize_roundtrip(self):
+        blob = quantize([3.0, -4.0])
+        assert len(blob) == 2
+        assert dequantize(blob) == pytest.approx([0.6, -0.8], abs=1e-2)
+
+    def test_sync_returns_fresh_and_loads_stored(self):
+        index = SemanticMonitorIndex(dim=2)
+        fresh = index.sync([_semantic(1, "a")], {1: [0.0, 2.0]})
+        assert fresh == {1: quantize([0.0, 1.0])}
+
+        restarted = SemanticMonitorIndex(dim=2)
+        stored = _semantic(1, "a")
+        stored.scenario_embedding_q8 = fresh[1]
+        stored.embedding_model = DEFAULT_MODEL
+        assert restarted.pending([stored]) == {}
+        assert restarted.sync([stored]) == {}
+        assert restarted.match([0.0, 1.0])[1] == pytest.approx(1.0, abs=1e-2)
+
+        wrong_dim = _semantic(2, "b")
+        wrong_dim.scenario_embedding_q8 = b"\x01"
+        wrong_dim.embedding_model = DEFAULT_MODEL
+        assert restarted.pending([wrong_dim]) == {2: "b"}
+
+        other_model = _semantic(3, "c")
+        other_model.scenario_embedding_q8 = fresh[1]
+        other_model.embedding_model = "text-embedding-3-small"
+        assert restarted.pending([other_model]) == {3: "c"}
+
+    def test_pending_only_new_or_changed(self):
+        index = SemanticMonitorIndex(dim=2)
+        monitors = [_semantic(1, "buy usdt"), _semantic(2, "sell usdt")]
+        assert index.pending(monitors) == {1: "buy usdt", 2: "sell usdt"}
+
+        index.sync(monitors, {1: [1.0, 0.0], 2: [0.0, 1.0]})
+        assert index.pending(monitors) == {}
+
+        changed = [_semantic(1, "buy btc"), _semantic(2, "sell usdt")]
+        assert index.pending(changed) == {1: "buy btc"}
+
+    def test_sync_drops_removed_and_non_semantic(self):
+        index = SemanticMonitorIndex(dim=2)
+        index.sync([_semantic(1, "a"), _semantic(2, "b")], {1: [1.0, 0.0], 2: [0.0, 1.0]})
+        assert len(index) == 2
+
+        plain = KeywordMonitor(id=3, keyword="x", match_type="partial", scenario_description="c")
+        index.sync([_semantic(2, "b"), plain], {3: [1.0, 1.0]})
+        assert len(index) == 1
+        assert 2 in index and 1 not in index and 3 not in index
+
+    def test_match_scores_cosine(self):
+        monitor_ids = [_semantic(1, "a"), _semantic(2, "b"), _semantic(3, "c")]
+        for monitor in monitor_ids:
+            monitor.similarity_threshold = 1
+        index = SemanticMonitorIndex(dim=2)
+        index.sync(monitor_ids, {1: [2.0, 0.0], 2: [0.0, 5.0], 3: [1.0, 1.0]})
+        scores = index.match([10.0, 0.0])
+        assert set(scores) == {1, 3}
+        assert scores[1] == pytest.approx(1.0, abs=1e-2)
+        assert scores[3] == pytest.approx(0.7071, abs=1e-2)
+
+    def test_match_rejects_wrong_dim(self):
+        index = SemanticMonitorIndex(dim=2)
+        index.sync([_semantic(1, "a")], {1: [1.0, 0.0]})
+        assert index.match([1.0, 0.0, 0.0]) == {}
+
+    def test_match_applies_per_monitor_threshold(self):
+        strict = _semantic(1, "a")
+        strict.similarity_threshold = 90
+        loose = _semantic(2, "b")
+        loose.similarity_threshold = 60
+        default = _semantic(3, "c")
+        index = SemanticMonitorIndex(dim=2, model="gemini-embedding-001")
+        index.sync([strict, loose, default], {1: [1.0, 1.0], 2: [1.0, 1.0], 3: [1.0, 0.0]})
+
+        # 模型基准 0.70：90 -> 0.7875，60 -> 0.525；cos(45°) ≈ 0.707 只命中宽松规则
+        hits = index.match([0.0, 1.0])
+        assert set(hits) == {2}
+        assert hits[2] == pytest.approx(0.7071, abs=1e-2)
+
+        assert set(index.match([1.0, 0.0])) == {2, 3}
+        assert set(index.match([1.0, 0.0], candidates={1, 2})) == {2}
+        assert index.match([1.0, 0.0], candidates={1}) == {}
+
+    def test_threshold_change_applies_on_sync(self):
+        monitor = _semantic(1, "a")
+        monitor.similarity_threshold = 90
+        index = SemanticMonitorIndex(dim=2)
+        index.sync([monitor], {1: [1.0, 1.0]})
+        assert index.match([0.0, 1.0]) == {}
+
+        monitor.similarity_threshold = 50
+        index.sync([monitor])
+        assert set(index.match([0.0, 1.0])) == {1}
+
+    def test_threshold_scales_model_baseline(self):
+        monitor = _semantic(1, "a")
+        index = SemanticMonitorIndex(dim=2, model="text-embedding-3-small")
+        assert index.threshold_for(monitor) == pytest.approx(0.40)
+        monitor.similarity_threshold = 100
+        assert index.threshold_for(monitor) == pytest.approx(0.50)
+
+        uncalibrated = SemanticMonitorIndex(dim=2, model="unknown-model")
+        monitor.similarity_threshold = None
+        assert uncalibrated.threshold_for(monitor) == pytest.approx(DEFAULT_COSINE_THRESHOLD)
@@ -262,7 +262,8 @@ const MonitorPage: React.FC = () => {
                     <span style={{ fontSize: 11, color: '#999' }}>
                         {record.match_type === 'semantic' ? '语义' : 
                          record.match_type === 'regex' ? '正则' : 
-                         record.match_type === 'exact' ? '精确' : '模糊'}
+                         record.match_type === 'exact' ? '精确' : 
+                         record.match_type === 'word' ? '整词' : '模糊'}
                     </span>
                 </Space>
             )
@@ -413,7 +414,7 @@ const MonitorPage: React.FC = () => {
                     delay_min_seconds: 30,
                     delay_max_seconds: 180,
                     max_replies_per_day: 10,
-                    similarity_threshold: 70,
+                    similarity_threshold: 80,
                     ai_persona: 'helpful'
                 }}>
                     
@@ -455,6 +456,7 @@ const MonitorPage: React.FC = () => {
                                 <Form.Item name="match_type" label="匹配方式">
                                     <Select onChange={(val) => setMatchType(val)}>
                                         <Option value="partial">模糊匹配 (包含即命中)</Option>
+                                        <Option value="word">整词匹配 (按词边界，ban 不命中 banana)</Option>
                                         <Option value="exact">精确匹配 (完全相等)</Option>
                                         <Option value="regex">正则表达式 (高级)</Option>
                                         <Option value="semantic">🧠 语义匹配 (AI两级过滤)</Option>
@@ -540,7 +542,7 @@ const MonitorPage: React.FC = () => {
                                 </Form.Item>
 
                                 <Form.Item name="similarity_threshold" label="语义相似度阈值 (Level2精判)">
-                                    <Slider min={50} max={95} marks={{ 50: '宽松', 70: '标准', 90: '严格' }} />
+                                    <Slider min={50} max={95} marks={{ 50: '宽松', 80: '标准', 90: '严格' }} />
                                 </Form.Item>
                             </>
                         )}
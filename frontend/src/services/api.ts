@@ -1028,7 +1028,7 @@ export const deleteWarmupTemplate = async (id: number): Promise<void> => {
 export interface KeywordMonitor {
     id: number;
     keyword: string;
-    match_type: string;  // partial, exact, regex, semantic
+    match_type: string;  // partial, word, exact, regex, semantic
     target_groups?: string;
     action_type: string;
     reply_script_id?: number;